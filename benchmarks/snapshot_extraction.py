@@ -0,0 +1,106 @@
+"""
+Compare the SELECT * / fetchall snapshot extraction with the COPY based one.
+
+A synthetic table shaped like totesys' sales_order is created as a temporary table in a local
+Postgres database and both paths read it into a Parquet file held in memory, so only the time
+spent reading from the database and serialising the data is measured.
+
+Usage (from the root of the repository):
+    PGHOST=localhost PGPORT=5432 PGDATABASE=postgres PGUSER=postgres PGPASSWORD=postgres \
+        PYTHONPATH=$(pwd) python benchmarks/snapshot_extraction.py [rows]
+
+A throwaway server can be started with:
+    docker run --rm -e POSTGRES_PASSWORD=postgres -p 5432:5432 postgres:15
+"""
+import io
+import os
+import sys
+import time
+import tracemalloc
+import pandas as pd
+import pyarrow.parquet as pq
+
+from utils.connect_to_server import connect_to_server
+from src.extraction.extraction import (get_all_table_rows,
+                                       get_column_names,
+                                       copy_table_batches)
+
+table_name = 'benchmark_sales_order'
+
+
+def create_table(conn, rows):
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        CREATE TEMP TABLE {table_name} AS
+        SELECT
+            n AS sales_order_id,
+            now() - (n || ' seconds')::interval AS created_at,
+            now() - (n || ' seconds')::interval AS last_updated,
+            n % 500 AS design_id,
+            n % 20 AS staff_id,
+            n % 20 AS counterparty_id,
+            (n % 1000) * 10 AS units_sold,
+            ((n % 400) / 100.0)::numeric(10, 2) AS unit_price,
+            n % 3 AS currency_id,
+            to_char(now() + (n % 30 || ' days')::interval, 'YYYY-MM-DD') AS agreed_delivery_date,
+            to_char(now() + (n % 60 || ' days')::interval, 'YYYY-MM-DD') AS agreed_payment_date,
+            n % 30 AS agreed_delivery_location_id
+        FROM generate_series(1, {int(rows)}) AS n;""")
+    cursor.close()
+
+
+def select_snapshot(conn):
+    cursor = conn.cursor()
+    rows = get_all_table_rows(cursor, table_name)
+    df = pd.DataFrame(rows, columns=get_column_names(cursor))
+    cursor.close()
+
+    buffer = io.BytesIO()
+    df.to_parquet(buffer)
+    return len(df)
+
+
+def copy_snapshot(conn):
+    buffer = io.BytesIO()
+    writer = None
+    row_count = 0
+
+    for batch in copy_table_batches(conn, table_name):
+        if writer is None:
+            writer = pq.ParquetWriter(buffer, batch.schema)
+        writer.write_batch(batch)
+        row_count += batch.num_rows
+
+    if writer:
+        writer.close()
+    return row_count
+
+
+def measure(name, function, conn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    row_count = function(conn)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print(f"{name:<8} {row_count:>10} rows {seconds:>8.2f} s "
+          f"{row_count / seconds:>12.0f} rows/s {peak / 1024 / 1024:>10.1f} MiB peak (Python heap)")
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+
+    conn = connect_to_server({
+        'host': os.environ.get('PGHOST', 'localhost'),
+        'port': os.environ.get('PGPORT', 5432),
+        'database': os.environ.get('PGDATABASE', 'postgres'),
+        'user': os.environ.get('PGUSER', 'postgres'),
+        'password': os.environ.get('PGPASSWORD', 'postgres')})
+
+    try:
+        create_table(conn, rows)
+        measure('select', select_snapshot, conn)
+        measure('copy', copy_snapshot, conn)
+    finally:
+        conn.close()
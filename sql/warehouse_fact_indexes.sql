@@ -0,0 +1,12 @@
+-- Indexes the loading needs to deduplicate a batch of fact rows by their ids,
+-- see deduplicate_fact_table in src/loading/loading.py.
+-- Run once against the warehouse by its owner: make migrate-warehouse
+
+CREATE INDEX IF NOT EXISTS fact_sales_order_sales_order_id_idx
+    ON project_team_6.fact_sales_order (sales_order_id);
+
+CREATE INDEX IF NOT EXISTS fact_payment_payment_id_idx
+    ON project_team_6.fact_payment (payment_id);
+
+CREATE INDEX IF NOT EXISTS fact_purchase_order_purchase_order_id_idx
+    ON project_team_6.fact_purchase_order (purchase_order_id);
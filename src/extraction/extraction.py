@@ -1,12 +1,26 @@
 from psycopg2 import sql
 from datetime import datetime, timezone, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import boto3
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import awswrangler as wr
 import logging
+import os
+import threading
 from utils.get_bucket_name import get_bucket_name
 from utils.get_bucket_objects import get_bucket_objects
 from utils.get_secret import get_secret
 from utils.connect_to_server import connect_to_server
+from utils.connection_pool import ConnectionPool
+from utils.warm_connection import WarmConnection
+from utils.write_parquet_to_s3 import write_parquet_to_s3
+from utils.watermarks import get_watermarks, save_watermarks, get_rows_watermark, get_batch_watermark
+from utils.table_metrics import put_table_metrics
+from utils.partitioned_layout import get_extraction_key
+from utils.run_ledger import publish_extraction
+from utils.logical_replication import open_replication_connection, ensure_replication_slot, consume_changes
 
 
 def set_start_time_minus_minutes(minutes):
@@ -52,6 +66,47 @@ def get_column_names(cursor):
     return [desc[0] for desc in cursor.description]
 
 
+def get_all_table_rows_query(table_name):
+    """
+    Build the query selecting every row of a table.
+
+    Parameters:
+    - table_name: The name of the table to select from.
+
+    Returns:
+    - A psycopg2 sql.Composed statement.
+    """
+
+    return sql.SQL(
+        "SELECT * FROM {table};").format(table=sql.Identifier(table_name))
+
+
+def get_latest_table_rows_query(table_name, start_time, last_id=None):
+    """
+    Build the query selecting the rows of a table that were last updated after a certain time.
+
+    Parameters:
+    - table_name: The name of the table to select from.
+    - start_time: The time after which the rows must have been last updated.
+    - last_id: An optional primary key breaking ties between rows last updated at 'start_time'.
+      When given, rows updated exactly at 'start_time' with a greater '<table_name>_id' are
+      also selected. This row comparison can only use an index on (last_updated, <table_name>_id).
+
+    Returns:
+    - A psycopg2 sql.Composed statement.
+    """
+
+    if last_id is None:
+        return sql.SQL("SELECT * FROM {table} WHERE {table}.last_updated > {time};").format(
+            table=sql.Identifier(table_name), time=sql.Literal(start_time))
+
+    return sql.SQL("SELECT * FROM {table} WHERE ({table}.last_updated, {table}.{id}) > ({time}, {last_id});").format(
+        table=sql.Identifier(table_name),
+        id=sql.Identifier(f'{table_name}_id'),
+        time=sql.Literal(start_time),
+        last_id=sql.Literal(last_id))
+
+
 def get_all_table_rows(cursor, table_name):
     """
     Get all rows from a table in a database.
@@ -64,14 +119,12 @@ def get_all_table_rows(cursor, table_name):
     - A list of tuples representing the rows of the table.
     """
 
-    sql_statement = sql.SQL(
-        "SELECT * FROM {table};").format(table=sql.Identifier(table_name))
     cursor.execute(
-        sql_statement)
+        get_all_table_rows_query(table_name))
     return cursor.fetchall()
 
 
-def get_latest_table_rows(cursor, table_name, start_time):
+def get_latest_table_rows(cursor, table_name, start_time, last_id=None):
     """
     Get the rows from a table in a database that were last updated after a certain time.
 
@@ -79,18 +132,326 @@ def get_latest_table_rows(cursor, table_name, start_time):
     - cursor: A psycopg2 cursor object.
     - table_name: The name of the table from which to retrieve the rows.
     - start_time: The time after which the rows must have been last updated.
+    - last_id: An optional primary key of the last extracted row, see get_latest_table_rows_query.
 
     Returns:
     - A list of tuples representing the rows of the table that meet the condition.
     """
 
-    sql_statement = sql.SQL("SELECT * FROM {table} WHERE {table}.last_updated > {time};").format(
-        table=sql.Identifier(table_name), time=sql.Literal(start_time))
     cursor.execute(
-        sql_statement)
+        get_latest_table_rows_query(table_name, start_time, last_id))
     return cursor.fetchall()
 
 
+def get_probe_query(tables):
+    """
+    Build one query counting the rows of many tables that were last updated after their watermark.
+
+    Parameters:
+    - tables: A list of tuples of a table name, the time after which its rows must have been
+      last updated and an optional last id, see get_latest_table_rows_query.
+
+    Returns:
+    - A psycopg2 sql.Composed statement returning the table name, the number of changed rows
+      and their latest 'last_updated' of every table.
+    """
+
+    selects = []
+    for table_name, start_time, last_id in tables:
+        if last_id is None:
+            condition = sql.SQL("{table}.last_updated > {time}").format(
+                table=sql.Identifier(table_name), time=sql.Literal(start_time))
+        else:
+            condition = sql.SQL("({table}.last_updated, {table}.{id}) > ({time}, {last_id})").format(
+                table=sql.Identifier(table_name),
+                id=sql.Identifier(f'{table_name}_id'),
+                time=sql.Literal(start_time),
+                last_id=sql.Literal(last_id))
+
+        selects.append(sql.SQL(
+            "SELECT {name}, count(*), max({table}.last_updated) FROM {table} WHERE {condition}").format(
+            name=sql.Literal(table_name),
+            table=sql.Identifier(table_name),
+            condition=condition))
+
+    return sql.Composed([sql.SQL(" UNION ALL ").join(selects), sql.SQL(";")])
+
+
+def probe_tables(conn, tables):
+    """
+    Find which tables have changed since their watermark, in a single round trip.
+
+    Parameters:
+    - conn: A psycopg2 connection object.
+    - tables: A list of tuples in the format taken by get_probe_query.
+
+    Returns:
+    - A dictionary mapping table names to a tuple of their number of changed rows and the
+      latest 'last_updated' of those rows (None if there are none).
+    """
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(get_probe_query(tables))
+        return {table_name: (row_count, last_updated)
+                for table_name, row_count, last_updated in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+postgres_arrow_types = {
+    16: pa.bool_(),
+    20: pa.int64(),
+    21: pa.int64(),
+    23: pa.int64(),
+    25: pa.string(),
+    700: pa.float64(),
+    701: pa.float64(),
+    1042: pa.string(),
+    1043: pa.string(),
+    1082: pa.date32(),
+    1083: pa.time64('us'),
+    1114: pa.timestamp('us'),
+    1184: pa.timestamp('us', tz='UTC'),
+}
+
+
+def get_arrow_schema(description, rows):
+    """
+    Build an Arrow schema for the result of a SQL query.
+
+    Column types are taken from the Postgres type of each column so that every batch of a
+    streamed query is written with the same schema. A numeric without a precision (reported
+    by psycopg2 as a precision of 65535) or with more digits than a decimal128 can hold is
+    written as text rather than rounded. Types that are not
+    known are inferred from the given rows, and written as text if the rows only hold nulls,
+    as a null column could not take the values of later batches.
+
+    Parameters:
+    - description: The description of a psycopg2 cursor that has been used to execute a SQL query.
+    - rows: A list of tuples used to infer the type of unknown columns.
+
+    Returns:
+    - A pyarrow Schema.
+    """
+
+    fields = []
+    for index, column in enumerate(description):
+        name, type_code = column[0], column[1]
+
+        if type_code == 1700:
+            arrow_type = pa.string() if column[4] in (None, 65535) or column[4] > 38 else pa.decimal128(
+                column[4], column[5] or 0)
+        elif type_code in postgres_arrow_types:
+            arrow_type = postgres_arrow_types[type_code]
+        else:
+            arrow_type = pa.array([row[index] for row in rows]).type
+            if arrow_type == pa.null():
+                arrow_type = pa.string()
+
+        fields.append(pa.field(name, arrow_type))
+
+    return pa.schema(fields)
+
+
+def rows_to_arrow_table(rows, schema):
+    """
+    Convert a list of rows into an Arrow table.
+
+    Values of text columns that are not strings, e.g. the Decimals of an unconstrained
+    numeric, are written as their string representation.
+
+    Parameters:
+    - rows: A list of tuples representing rows of a table.
+    - schema: The pyarrow Schema of the rows.
+
+    Returns:
+    - A pyarrow Table.
+    """
+
+    def to_array(column, arrow_type):
+        try:
+            return pa.array(column, type=arrow_type)
+        except (pa.ArrowTypeError, pa.ArrowInvalid):
+            if not pa.types.is_string(arrow_type):
+                raise
+            return pa.array([None if value is None else str(value) for value in column],
+                            type=arrow_type)
+
+    columns = list(zip(*rows))
+    return pa.Table.from_arrays(
+        [to_array(column, field.type)
+         for column, field in zip(columns, schema)],
+        schema=schema)
+
+
+def stream_table_rows(
+        conn,
+        sql_statement,
+        bucket_name,
+        key,
+        batch_size=10000,
+        on_batch=None,
+        s3_client=None):
+    """
+    Run a query through a named server-side cursor and stream the result into a Parquet file in S3.
+
+    Rows are fetched 'batch_size' at a time and each batch is written as one Parquet row group,
+    so only a single batch is held in memory however large the table is. No file is written if
+    the query returns no rows.
+
+    Parameters:
+    - conn: A psycopg2 connection object.
+    - sql_statement: The query to run.
+    - bucket_name: The name of the S3 bucket to write to.
+    - key: The key of the Parquet file to create.
+    - batch_size: The number of rows to fetch and write at a time.
+    - on_batch: An optional function called with every batch as a pyarrow Table.
+    - s3_client: An optional boto3 S3 client to upload with.
+
+    Returns:
+    - The number of rows written.
+    """
+
+    cursor = conn.cursor(name=f"stream_{key.split('/')[-1].split('.')[0]}")
+    cursor.itersize = batch_size
+
+    def fetch_batches():
+        schema = None
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if len(rows) == 0:
+                return
+
+            if schema is None:
+                schema = get_arrow_schema(cursor.description, rows)
+
+            batch = rows_to_arrow_table(rows, schema)
+            if on_batch:
+                on_batch(batch)
+            yield batch
+
+    try:
+        cursor.execute(sql_statement)
+        return write_parquet_to_s3(
+            fetch_batches(), bucket_name, key, s3_client)
+
+    finally:
+        cursor.close()
+
+
+class StoppableWriter:
+    """
+    A file-like object writing to another one until it is stopped, after which every write
+    fails, so a COPY ... TO STDOUT writing to it ends early.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.stopped = threading.Event()
+
+    def write(self, data):
+        if self.stopped.is_set():
+            raise BrokenPipeError('The COPY output is no longer read.')
+        return self.file.write(data)
+
+
+def copy_table_batches(conn, table_name, block_size=16 * 1024 * 1024):
+    """
+    Read a whole table with COPY ... TO STDOUT and parse it into Arrow record batches.
+
+    The CSV produced by Postgres is written into a pipe by a background thread and parsed
+    as it arrives by pyarrow's multithreaded CSV reader, so neither the table nor its CSV is
+    ever held in memory or on disk as a whole, and no Python object is created per row or
+    per value. Column types are taken from the Postgres type of each column, so every batch
+    shares one schema.
+
+    Parameters:
+    - conn: A psycopg2 connection object.
+    - table_name: The name of the table to read.
+    - block_size: The number of bytes of CSV parsed into each record batch.
+
+    Returns:
+    - A generator of pyarrow RecordBatches.
+    """
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql.SQL("SELECT * FROM {table} LIMIT 0;").format(
+            table=sql.Identifier(table_name)))
+        column_types = {field.name: field.type for field in get_arrow_schema(
+            cursor.description, [])}
+
+        read_fd, write_fd = os.pipe()
+        pipe_reader, pipe_writer = os.fdopen(read_fd, 'rb'), os.fdopen(write_fd, 'wb')
+        writer = StoppableWriter(pipe_writer)
+        errors = []
+
+        def copy():
+            try:
+                cursor.copy_expert(
+                    sql.SQL("COPY (SELECT * FROM {table}) TO STDOUT WITH (FORMAT csv, HEADER true);").format(
+                        table=sql.Identifier(table_name)),
+                    writer)
+            except Exception as err:
+                if not writer.stopped.is_set():
+                    errors.append(err)
+            finally:
+                # the reader sees the end of the CSV once the pipe is closed
+                pipe_writer.close()
+
+        copier = threading.Thread(target=copy, daemon=True)
+        copier.start()
+        reader = None
+
+        def stop():
+            # pyarrow's readahead thread reads the pipe through Python, so releasing a reader
+            # that has not reached the end of the CSV deadlocks on the GIL. The copy is stopped
+            # and whatever it had written is read before the reader is released.
+            writer.stopped.set()
+            if reader is not None:
+                try:
+                    for _ in reader:
+                        pass
+                except Exception:
+                    pass
+            copier.join()
+            pipe_reader.close()
+
+        try:
+            reader = pacsv.open_csv(
+                pipe_reader,
+                read_options=pacsv.ReadOptions(block_size=block_size),
+                parse_options=pacsv.ParseOptions(newlines_in_values=True),
+                convert_options=pacsv.ConvertOptions(
+                    column_types=column_types,
+                    true_values=['t'],
+                    false_values=['f'],
+                    null_values=[''],
+                    strings_can_be_null=True,
+                    quoted_strings_can_be_null=False))
+
+            for batch in reader:
+                yield batch
+
+        except Exception:
+            stop()
+            # a failed copy ends the CSV early, its error is the one worth raising
+            if errors:
+                raise errors[0]
+            raise
+
+        finally:
+            stop()
+
+        # a failed copy ends the CSV early, so its error is raised rather than a short table
+        if errors:
+            raise errors[0]
+
+    finally:
+        cursor.close()
+
+
 lst_table_names = ['transaction',
                    'payment_type',
                    'purchase_order',
@@ -104,10 +465,194 @@ lst_table_names = ['transaction',
                    'counterparty']
 
 
+def extract_table(
+        conn,
+        table_name,
+        bucket_name,
+        folder_prefix,
+        start_time=None,
+        last_id=None,
+        extraction_mode='fetchall',
+        batch_size=10000,
+        boto3_session=None,
+        snapshot_mode='select',
+        layout='flat'):
+    """
+    Extract the new rows of a table into '<folder_prefix>/<table_name>.parquet' in an S3 bucket.
+
+    Parameters:
+    - conn: A psycopg2 connection object.
+    - table_name: The name of the table to extract.
+    - bucket_name: The name of the S3 bucket to write to.
+    - folder_prefix: The folder to write the Parquet file to.
+    - start_time: The time after which rows must have been last updated. Every row is extracted if None.
+    - last_id: An optional primary key of the last extracted row, see get_latest_table_rows_query.
+    - extraction_mode: 'stream' to stream the rows through a server-side cursor, otherwise 'fetchall'.
+    - batch_size: The number of rows fetched at a time when streaming.
+    - boto3_session: An optional boto3 Session to upload with, required when called from several threads.
+    - snapshot_mode: 'copy' to read full snapshots with COPY (see copy_table_batches), otherwise 'select'.
+    - layout: 'hive' to write to the partitioned layout instead, see get_extraction_key.
+
+    Returns:
+    - A tuple of the number of rows extracted and the new watermark of the table (or None).
+    """
+
+    watermark = None
+
+    def track_watermark(batches):
+        nonlocal watermark
+        for batch in batches:
+            watermark = get_batch_watermark(batch, table_name, watermark)
+            yield batch
+
+    key = get_extraction_key(folder_prefix, table_name, layout)
+    s3_client = boto3_session.client('s3') if boto3_session else None
+
+    if start_time is None and snapshot_mode == 'copy':
+        row_count = write_parquet_to_s3(
+            track_watermark(copy_table_batches(conn, table_name)),
+            bucket_name,
+            key,
+            s3_client)
+
+        return row_count, watermark
+
+    if extraction_mode == 'stream':
+        def advance_watermark(batch):
+            nonlocal watermark
+            watermark = get_batch_watermark(batch, table_name, watermark)
+
+        sql_statement = get_all_table_rows_query(
+            table_name) if start_time is None else get_latest_table_rows_query(
+            table_name, start_time, last_id)
+        row_count = stream_table_rows(
+            conn,
+            sql_statement,
+            bucket_name,
+            key,
+            batch_size,
+            on_batch=advance_watermark,
+            s3_client=s3_client)
+
+        return row_count, watermark
+
+    cursor = conn.cursor()
+    try:
+        rows = get_all_table_rows(
+            cursor, table_name) if start_time is None else get_latest_table_rows(
+            cursor, table_name, start_time, last_id)
+
+        if len(rows) > 0:
+            column_names = get_column_names(cursor)
+            df = pd.DataFrame(rows, columns=column_names)
+
+            wr.s3.to_parquet(
+                df=df,
+                path=f"s3://{bucket_name}/{key}",
+                boto3_session=boto3_session)
+
+            watermark = get_rows_watermark(column_names, rows, table_name)
+
+        return len(rows), watermark
+
+    finally:
+        cursor.close()
+
+
+def connect_to_totesys():
+    """
+    Open a connection to the totesys database with the 'pg-oltp-db' secret.
+
+    If connecting fails the secret is fetched again, bypassing the cache, and the connection is
+    retried once in case the password has been rotated.
+
+    Returns:
+    - A psycopg2 connection object.
+    """
+
+    credentials = get_secret("pg-oltp-db")
+    try:
+        return connect_to_server(credentials)
+    except Exception:
+        refreshed_credentials = get_secret("pg-oltp-db", refresh=True)
+        if refreshed_credentials == credentials:
+            raise
+        return connect_to_server(refreshed_credentials)
+
+
+# kept open across warm invocations, see utils/warm_connection.py
+totesys_connection = WarmConnection(connect_to_totesys)
+
+
+def extract_changes(bucket_name):
+    """
+    Extract the changes of the totesys tables from the CDC_SLOT_NAME logical replication slot.
+
+    The changes are consumed for CDC_MAX_SECONDS and written every CDC_FLUSH_SECONDS, or every
+    CDC_FLUSH_ROWS rows, to a new 'totesys_extraction_data_' folder. When the slot does not
+    exist yet it is created and nothing is consumed, the tables are then extracted by polling
+    once so that the rows written before the slot existed are not missed. The watermarks of
+    the polling extraction are advanced to the newest row written of every table.
+
+    Parameters:
+    - bucket_name: The name of the ingestion bucket.
+
+    Returns:
+    - True if the changes have been extracted, False if the tables still need to be polled.
+    """
+    logger = logging.getLogger("Extraction")
+
+    slot_name = os.environ.get('CDC_SLOT_NAME', 'totesys_extraction')
+    conn = open_replication_connection(get_secret("pg-oltp-db"))
+    try:
+        cursor = conn.cursor()
+        if ensure_replication_slot(cursor, slot_name):
+            return False
+
+        # the polling watermarks follow the changes, so polling can take over again at any time
+        watermarks = get_watermarks(bucket_name)
+        new_watermarks = dict(watermarks)
+
+        change_count = consume_changes(
+            cursor,
+            slot_name,
+            bucket_name,
+            lambda: create_folder_prefix("totesys_extraction_data_"),
+            lst_table_names,
+            max_seconds=float(os.environ.get('CDC_MAX_SECONDS', 240)),
+            flush_seconds=float(os.environ.get('CDC_FLUSH_SECONDS', 5)),
+            flush_rows=int(os.environ.get('CDC_FLUSH_ROWS', 10000)),
+            layout=os.environ.get('INGESTION_LAYOUT', 'flat'),
+            handoff=os.environ.get('PIPELINE_HANDOFF', 'rename'),
+            watermarks=new_watermarks)
+        logger.info(f"Extracted {change_count} changes from the {slot_name} slot.")
+
+        if new_watermarks != watermarks:
+            save_watermarks(bucket_name, new_watermarks)
+        return True
+    finally:
+        conn.close()
+
+
 def handler(event, context):
     """
     Main function for extracting data from a database and saving it to an S3 bucket.
 
+    Tables are extracted in one transaction on the warm totesys_connection. Setting the
+    EXTRACTION_MAX_WORKERS environment variable above 1 instead extracts that many tables at a
+    time, each on its own connection from a ConnectionPool.
+
+    On incremental runs, setting EXTRACTION_PROBE to '1' first counts the changed rows of every
+    table in one query (see probe_tables), publishes them as the 'ChangedRows' metric and only
+    extracts the tables that have changed.
+
+    Setting INGESTION_LAYOUT to 'hive' writes the tables to date and hour partitions and lists
+    them in a manifest of the run, see utils/partitioned_layout.py. Setting PIPELINE_HANDOFF to
+    'manifest' hands the run over to the transformation through the RunLedger instead.
+
+    Setting EXTRACTION_SOURCE to 'cdc' streams the changes of a logical replication slot
+    instead of polling the tables, see extract_changes.
+
     Parameters:
     - event:  Not used in this function.
     - context:  Not used in this function.
@@ -117,40 +662,110 @@ def handler(event, context):
     logger = logging.getLogger("Extraction")
 
     s3_ingestion_bucket_name = get_bucket_name("nc-project-ingestion-zone-")
-    datetime_start = set_start_time_minus_minutes(15)
     folder_prefix = create_folder_prefix("totesys_extraction_data_")
-    cursor = None
-    conn = None
+    pool = None
     try:
 
-        credentials = get_secret("pg-oltp-db")
+        if os.environ.get('EXTRACTION_SOURCE', 'poll') == 'cdc':
+            if extract_changes(s3_ingestion_bucket_name):
+                return
+
+        extraction_mode = os.environ.get('EXTRACTION_MODE', 'fetchall')
+        batch_size = int(os.environ.get('EXTRACTION_BATCH_SIZE', 10000))
+        max_workers = int(os.environ.get('EXTRACTION_MAX_WORKERS', 1))
+        snapshot_mode = os.environ.get('SNAPSHOT_MODE', 'select')
+        probe = os.environ.get('EXTRACTION_PROBE') == '1'
+        layout = os.environ.get('INGESTION_LAYOUT', 'flat')
+        handoff = os.environ.get('PIPELINE_HANDOFF', 'rename')
+
+        watermarks = get_watermarks(s3_ingestion_bucket_name)
+        objects = get_bucket_objects(s3_ingestion_bucket_name, max_keys=1)
+
+        def get_start(table):
+            # a table without a watermark, e.g. one added since the first run, is extracted in full
+            watermark = watermarks.get(table)
+            if watermark and objects is not None:
+                return watermark['last_updated'], watermark['id']
+            return None, None
+
+        def get_changed_tables(conn):
+            probed = [table for table in lst_table_names if get_start(table)[0] is not None]
+            if not probe or not probed:
+                return lst_table_names
+
+            changes = probe_tables(conn, [(table,) + get_start(table) for table in probed])
+            put_table_metrics({table: {'ChangedRows': row_count}
+                               for table, (row_count, _) in changes.items()})
+
+            unchanged = [table for table in probed if changes[table][0] == 0]
+            if unchanged:
+                logger.info(f"Skipping the unchanged tables {', '.join(unchanged)}")
+            return [table for table in lst_table_names if table not in unchanged]
+
+        def extract(conn, table, boto3_session=None):
+            start_time, last_id = get_start(table)
+
+            row_count, new_watermark = extract_table(
+                conn,
+                table,
+                s3_ingestion_bucket_name,
+                folder_prefix,
+                start_time,
+                last_id,
+                extraction_mode,
+                batch_size,
+                boto3_session,
+                snapshot_mode,
+                layout)
+
+            if row_count == 0 and start_time is None:
+                logger.info(f"No data within {table} up to {datetime.now()}")
+            elif row_count == 0:
+                logger.info(
+                    f"No new data within {table} in from {start_time} to {datetime.now()}")
 
-        conn = connect_to_server(credentials)
-        cursor = conn.cursor()
+            return table, new_watermark, row_count
 
-        objects = get_bucket_objects(s3_ingestion_bucket_name)
-        for table in lst_table_names:
-            rows = get_all_table_rows(
-                cursor, table) if objects is None else get_latest_table_rows(
-                cursor, table, datetime_start)
-            if len(rows) > 0:
-                column_names = get_column_names(cursor)
-                df = pd.DataFrame(rows, columns=column_names)
+        if max_workers > 1:
+            pool = ConnectionPool(
+                get_secret("pg-oltp-db"),
+                max_workers,
+                refresh_credentials=lambda: get_secret("pg-oltp-db", refresh=True))
 
-                wr.s3.to_parquet(
-                    df=df, path=f"s3://{s3_ingestion_bucket_name}/{folder_prefix}/{table}.parquet")
+            def extract_with_pool(table):
+                with pool.connection() as pooled_conn:
+                    return extract(pooled_conn, table, boto3.Session())
 
-            else:
-                logger.info(
-                    f"No new data within {table} in from {datetime_start} to {datetime.now()}")
+            with pool.connection() as probe_conn:
+                tables = get_changed_tables(probe_conn)
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(
+                    extract_with_pool, tables))
+
+        else:
+            with totesys_connection.transaction() as conn:
+                results = [extract(conn, table) for table in get_changed_tables(conn)]
+
+        files = [get_extraction_key(folder_prefix, table, layout)
+                 for table, _, row_count in results if row_count > 0]
+        if files:
+            # published last, so the transformation never sees a run before all its files exist
+            publish_extraction(s3_ingestion_bucket_name, folder_prefix, files, layout, handoff)
+
+        new_watermarks = dict(watermarks)
+        for table, watermark, _ in results:
+            if watermark:
+                new_watermarks[table] = watermark
+
+        if new_watermarks != watermarks:
+            save_watermarks(s3_ingestion_bucket_name, new_watermarks)
 
     except Exception as err:
         logger.error(err)
     finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+        if pool:
+            pool.close_all()
 
 
 if __name__ == "__main__":
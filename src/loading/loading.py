@@ -1,14 +1,40 @@
 import awswrangler as wr
+import io
 import logging
+import os
+import time
 from psycopg2.sql import SQL, Identifier
 import pandas as pd
 
 from utils.get_secret import get_secret
 from utils.connect_to_server import connect_to_server
+from utils.warm_connection import WarmConnection
 from utils.get_bucket_name import get_bucket_name
-from utils.get_bucket_objects import get_bucket_objects
+from utils.get_bucket_objects import get_bucket_objects, get_bucket_prefixes
 from utils.renaming_folders import rename_word_in_folder_name
 from utils.move_s3_objects import move_s3_objects_to_new_folder
+from utils.run_ledger import RunLedger
+
+warehouse_tables = [
+    'dim_date',
+    'dim_staff',
+    'dim_location',
+    'dim_design',
+    'dim_currency',
+    'dim_payment_type',
+    'dim_transaction',
+    'dim_counterparty',
+    'fact_sales_order',
+    'fact_payment',
+    'fact_purchase_order']
+
+warehouse_schema = 'project_team_6'
+
+# id column and surrogate record id column of each fact table
+fact_table_keys = {
+    'fact_payment': ('payment_id', 'payment_record_id'),
+    'fact_purchase_order': ('purchase_order_id', 'purchase_record_id'),
+    'fact_sales_order': ('sales_order_id', 'sales_record_id')}
 
 
 def insert_transformed_data_into_warehouse(
@@ -27,18 +53,7 @@ def insert_transformed_data_into_warehouse(
 
     logger = logging.getLogger('Loading')
     try:
-        if table_name not in [
-            'dim_date',
-            'dim_staff',
-            'dim_location',
-            'dim_design',
-            'dim_currency',
-            'dim_payment_type',
-            'dim_transaction',
-            'dim_counterparty',
-            'fact_sales_order',
-            'fact_payment',
-                'fact_purchase_order']:
+        if table_name not in warehouse_tables:
             raise Exception('Invalid Table Name')
 
         placeholders = ", ".join(["%s"] * len(column_names))
@@ -47,16 +62,103 @@ def insert_transformed_data_into_warehouse(
 
         cursor.executemany(sql_statement, value_list)
 
-        if table_name == 'fact_payment':
-            cursor.execute(
-                'DELETE FROM project_team_6.fact_payment a USING project_team_6.fact_payment b WHERE a.payment_record_id > b.payment_record_id AND a.payment_id = b.payment_id;')
+        if table_name in fact_table_keys:
+            id_index = [column.string for column in column_names].index(
+                fact_table_keys[table_name][0])
+            deduplicate_fact_table(cursor, table_name, list(
+                {values[id_index] for values in value_list}))
 
-        if table_name == 'fact_purchase_order':
-            cursor.execute('DELETE FROM project_team_6.fact_purchase_order a USING project_team_6.fact_purchase_order b WHERE a.purchase_record_id > b.purchase_record_id AND a.purchase_order_id = b.purchase_order_id;')
+    except Exception as err:
+        logger.error(err)
+        raise Exception
+
+
+def deduplicate_fact_table(cursor, table_name, ids):
+    '''
+    This function will take 3 arguments:
+    cursor - Database Cursor
+    table_name - Name of the table data has been inserted into
+    ids - List of the ids (sales_order_id, payment_id or purchase_order_id) of the rows that have been inserted
+
+    If the table is a fact table, it will delete every row with one of the given ids that has the same id as an older row in the table.
+    Only rows with the given ids are touched, so with the indexes of sql/warehouse_fact_indexes.sql the cost depends on the size of the batch and not of the table. Nothing will be returned.
+    '''
+
+    if table_name not in fact_table_keys or len(ids) == 0:
+        return
+
+    id_column, record_id_column = fact_table_keys[table_name]
+    cursor.execute(SQL("DELETE FROM {table} a USING {table} b WHERE a.{record_id} > b.{record_id} AND a.{id} = b.{id} AND a.{id} = ANY(%s);").format(
+        table=Identifier(warehouse_schema, table_name),
+        record_id=Identifier(record_id_column),
+        id=Identifier(id_column)), (list(ids),))
+
+
+def format_dataframe_for_copy(data):
+    '''
+    This function will take 1 argument:
+    data - DataFrame of values to insert
+
+    It will convert and return the DataFrame as CSV text for COPY FROM, with NA or Null values written as \\N.
+    Float columns only holding whole numbers (integer columns containing nulls) are written without a decimal point so they can be copied into integer columns.
+    '''
+
+    data = data.copy(deep=False)
+
+    for column in data.columns:
+        values = data[column]
+        if pd.api.types.is_float_dtype(values):
+            not_null = values.dropna()
+            if (not_null % 1 == 0).all():
+                data[column] = values.astype('Int64')
+
+    buffer = io.StringIO()
+    data.to_csv(buffer, index=False, header=False, na_rep='\\N')
+    buffer.seek(0)
+    return buffer
 
-        if table_name == 'fact_sales_order':
-            cursor.execute(
-                'DELETE FROM project_team_6.fact_sales_order a USING project_team_6.fact_sales_order b WHERE a.sales_record_id > b.sales_record_id AND a.sales_order_id = b.sales_order_id;')
+
+def copy_transformed_data_into_warehouse(cursor, table_name, data):
+    '''
+    This function will take 3 arguments:
+    cursor - Database Cursor
+    table_name - Name of the table you want to insert data into
+    data - DataFrame of the rows to insert, its column names must match the table
+
+    It will COPY the rows into a temporary staging table and then move them into the table with a single INSERT ... SELECT ... ON CONFLICT DO NOTHING.
+    It returns the number of rows copied.
+
+    An exception will be raised if the table does not exist.
+    '''
+
+    logger = logging.getLogger('Loading')
+    try:
+        if table_name not in warehouse_tables:
+            raise Exception('Invalid Table Name')
+
+        staging_table = Identifier(f'staging_{table_name}')
+        columns = SQL(',').join(
+            format_column_names_for_sql_query(data.columns.tolist()))
+
+        cursor.execute(SQL("DROP TABLE IF EXISTS {staging};").format(
+            staging=staging_table))
+        cursor.execute(SQL("CREATE TEMP TABLE {staging} AS SELECT {columns} FROM {table} WITH NO DATA;").format(
+            staging=staging_table, columns=columns, table=Identifier(table_name)))
+
+        cursor.copy_expert(SQL("COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N');").format(
+            staging=staging_table, columns=columns), format_dataframe_for_copy(data))
+
+        cursor.execute(SQL("INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} ON CONFLICT DO NOTHING;").format(
+            table=Identifier(table_name), columns=columns, staging=staging_table))
+
+        if table_name in fact_table_keys:
+            deduplicate_fact_table(cursor, table_name, data[fact_table_keys[table_name][0]].dropna(
+            ).unique().tolist())
+
+        cursor.execute(SQL("DROP TABLE {staging};").format(
+            staging=staging_table))
+
+        return len(data)
 
     except Exception as err:
         logger.error(err)
@@ -107,6 +209,33 @@ def format_values_for_sql_query(values):
         raise Exception
 
 
+def format_dataframe_for_sql_query(data):
+    '''
+    This function will take 1 argument:
+    data - DataFrame of values to insert
+
+    It will convert and return the DataFrame as a list of row tuples ready to be passed to executemany.
+    NA or Null values are converted to None one column at a time with vectorised operations, so no per-value Python call is made.
+
+    It will raise an exception if something goes wrong.
+    '''
+
+    logger = logging.getLogger("Loading")
+
+    try:
+        columns = []
+        for column in data.columns:
+            values = data[column].to_numpy(dtype=object)
+            values[data[column].isna().to_numpy()] = None
+            columns.append(values)
+
+        return list(zip(*columns))
+
+    except Exception as err:
+        logger.error(err)
+        raise Exception
+
+
 def rename_folder_in_s3_bucket_once_loaded(
         folder_name, object_keys, bucket_name):
     '''
@@ -138,63 +267,109 @@ def rename_folder_in_s3_bucket_once_loaded(
         raise Exception
 
 
-def handler(event, context):
+def connect_to_warehouse():
+    '''
+    This function takes no arguments.
 
-    cursor = None
-    db = None
+    It opens a connection to the data warehouse with the 'pg-olap-db' secret. If connecting
+    fails the secret is fetched again, bypassing the cache, and the connection is retried once
+    in case the password has been rotated.
+
+    It returns the psycopg2 connection.
+    '''
+
+    secrets = get_secret("pg-olap-db")
+    try:
+        return connect_to_server(secrets)
+    except Exception:
+        refreshed_secrets = get_secret("pg-olap-db", refresh=True)
+        if refreshed_secrets == secrets:
+            raise
+        return connect_to_server(refreshed_secrets)
+
+
+# kept open across warm invocations, see utils/warm_connection.py
+warehouse_connection = WarmConnection(connect_to_warehouse)
+
+
+def handler(event, context):
 
     try:
         logger = logging.getLogger("Loading")
-        secrets = get_secret("pg-olap-db")
-        db = connect_to_server(secrets)
+        # connecting first, so a connection problem fails the invocation before anything is read
+        warehouse_connection.get_connection()
 
-        db.autocommit = True
-        cursor = db.cursor()
+        loading_mode = os.environ.get('LOADING_MODE', 'insert')
+        # 'manifest' reads the runs to load from the RunLedger instead of listing the
+        # processed folders, which are then never renamed
+        handoff = os.environ.get('PIPELINE_HANDOFF', 'rename')
 
         bucket_name = get_bucket_name('nc-project-processed-data')
-        object_keys = get_bucket_objects(bucket_name)
-        files_to_load = [file for file in object_keys if 'processed' in file]
 
-        if len(files_to_load) > 0:
-            for file in files_to_load:
+        if handoff == 'manifest':
+            ledger = RunLedger(get_bucket_name('nc-project-ingestion-zone-'))
+            pending_runs = [(run, ledger.get_stage_files(run, 'transformation'))
+                            for run in ledger.get_pending('loading')]
+        else:
+            pending_runs = [(folder_name, None) for folder_name in get_bucket_prefixes(
+                bucket_name, prefix='totesys_processed_data_')]
 
-                folder_name, file_path = file.split('/')[0], file.split('/')[1]
-                table_name = file_path.split('.')[0]
-                data = wr.s3.read_parquet(path=f's3://{bucket_name}/{file}')
+        if len(pending_runs) == 0:
+            logger.info('No new data to load.')
+            return 'No new data to load.'
 
-                data_list = data.values.tolist()
-                headers = data.columns.tolist()
+        for folder_name, files_to_load in pending_runs:
+            if files_to_load is None:
+                files_to_load = get_bucket_objects(
+                    bucket_name, prefix=f'{folder_name}/') or []
 
-                for table_to_insert in ['dim_', 'fact_']:
-                    if table_name.startswith(table_to_insert):
-                        logger.info(f'Inserting into {table_name}')
+            # every folder is loaded in one transaction, so a failure rolls back the tables
+            # already loaded from it and the whole folder is loaded again on the next run
+            with warehouse_connection.transaction() as db:
+                cursor = db.cursor()
 
-                        column_names = format_column_names_for_sql_query(
-                            headers)
-                        value_lists = [
-                            format_values_for_sql_query(values) for values in data_list]
+                try:
+                    for file in files_to_load:
 
-                        insert_transformed_data_into_warehouse(
-                            cursor, table_name, column_names, value_lists)
+                        table_name = file.split('/')[1].split('.')[0]
+                        data = wr.s3.read_parquet(path=f's3://{bucket_name}/{file}')
 
-            rename_folder_in_s3_bucket_once_loaded(
-                folder_name, files_to_load, bucket_name)
+                        for table_to_insert in ['dim_', 'fact_']:
+                            if table_name.startswith(table_to_insert):
+                                logger.info(f'Inserting into {table_name}')
+                                start = time.perf_counter()
 
-        else:
-            logger.info('No new data to load.')
-            return 'No new data to load.'
+                                if loading_mode == 'copy':
+                                    copy_transformed_data_into_warehouse(
+                                        cursor, table_name, data)
+
+                                else:
+                                    column_names = format_column_names_for_sql_query(
+                                        data.columns.tolist())
+                                    value_lists = format_dataframe_for_sql_query(
+                                        data)
+
+                                    insert_transformed_data_into_warehouse(
+                                        cursor, table_name, column_names, value_lists)
+
+                                seconds = time.perf_counter() - start
+                                logger.info(
+                                    f'Loaded {len(data)} rows into {table_name} in {seconds:.2f}s ({len(data) / max(seconds, 1e-9):.0f} rows/sec)')
+
+                finally:
+                    cursor.close()
+                    logger.info('Curser Closed')
+
+            # only marked as loaded once the transaction has been committed
+            if handoff == 'manifest':
+                ledger.complete_stage(folder_name, 'loading')
+            else:
+                rename_folder_in_s3_bucket_once_loaded(
+                    folder_name, files_to_load, bucket_name)
 
     except Exception as err:
         logger.error(err)
         raise Exception
 
-    finally:
-        if cursor:
-            cursor.close()
-            logger.info('Curser Closed')
-        if db:
-            db.close()
-            logger.info('DB Connection Closed')
-
 
 # handler('hello', 'world')
@@ -1,24 +1,37 @@
-from transformation_utils.create_dim_counterparty import create_dim_counterparty
-from transformation_utils.create_dim_currency import create_dim_currency
-from transformation_utils.create_dim_date import create_dim_date
-from transformation_utils.create_dim_location import create_dim_location
-from transformation_utils.create_dim_staff import create_dim_staff
-from transformation_utils.create_dim_design import create_dim_design
-from transformation_utils.create_fact_sales_order import create_fact_sales_order
-from transformation_utils.create_fact_payment import create_fact_payment
-from transformation_utils.create_fact_purchase_order import create_fact_purchase_order
-from transformation_utils.create_dim_transaction import create_dim_transaction
-from transformation_utils.create_dim_payment_type import create_dim_payment_type
+from transformation_utils.create_dim_counterparty import (create_dim_counterparty, counterparty_columns,
+                                                          counterparty_address_columns)
+from transformation_utils.create_dim_currency import create_dim_currency, currency_columns
+from transformation_utils.create_dim_date import (create_dim_date, sales_order_date_columns,
+                                                  payment_date_columns, purchase_order_date_columns)
+from transformation_utils.create_dim_location import create_dim_location, location_address_columns
+from transformation_utils.create_dim_staff import create_dim_staff, staff_columns, department_columns
+from transformation_utils.create_dim_design import create_dim_design, design_columns
+from transformation_utils.create_fact_sales_order import create_fact_sales_order, sales_order_columns
+from transformation_utils.create_fact_payment import create_fact_payment, payment_columns
+from transformation_utils.create_fact_purchase_order import create_fact_purchase_order, purchase_order_columns
+from transformation_utils.create_dim_transaction import create_dim_transaction, transaction_columns
+from transformation_utils.create_dim_payment_type import create_dim_payment_type, payment_type_columns
+from transformation_utils.arrow_builders import arrow_builders
 from utils.get_bucket_objects import get_bucket_objects
 from utils.get_bucket_name import get_bucket_name
 from utils.get_folder_with_files import get_folder_with_files
+from utils.get_folder_batches import (get_folder_batches, get_batch_table_files, get_extraction_time,
+                                      get_table_file_name)
 from utils.renaming_folders import rename_word_in_folder_name
 from utils.move_s3_objects import move_s3_objects_to_new_folder
+from utils.transformation_context import TransformationContext
+from utils.run_dag import run_dag
+from utils.reference_snapshot import get_reference_snapshot
+from utils.partitioned_layout import get_manifest_key, get_pending_runs, get_partition_runs
+from utils.run_ledger import RunLedger
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import os
 
 
 def get_file_folder_name(end_prefix, files):
-    folder_name = [file for file in files if end_prefix in file]
+    folder_name = [file for file in files if get_table_file_name(file) == end_prefix]
 
     if len(folder_name) > 0:
         return folder_name[0]
@@ -26,7 +39,8 @@ def get_file_folder_name(end_prefix, files):
         return None
 
 
-def transform(folder_name, files, extraction_bucket, processed_bucket):
+def transform(folder_name, files, extraction_bucket, processed_bucket, max_workers=4, context=None, engine='pandas',
+              reference_snapshots=False):
 
     logger = logging.getLogger('Transformation')
 
@@ -47,81 +61,215 @@ def transform(folder_name, files, extraction_bucket, processed_bucket):
     processed_folder_name = rename_word_in_folder_name(
         folder_name, "extraction", "processed")
 
+    # every source file is read once, however many builders use it
+    context = context if context else TransformationContext()
+    tasks = {}
+    # the columns of every file the builders need, so each file is read once with all of them
+    read_columns = {}
+
+    def read(key):
+        try:
+            context.prefetch(extraction_bucket, key, read_columns[key])
+        except Exception as err:
+            # the builders read the file again themselves and handle the error as they see fit
+            logger.warning(f"Could not read {key}: {err}")
+
+    def read_table(key):
+        try:
+            context.prefetch_table(extraction_bucket, key)
+        except Exception as err:
+            logger.warning(f"Could not read {key}: {err}")
+
+    def add_reference(snapshot, key, columns):
+        # the snapshot is brought up to date before the builders joining to it run
+        name = f"reference {snapshot.table_name}"
+        dependencies = []
+
+        if key:
+            held = read_columns.setdefault(key, [])
+            held.extend(column for column in columns if column not in held)
+            tasks.setdefault(f"read {key}", (lambda: read(key), []))
+            dependencies.append(f"read {key}")
+
+        def update():
+            if not snapshot.exists():
+                snapshot.seed(extraction_bucket)
+            sources = context.get_sources(extraction_bucket, key) if key else []
+            if len(sources) > 1:
+                # a coalesced table keeps the first version of each row, the snapshot the newest
+                snapshot.update_from_extractions(extraction_bucket, sources)
+            elif key:
+                snapshot.update(context.get_df(extraction_bucket, key, columns),
+                                get_extraction_time(folder_name))
+
+        tasks[name] = (update, dependencies)
+        return name
+
+    def add_builder(name, builder, keys, columns, references=None):
+        # the Arrow engine replaces the pandas builders it has an equivalent of, the joins to a
+        # reference snapshot only exist in the pandas builders
+        references = references or {}
+        use_arrow = engine == 'arrow' and name in arrow_builders and not references
+        if use_arrow:
+            builder = arrow_builders[name]
+        else:
+            for key, key_columns in zip(keys, columns):
+                if key:
+                    held = read_columns.setdefault(key, [])
+                    held.extend(column for column in key_columns if column not in held)
+
+        # the builder starts as soon as every file it reads has been loaded
+        inputs = [key for key in keys if key]
+        for key in inputs:
+            if use_arrow:
+                tasks.setdefault(f"read table {key}", (lambda key=key: read_table(key), []))
+            else:
+                tasks.setdefault(f"read {key}", (lambda key=key: read(key), []))
+
+        snapshots = {argument: snapshot for argument, (snapshot, _) in references.items()}
+        dependencies = [f"read table {key}" if use_arrow else f"read {key}" for key in inputs]
+        dependencies.extend(task for _, task in references.values())
+        tasks[name] = (
+            lambda: builder(processed_folder_name, *keys,
+                            extraction_bucket, processed_bucket, context=context, **snapshots),
+            dependencies)
+
     if sales_order:
-        create_fact_sales_order(
-            processed_folder_name,
-            sales_order,
-            extraction_bucket,
-            processed_bucket)
+        add_builder('fact_sales_order', create_fact_sales_order, [sales_order],
+                    [sales_order_columns])
 
     if address:
-        create_dim_location(
-            processed_folder_name,
-            address,
-            extraction_bucket,
-            processed_bucket)
+        add_builder('dim_location', create_dim_location, [address],
+                    [location_address_columns])
 
-    if counterparty and address:
-        create_dim_counterparty(
-            processed_folder_name,
-            counterparty,
-            address,
-            extraction_bucket,
-            processed_bucket)
+    if reference_snapshots:
+        # counterparties and staff are joined to the latest addresses and departments, so they
+        # are built whether or not those were extracted with them
+        address_snapshot = get_reference_snapshot(
+            processed_bucket, 'address', 'address_id', counterparty_address_columns)
+        department_snapshot = get_reference_snapshot(
+            processed_bucket, 'department', 'department_id', department_columns)
 
-    if staff and department:
-        create_dim_staff(
-            processed_folder_name,
-            staff,
-            department,
-            extraction_bucket,
-            processed_bucket)
+        address_task = add_reference(address_snapshot, address, counterparty_address_columns)
+        department_task = add_reference(department_snapshot, department, department_columns)
+
+        if counterparty:
+            add_builder('dim_counterparty', create_dim_counterparty,
+                        [counterparty, None], [counterparty_columns, []],
+                        {'address_snapshot': (address_snapshot, address_task)})
+
+        if staff:
+            add_builder('dim_staff', create_dim_staff, [staff, None],
+                        [staff_columns, []],
+                        {'department_snapshot': (department_snapshot, department_task)})
+
+    else:
+        if counterparty and address:
+            add_builder('dim_counterparty', create_dim_counterparty,
+                        [counterparty, address],
+                        [counterparty_columns, counterparty_address_columns])
+
+        if staff and department:
+            add_builder('dim_staff', create_dim_staff, [staff, department],
+                        [staff_columns, department_columns])
 
     if design:
-        create_dim_design(processed_folder_name, design,
-                          extraction_bucket, processed_bucket)
+        add_builder('dim_design', create_dim_design, [design], [design_columns])
+
     if currency:
-        create_dim_currency(
-            processed_folder_name,
-            currency,
-            extraction_bucket,
-            processed_bucket)
+        add_builder('dim_currency', create_dim_currency, [currency], [currency_columns])
 
     if sales_order or payment or purchase_order:
-        create_dim_date(
-            processed_folder_name,
-            sales_order,
-            payment,
-            purchase_order,
-            extraction_bucket,
-            processed_bucket)
+        add_builder('dim_date', create_dim_date,
+                    [sales_order, payment, purchase_order],
+                    [sales_order_date_columns, payment_date_columns, purchase_order_date_columns])
 
     if payment:
-        create_fact_payment(processed_folder_name, payment,
-                            extraction_bucket, processed_bucket)
+        add_builder('fact_payment', create_fact_payment, [payment], [payment_columns])
 
     if purchase_order:
-        create_fact_purchase_order(processed_folder_name, purchase_order,
-                                   extraction_bucket, processed_bucket)
+        add_builder('fact_purchase_order', create_fact_purchase_order,
+                    [purchase_order], [purchase_order_columns])
 
     if transaction:
-        create_dim_transaction(processed_folder_name, transaction,
-                               extraction_bucket, processed_bucket)
+        add_builder('dim_transaction', create_dim_transaction, [transaction],
+                    [transaction_columns])
 
     if payment_type:
-        create_dim_payment_type(processed_folder_name, payment_type,
-                                extraction_bucket, processed_bucket)
+        add_builder('dim_payment_type', create_dim_payment_type, [payment_type],
+                    [payment_type_columns])
+
+    run_dag(tasks, max_workers)
 
     logger.info(f"Folder {folder_name} has been transformed.")
 
-    new_folder_name = rename_word_in_folder_name(
-        folder_name, "extraction", "transformed")
 
-    move_s3_objects_to_new_folder(
-        files,
-        folder_name,
-        new_folder_name,
-        extraction_bucket)
+def transform_batch(batch, extraction_bucket, processed_bucket, max_workers=4, engine='pandas',
+                    reference_snapshots=False, layout='flat', mark_transformed=True, handoff='rename'):
+    """
+    Transform a batch of consecutive extraction folders as if they were one folder.
+
+    The extractions of every table are coalesced into one DataFrame, keeping the first
+    version of each row, which is the one the loading keeps when the folders are transformed
+    one by one. The result is written to the processed folder of the newest folder
+    of the batch. Every folder of the batch is then renamed to 'transformed'.
+
+    Parameters:
+    - batch: A list of (folder_name, files) tuples ordered oldest first, see get_folder_batches.
+    - extraction_bucket: The name of the ingestion bucket.
+    - processed_bucket: The name of the processed data bucket.
+    - max_workers: The number of builders to run at a time.
+    - engine: 'arrow' to build the dimension tables with pyarrow, otherwise 'pandas'.
+    - reference_snapshots: Whether to join counterparties and staff to the reference snapshots.
+    - layout: 'hive' if the folders are runs of the partitioned layout, whose manifests are
+      renamed instead of their files.
+    - mark_transformed: False to leave the folders as they are, e.g. when backfilling.
+    - handoff: 'manifest' to record the transformation of every folder in the RunLedger and
+      hand the processed files over to the loading, instead of renaming anything. This is done
+      whatever 'mark_transformed' is, so the output of a backfill is loaded too.
+
+    This function does not return anything.
+    """
+
+    folder_name, files = batch[-1]
+    context = None
+
+    if len(batch) > 1:
+        context = TransformationContext()
+        files = [context.coalesce(extraction_bucket, keys, f"{file_name.split('.')[0]}_id")
+                 for file_name, keys in get_batch_table_files(batch).items()]
+
+    transform(folder_name, files, extraction_bucket,
+              processed_bucket, max_workers, context, engine, reference_snapshots)
+
+    # backfilled runs are not renamed, but still have to reach the loading through the ledger
+    if not mark_transformed and handoff != 'manifest':
+        return
+
+    for folder_name, files in batch:
+        if handoff == 'manifest':
+            # only the newest folder of a coalesced batch has processed files to load
+            processed_folder_name = rename_word_in_folder_name(
+                folder_name, "extraction", "processed")
+            processed_files = get_bucket_objects(
+                processed_bucket, prefix=f"{processed_folder_name}/") or []
+            RunLedger(extraction_bucket).complete_stage(
+                folder_name, 'transformation', processed_files,
+                next_stage='loading' if processed_files else None)
+            continue
+
+        new_folder_name = rename_word_in_folder_name(
+            folder_name, "extraction", "transformed")
+
+        if layout == 'hive':
+            # the partitions are never moved, only the manifest of the run is renamed
+            files = [get_manifest_key(folder_name)]
+
+        move_s3_objects_to_new_folder(
+            files,
+            folder_name,
+            new_folder_name,
+            extraction_bucket)
 
 
 def handler(event, context):
@@ -132,19 +280,80 @@ def handler(event, context):
     extraction_bucket = get_bucket_name("nc-project-ingestion-zone-")
     processed_bucket = get_bucket_name("nc-project-processed-data-")
 
-    files_in_extraction_bucket = get_bucket_objects(extraction_bucket)
-    # grouping files by folder name but only untransformed data
-    untransformed_dictionary = get_folder_with_files(
-        "transformed", files_in_extraction_bucket)
+    # 'hive' reads the runs of the partitioned layout from their manifests
+    layout = os.environ.get('INGESTION_LAYOUT', 'flat')
+    # 'manifest' reads the pending runs from the RunLedger and records their progress in it
+    handoff = os.environ.get('PIPELINE_HANDOFF', 'rename')
+    # an event with 'backfill_start' and 'backfill_end' dates transforms again every run
+    # extracted between them, reading only their partitions
+    backfill = layout == 'hive' and isinstance(event, dict) and 'backfill_start' in event
+
+    if backfill:
+        untransformed_dictionary = get_partition_runs(
+            extraction_bucket,
+            date.fromisoformat(event['backfill_start']),
+            date.fromisoformat(event['backfill_end']))
+    elif handoff == 'manifest':
+        ledger = RunLedger(extraction_bucket)
+        untransformed_dictionary = {
+            run: ledger.get_stage_files(run, 'extraction')
+            for run in ledger.get_pending('transformation')}
+    elif layout == 'hive':
+        untransformed_dictionary = get_pending_runs(extraction_bucket)
+    else:
+        # only untransformed extraction folders are listed, the bucket also holds
+        # transformed folders and extraction state
+        files_in_extraction_bucket = get_bucket_objects(
+            extraction_bucket, prefix="totesys_extraction_data_") or []
+        # grouping files by folder name but only untransformed data
+        untransformed_dictionary = get_folder_with_files(
+            "transformed", files_in_extraction_bucket)
 
     if len(untransformed_dictionary) == 0:
         logger.info(
             "There are no untransformed files in the extraction bucket.")
         return
 
+    # the builders of a folder run concurrently, at most this many at a time
+    max_workers = int(os.environ.get('TRANSFORMATION_MAX_WORKERS', 4))
+    # a backlog can be worked through several folders at a time, and small
+    # consecutive folders can be coalesced into one transform
+    folder_workers = int(os.environ.get('TRANSFORMATION_FOLDER_WORKERS', 1))
+    coalesce_folders = int(
+        os.environ.get('TRANSFORMATION_COALESCE_FOLDERS', 1))
+    # 'arrow' builds the dimension tables without converting them to pandas
+    engine = os.environ.get('TRANSFORMATION_ENGINE', 'pandas')
+    # '1' keeps snapshots of the latest addresses and departments in the processed bucket,
+    # so counterparties and staff are transformed even when extracted without them
+    reference_snapshots = os.environ.get(
+        'TRANSFORMATION_REFERENCE_SNAPSHOTS', '0') == '1'
+
+    batches = get_folder_batches(untransformed_dictionary, coalesce_folders)
+
+    def transform_isolated(batch):
+        # a failed batch stays untransformed and is retried on the next run,
+        # without stopping the others
+        try:
+            transform_batch(batch, extraction_bucket, processed_bucket, max_workers, engine,
+                            reference_snapshots, layout, mark_transformed=not backfill,
+                            handoff=handoff)
+            return []
+        except Exception as err:
+            logger.error(
+                f"Could not transform {[folder for folder, _ in batch]}: {err}")
+            return [folder for folder, _ in batch]
+
     # Transforming contents in each folder
-    for folder_name, files in untransformed_dictionary.items():
-        transform(folder_name, files, extraction_bucket, processed_bucket)
+    if folder_workers > 1:
+        with ThreadPoolExecutor(max_workers=folder_workers) as executor:
+            failed = list(executor.map(transform_isolated, batches))
+    else:
+        failed = [transform_isolated(batch) for batch in batches]
+
+    failed_folders = [folder for folders in failed for folder in folders]
+    if failed_folders:
+        raise Exception(
+            f"{len(failed_folders)} folders could not be transformed: {failed_folders}")
 
 
 if __name__ == "__main__":
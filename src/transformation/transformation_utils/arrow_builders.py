@@ -0,0 +1,260 @@
+import logging
+import pyarrow as pa
+from utils.arrow_tables import (get_table, put_table, drop_columns, rename_columns,
+                                select_columns, cast_columns, map_values, left_join)
+
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger()
+
+# The functions below build the same dimension tables as their create_dim_* counterparts, but
+# entirely on pyarrow Tables: the Parquet files are never converted to pandas DataFrames.
+# They are used instead of the pandas builders when TRANSFORMATION_ENGINE is 'arrow'.
+
+
+def create_dim_currency_arrow(new_folder, key, bucket_one, bucket_two, context=None):
+    """
+    Create 'dim_currency' like create_dim_currency, using pyarrow.
+
+    Parameters:
+        new_folder (str): The name of the folder where the Parquet file will be stored in 'bucket_two'.
+        key (str): The key name for the currency table in 'bucket_one'.
+        bucket_one (str): The name of the S3 bucket containing the currency table.
+        bucket_two (str): The name of the target S3 bucket where the 'dim_currency.parquet' file will be stored.
+
+    Returns:
+        None
+    """
+    try:
+        currency = get_table(bucket_one, key, context)
+
+        currency = drop_columns(currency, ['last_updated', 'created_at'])
+
+        convert_currency_code = {
+            'GBP': 'British Pound',
+            'USD': 'US Dollar',
+            'EUR': 'Euro'
+        }
+
+        currency = currency.append_column(
+            'currency_name', map_values(currency.column('currency_code'), convert_currency_code))
+
+        put_table(currency, bucket_two, f"{new_folder}/dim_currency.parquet")
+
+        logging.info("dim_currency.parquet has been successfully created.")
+
+    except Exception as e:
+        logging.info("An error occurred:")
+        logging.error(str(e))
+        raise
+
+
+def create_dim_design_arrow(new_folder, key, bucket_one, bucket_two, context=None):
+    """
+    Create 'dim_design' like create_dim_design, using pyarrow.
+
+    Parameters:
+        new_folder (str): The name of the folder where the Parquet file will be stored in 'bucket_two'.
+        key (str): The key name for the design table in 'bucket_one'.
+        bucket_one (str): The name of the S3 bucket containing the design table.
+        bucket_two (str): The name of the target S3 bucket where the 'dim_design.parquet' file will be stored.
+
+    Returns:
+        None
+    """
+    try:
+        design = get_table(bucket_one, key, context)
+
+        design = drop_columns(design, ['last_updated', 'created_at'])
+
+        put_table(design, bucket_two, f"{new_folder}/dim_design.parquet")
+
+        logging.info("dim_design.parquet has been successfully created.")
+
+    except Exception as e:
+        logging.info("An error occurred:")
+        logging.error(str(e))
+        raise
+
+
+def create_dim_location_arrow(new_folder, address_key, bucket_one, bucket_two, context=None):
+    """
+    Create 'dim_location' like create_dim_location, using pyarrow.
+
+    Parameters:
+        new_folder (str): The name of the folder where the Parquet file will be stored in 'bucket_two'.
+        address_key (str): The key name for the address table in 'bucket_one'.
+        bucket_one (str): The name of the S3 bucket containing the address table.
+        bucket_two (str): The name of the target S3 bucket where the 'dim_location.parquet' file will be stored.
+
+    Returns:
+        None
+    """
+    try:
+        address = get_table(bucket_one, address_key, context)
+
+        location = rename_columns(address, {'address_id': 'location_id'})
+        location = drop_columns(location, ['last_updated', 'created_at'])
+
+        put_table(location, bucket_two, f"{new_folder}/dim_location.parquet")
+
+        logging.info("dim_location.parquet has been successfully created.")
+
+    except Exception as e:
+        logging.info("An error occurred:")
+        logging.error(str(e))
+        raise
+
+
+def create_dim_counterparty_arrow(new_folder, counterparty_key, address_key, bucket_one, bucket_two, context=None):
+    """
+    Create 'dim_counterparty' like create_dim_counterparty, using pyarrow.
+
+    Parameters:
+        new_folder (str): The name of the folder where the Parquet file will be stored in 'bucket_two'.
+        counterparty_key (str): The key name for the counterparty table in 'bucket_one'.
+        address_key (str): The key name for the address table in 'bucket_one'.
+        bucket_one (str): The name of the S3 bucket containing the counterparty and address tables.
+        bucket_two (str): The name of the target S3 bucket where the 'dim_counterparty.parquet' file will be stored.
+
+    Returns:
+        None
+    """
+    try:
+        counterparty = get_table(bucket_one, counterparty_key, context)
+        address = get_table(bucket_one, address_key, context)
+
+        counterparty = drop_columns(counterparty, ['commercial_contact',
+                                                   'delivery_contact',
+                                                   'created_at',
+                                                   'last_updated'])
+        address = drop_columns(address, ['created_at', 'last_updated'])
+
+        dim_counterparty = left_join(
+            counterparty, address, 'legal_address_id', 'address_id')
+        dim_counterparty = drop_columns(dim_counterparty, ['legal_address_id', 'address_id'])
+
+        dim_counterparty = rename_columns(dim_counterparty, {
+            'address_line_1': 'counterparty_legal_address_line_1',
+            'address_line_2': 'counterparty_legal_address_line_2',
+            'district': 'counterparty_legal_district',
+            'city': 'counterparty_legal_city',
+            'postal_code': 'counterparty_legal_postal_code',
+            'phone': 'counterparty_legal_phone_number',
+            'country': 'counterparty_legal_country',
+        })
+
+        put_table(dim_counterparty, bucket_two, f"{new_folder}/dim_counterparty.parquet")
+
+        logging.info("dim_counterparty.parquet has been successfully created.")
+
+    except Exception as e:
+        logging.info("An error occurred:")
+        logging.error(str(e))
+        raise
+
+
+def create_dim_staff_arrow(new_folder, staff_key, department_key, bucket_one, bucket_two, context=None):
+    """
+    Create 'dim_staff' like create_dim_staff, using pyarrow.
+
+    Parameters:
+        new_folder (str): The name of the folder where the Parquet file will be stored in 'bucket_two'.
+        staff_key (str): The key name for the staff table in 'bucket_one'.
+        department_key (str): The key name for the department table in 'bucket_one'.
+        bucket_one (str): The name of the S3 bucket containing the staff and department tables.
+        bucket_two (str): The name of the target S3 bucket where the 'dim_staff.parquet' file will be stored.
+
+    Returns:
+        None
+    """
+    try:
+        staff = get_table(bucket_one, staff_key, context)
+        department = get_table(bucket_one, department_key, context)
+
+        staff = drop_columns(staff, ['created_at', 'last_updated'])
+        department = drop_columns(department, ['created_at', 'last_updated', 'manager'])
+
+        dim_staff = left_join(staff, department, 'department_id', 'department_id')
+        dim_staff = drop_columns(dim_staff, ['department_id'])
+
+        put_table(dim_staff, bucket_two, f"{new_folder}/dim_staff.parquet")
+
+        logging.info("dim_staff.parquet has been successfully created.")
+
+    except Exception as e:
+        logging.info("An error occurred:")
+        logging.error(str(e))
+        raise
+
+
+def create_dim_transaction_arrow(new_folder, transaction_key, ingestion_bucket, processed_bucket, context=None):
+    """
+    Create 'dim_transaction' like create_dim_transaction, using pyarrow.
+
+    Parameters:
+        new_folder (str): The name of the folder where the Parquet file will be stored in 'processed_bucket'.
+        transaction_key (str): The key name for the transaction table in 'ingestion_bucket'.
+        ingestion_bucket (str): The name of the S3 bucket containing the transaction table.
+        processed_bucket (str): The name of the target S3 bucket where the 'dim_transaction.parquet' file will be stored.
+
+    Returns:
+        None
+    """
+    try:
+        transaction = get_table(ingestion_bucket, transaction_key, context)
+
+        # the ids are doubles in files written from DataFrames with missing values
+        transaction = cast_columns(transaction, {'sales_order_id': pa.int64(),
+                                                 'purchase_order_id': pa.int64()})
+
+        transaction = select_columns(transaction, [
+            "transaction_id", "transaction_type", "sales_order_id", "purchase_order_id"])
+
+        put_table(transaction, processed_bucket, f"{new_folder}/dim_transaction.parquet")
+
+        logging.info("dim_transaction.parquet has been successfully created.")
+
+    except Exception as e:
+        logging.info("An error occurred:")
+        logging.error(str(e))
+        raise
+
+
+def create_dim_payment_type_arrow(new_folder, payment_type_key, ingestion_bucket, processed_bucket, context=None):
+    """
+    Create 'dim_payment_type' like create_dim_payment_type, using pyarrow.
+
+    Parameters:
+        new_folder (str): The name of the folder where the Parquet file will be stored in 'processed_bucket'.
+        payment_type_key (str): The key name for the payment type table in 'ingestion_bucket'.
+        ingestion_bucket (str): The name of the S3 bucket containing the payment type table.
+        processed_bucket (str): The name of the target S3 bucket where the 'dim_payment_type.parquet' file will be stored.
+
+    Returns:
+        None
+    """
+    try:
+        payment_type = get_table(ingestion_bucket, payment_type_key, context)
+
+        payment_type = select_columns(payment_type, ["payment_type_id", "payment_type_name"])
+
+        put_table(payment_type, processed_bucket, f"{new_folder}/dim_payment_type.parquet")
+
+        logging.info("dim_payment_type.parquet has been successfully created.")
+
+    except Exception as e:
+        logging.info("An error occurred:")
+        logging.error(str(e))
+        raise
+
+
+# the builders of the Arrow engine, by the name of the table they create
+arrow_builders = {
+    'dim_currency': create_dim_currency_arrow,
+    'dim_design': create_dim_design_arrow,
+    'dim_location': create_dim_location_arrow,
+    'dim_counterparty': create_dim_counterparty_arrow,
+    'dim_staff': create_dim_staff_arrow,
+    'dim_transaction': create_dim_transaction_arrow,
+    'dim_payment_type': create_dim_payment_type_arrow
+}
@@ -1,15 +1,21 @@
-import boto3
 import logging
 from utils.get_df import get_df
 from utils.df_merge_tables import df_merge_tables
 from utils.df_drop_column import df_drop_column
 from utils.df_rename_column import df_rename_column
+from utils.write_parquet_to_s3 import write_parquet_to_s3
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger()
 
+# the columns read from the ingestion tables, the contacts and timestamps are never used
+counterparty_columns = ['counterparty_id', 'counterparty_legal_name', 'legal_address_id']
+counterparty_address_columns = ['address_id', 'address_line_1', 'address_line_2', 'district',
+                                'city', 'postal_code', 'country', 'phone']
 
-def create_dim_counterparty(new_folder, counterparty_key, address_key, bucket_one, bucket_two):
+
+def create_dim_counterparty(new_folder, counterparty_key, address_key, bucket_one, bucket_two, context=None,
+                            address_snapshot=None):
     
     """
     Create a dimension table 'dim_counterparty' by merging and transforming data from two dataframes,
@@ -21,6 +27,7 @@ def create_dim_counterparty(new_folder, counterparty_key, address_key, bucket_on
         address_key (str): The key name for the 'address_df' dataframe in 'bucket_one'.
         bucket_one (str): The name of the S3 bucket containing 'counterparty_df' and 'address_df'.
         bucket_two (str): The name of the target S3 bucket where the 'dim_counterparty.parquet' file will be stored.
+        address_snapshot (ReferenceSnapshot, optional): The latest addresses, joined instead of 'address_key', which may then be None.
 
     Raises:
         Exception: If any error occurs during the execution of the function.
@@ -30,19 +37,19 @@ def create_dim_counterparty(new_folder, counterparty_key, address_key, bucket_on
     """
     
     try:
-        counterparty_df = get_df(bucket_one, counterparty_key)
-        address_df = get_df(bucket_one, address_key)
+        counterparty_df = get_df(bucket_one, counterparty_key, context,
+                                 columns=counterparty_columns)
+        if address_snapshot is not None:
+            # the latest version of every legal address, whether or not it was extracted with the counterparties
+            address_df = address_snapshot.lookup(counterparty_df['legal_address_id'])
+        else:
+            address_df = get_df(bucket_one, address_key, context,
+                                columns=counterparty_address_columns)
 
         new_counterparty_df = df_merge_tables(
             counterparty_df, address_df, 'legal_address_id', 'address_id', 'left')
 
         new_counterparty_df = df_drop_column(new_counterparty_df, ['legal_address_id',
-                                                                   'commercial_contact',
-                                                                   'delivery_contact',
-                                                                   'created_at_x',
-                                                                   'last_updated_x',
-                                                                   'created_at_y',
-                                                                   'last_updated_y',
                                                                    'address_id'])
 
         df_rename_column(new_counterparty_df, {
@@ -58,11 +65,7 @@ def create_dim_counterparty(new_folder, counterparty_key, address_key, bucket_on
         # new_counterparty_df = new_counterparty_df.replace(np.nan, None)
         # new_counterparty_df = new_counterparty_df.fillna(None)
 
-        transformed_dim_counter_party = new_counterparty_df.to_parquet()
-        s3 = boto3.client('s3')
-        s3.put_object(Bucket=bucket_two,
-                      Key=f"{new_folder}/dim_counterparty.parquet",
-                      Body=transformed_dim_counter_party)
+        write_parquet_to_s3(new_counterparty_df, bucket_two, f"{new_folder}/dim_counterparty.parquet")
 
         logging.info("dim_counterparty.parquet has been successfully created.")
 
@@ -1,8 +1,7 @@
-from utils.df_drop_column import df_drop_column
 from utils.get_df import get_df
-import boto3
 import logging
 from awswrangler import exceptions as wrexceptions
+from utils.write_parquet_to_s3 import write_parquet_to_s3
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger()
@@ -11,8 +10,11 @@ logger = logging.getLogger()
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger()
 
+# the columns read from the ingestion table, the timestamps are never used
+currency_columns = ['currency_id', 'currency_code']
 
-def create_dim_currency(new_folder, key, bucket_one, bucket_two):
+
+def create_dim_currency(new_folder, key, bucket_one, bucket_two, context=None):
     """
     Create a dimension table 'dim_currency' by processing data from a DataFrame and store it as a Parquet file
     in an S3 bucket.
@@ -31,9 +33,7 @@ def create_dim_currency(new_folder, key, bucket_one, bucket_two):
         None
     """
     try:
-        df_currency = get_df(bucket_one, key)
-
-        df_currency = df_drop_column(df_currency, ['last_updated', 'created_at'])
+        df_currency = get_df(bucket_one, key, context, columns=currency_columns)
         
         # generate currency name column fro currency code
         
@@ -45,11 +45,7 @@ def create_dim_currency(new_folder, key, bucket_one, bucket_two):
 
         df_currency['currency_name'] = df_currency['currency_code'].map(convert_currency_code)
 
-        transformed_currency = df_currency.to_parquet()
-        s3 = boto3.client('s3')
-        s3.put_object(Bucket=bucket_two,
-                      Key=f"{new_folder}/dim_currency.parquet",
-                      Body=transformed_currency)
+        write_parquet_to_s3(df_currency, bucket_two, f"{new_folder}/dim_currency.parquet")
 
         logging.info("dim_currency.parquet has been successfully created.")
 
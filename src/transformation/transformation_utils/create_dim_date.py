@@ -1,22 +1,85 @@
-import boto3
 import pandas as pd
 import logging
+import os
+from functools import lru_cache
 from utils.get_df import get_df
 from awswrangler import exceptions as wrexceptions
+from utils.aws_clients import get_client
+from utils.write_parquet_to_s3 import write_parquet_to_s3
+from botocore.exceptions import ClientError
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger()
 
 
-def append_dates_to_df(target_df, target_df_column, input_df,  date_columns):
-    for date_column in date_columns:
-        date = pd.to_datetime(input_df[date_column]).dt.date
-        target_df = pd.concat([target_df, pd.DataFrame(
-            {target_df_column: date})], ignore_index=True)
-    return target_df
+# the range of the cached calendar, dates outside it are still handled but computed on every run
+calendar_start = os.environ.get('DIM_DATE_START', '2019-01-01')
+calendar_end = os.environ.get('DIM_DATE_END', '2030-12-31')
+# the processed bucket key recording that the full calendar has been emitted
+full_calendar_key = f"dim_date/calendar_{calendar_start}_{calendar_end}.parquet"
 
+sales_order_date_columns = ['created_at', 'last_updated', 'agreed_delivery_date', 'agreed_payment_date']
+payment_date_columns = ['created_at', 'last_updated', 'payment_date']
+purchase_order_date_columns = ['created_at', 'last_updated', 'agreed_delivery_date', 'agreed_payment_date']
 
-def create_dim_date(new_folder, sales_order_key, payment_key, purchase_order_key, bucket_one, bucket_two):
+
+def build_calendar(dates):
+    """
+    Derive the dim_date columns of a set of dates.
+
+    Parameters:
+        dates (pd.DatetimeIndex): The dates, without a time part.
+
+    Returns:
+        pd.DataFrame: One row per date with date_id, year, month, day, day_of_week, day_name,
+        month_name and quarter columns.
+    """
+    date_id = pd.Series(dates, name='date_id')
+
+    return pd.DataFrame({
+        'date_id': date_id,
+        'year': date_id.dt.year,
+        'month': date_id.dt.month,
+        'day': date_id.dt.day,
+        'day_of_week': date_id.dt.dayofweek,
+        'day_name': date_id.dt.day_name(),
+        'month_name': date_id.dt.month_name(),
+        'quarter': date_id.dt.quarter
+    })
+
+
+@lru_cache(maxsize=4)
+def get_calendar(start, end):
+    """
+    Build the calendar of every date between 'start' and 'end', indexed by date.
+
+    The calendar is cached for the lifetime of the process, so warm invocations only look dates
+    up instead of deriving their names and parts again. Callers must not modify it.
+    """
+    calendar = build_calendar(pd.date_range(start, end, freq='D'))
+    return calendar.set_index(pd.DatetimeIndex(calendar['date_id'].values))
+
+
+def get_distinct_dates(dfs_and_columns):
+    """
+    Collect the distinct dates, in order of first appearance, of date or timestamp columns.
+
+    Parameters:
+        dfs_and_columns (list): Tuples of a DataFrame and the names of its date columns.
+
+    Returns:
+        pd.DatetimeIndex: The distinct dates, without a time part and without missing values.
+    """
+    dates = [pd.to_datetime(df[column]).dt.normalize()
+             for df, columns in dfs_and_columns for column in columns]
+
+    if len(dates) == 0:
+        return pd.DatetimeIndex([], name='date_id')
+
+    return pd.DatetimeIndex(pd.concat(dates, ignore_index=True).dropna().unique(), name='date_id')
+
+
+def create_dim_date(new_folder, sales_order_key, payment_key, purchase_order_key, bucket_one, bucket_two, context=None):
     """
     Create a dimension table 'dim_date' by extracting unique date information from three dataframes:
     'sales_order_df', 'payment_df', and 'purchase_order_df', and store the result as a Parquet file in an S3 bucket.
@@ -38,53 +101,69 @@ def create_dim_date(new_folder, sales_order_key, payment_key, purchase_order_key
 
     Note:
         This function assumes that you have defined the following helper functions:
-        - get_df(bucket_name, object_key): Retrieves a DataFrame from the specified S3 bucket and object key.
-        - append_dates_to_df(df, date_column, source_df, date_columns): Appends unique dates from source_df[date_columns]
-          to the date_column in the df DataFrame.
+        - get_df(bucket_name, object_key, context, columns): Retrieves the given columns of a DataFrame from the specified S3 bucket and object key.
+        - get_distinct_dates(dfs_and_columns): Collects the distinct dates of the date columns of the DataFrames.
+        - get_calendar(start, end): Returns the cached calendar the dates are looked up in.
+
+        Dates outside of DIM_DATE_START and DIM_DATE_END are derived on every run. Setting DIM_DATE_MODE to 'full'
+        writes the whole calendar once, the first time the function runs, and afterwards only dates outside of it.
     
     Example:
         create_dim_date("new_folder_name", "sales_orders.csv", "payments.csv", "purchase_orders.csv", "source_bucket", "target_bucket")
     """
     try:
 
-        dim_date_df = pd.DataFrame(columns=['date_id'])
+        dfs_and_columns = []
 
         if sales_order_key:
-            sales_order_df = get_df(bucket_one, sales_order_key)
-            dim_date_df = append_dates_to_df(dim_date_df, 'date_id', sales_order_df, [
-                                             'created_at', 'last_updated', 'agreed_delivery_date', 'agreed_payment_date'])
+            sales_order_df = get_df(bucket_one, sales_order_key, context,
+                                    columns=sales_order_date_columns)
+            dfs_and_columns.append((sales_order_df, sales_order_date_columns))
 
         if payment_key:
-            payment_df = get_df(bucket_one, payment_key)
-            dim_date_df = append_dates_to_df(dim_date_df, 'date_id', payment_df, [
-                                             "created_at", "last_updated", "payment_date"])
+            payment_df = get_df(bucket_one, payment_key, context,
+                                columns=payment_date_columns)
+            dfs_and_columns.append((payment_df, payment_date_columns))
+
         if purchase_order_key:
-            purchase_order_df = get_df(bucket_one, purchase_order_key)
-            dim_date_df = append_dates_to_df(dim_date_df, 'date_id', purchase_order_df, [
-                                             "created_at", "last_updated", "agreed_delivery_date", "agreed_payment_date"])
+            purchase_order_df = get_df(bucket_one, purchase_order_key, context,
+                                       columns=purchase_order_date_columns)
+            dfs_and_columns.append((purchase_order_df, purchase_order_date_columns))
 
-        dim_date_df = dim_date_df.drop_duplicates(
-            subset='date_id').reset_index(drop=True)
+        dates = get_distinct_dates(dfs_and_columns)
 
-        # ADD EXTRA COLUMNS
-        dim_date_df['date_id'] = pd.to_datetime(dim_date_df['date_id'])
-        dim_date_df['year'] = dim_date_df['date_id'].dt.year
-        dim_date_df['month'] = dim_date_df['date_id'].dt.month
-        dim_date_df['day'] = dim_date_df['date_id'].dt.day
-        dim_date_df['day_of_week'] = dim_date_df['date_id'].dt.dayofweek
-        dim_date_df['day_name'] = dim_date_df['date_id'].dt.day_name()
-        dim_date_df['month_name'] = dim_date_df['date_id'].dt.month_name()
-        dim_date_df['quarter'] = dim_date_df['date_id'].dt.quarter
+        # only the dates of the facts are looked up in the cached calendar
+        calendar = get_calendar(calendar_start, calendar_end)
+        in_calendar = dates.isin(calendar.index)
 
-        # dim_date_df = dim_date_df.replace(np.nan, None)
+        s3 = get_client('s3')
 
-        transformed_dim_date = dim_date_df.to_parquet()
+        if os.environ.get('DIM_DATE_MODE', 'incremental') == 'full':
+            # the whole calendar is emitted once, afterwards only dates outside of it are
+            if not full_calendar_emitted(s3, bucket_two):
+                dim_date_df = pd.concat(
+                    [calendar, build_calendar(dates[~in_calendar])], ignore_index=True)
+                write_parquet_to_s3(dim_date_df, bucket_two, f"{new_folder}/dim_date.parquet")
+                s3.copy_object(Bucket=bucket_two,
+                               Key=full_calendar_key,
+                               CopySource={'Bucket': bucket_two,
+                                           'Key': f"{new_folder}/dim_date.parquet"})
+                logging.info("dim_date.parquet has been successfully created with the full calendar.")
+                return
 
-        # Add parquet file to the processed data bucket
-        s3 = boto3.client('s3')
-        s3.put_object(Bucket=bucket_two,
-                      Key=f"{new_folder}/dim_date.parquet",
-                      Body=transformed_dim_date)
+            dates = dates[~in_calendar]
+            if len(dates) == 0:
+                logging.info("dim_date.parquet is not needed, every date is in the full calendar.")
+                return
+            in_calendar = dates.isin(calendar.index)
+
+        missing_dates = build_calendar(dates[~in_calendar])
+        missing_dates.index = pd.DatetimeIndex(missing_dates['date_id'].values)
+
+        # restore the order the dates first appeared in
+        dim_date_df = pd.concat([calendar.loc[dates[in_calendar]], missing_dates]).loc[dates].reset_index(drop=True)
+
+        write_parquet_to_s3(dim_date_df, bucket_two, f"{new_folder}/dim_date.parquet")
 
         logging.info("dim_date.parquet has been successfully created.")
 
@@ -95,3 +174,23 @@ def create_dim_date(new_folder, sales_order_key, payment_key, purchase_order_key
         logging.info("An error occurred:")
         logging.error(str(e))
         raise
+
+
+def full_calendar_emitted(s3, bucket_name):
+    """
+    Check whether the full calendar has already been written to the processed bucket.
+
+    Parameters:
+        s3: A boto3 S3 client.
+        bucket_name (str): The name of the processed bucket.
+
+    Returns:
+        bool: True if the full calendar of the configured range has been emitted.
+    """
+    try:
+        s3.head_object(Bucket=bucket_name, Key=full_calendar_key)
+        return True
+    except ClientError as err:
+        if err.response['Error']['Code'] in ['404', 'NoSuchKey', 'NotFound']:
+            return False
+        raise
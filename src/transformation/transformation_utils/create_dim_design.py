@@ -1,14 +1,16 @@
-import boto3
 import logging
 from utils.get_df import get_df
-from utils.df_drop_column import df_drop_column
 from awswrangler import exceptions as wrexceptions
+from utils.write_parquet_to_s3 import write_parquet_to_s3
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger()
 
+# the columns read from the ingestion table, the timestamps are never used
+design_columns = ['design_id', 'design_name', 'file_location', 'file_name']
 
-def create_dim_design(new_folder, key, bucket_one, bucket_two):
+
+def create_dim_design(new_folder, key, bucket_one, bucket_two, context=None):
     """
     Create a dimension table 'dim_design' by processing data from a DataFrame and store it as a Parquet file
     in an S3 bucket.
@@ -28,26 +30,17 @@ def create_dim_design(new_folder, key, bucket_one, bucket_two):
 
     Note:
         This function assumes that you have defined the following helper functions:
-        - get_df(bucket_name, object_key): Retrieves a DataFrame from the specified S3 bucket and object key.
-        - df_drop_column(df, columns): Drops specified columns from the DataFrame.
+        - get_df(bucket_name, object_key, context, columns): Retrieves the given columns of a DataFrame from the specified S3 bucket and object key.
 
     Example:
         create_dim_design("new_folder_name", "design_data.csv", "source_bucket", "target_bucket")
     """
     try:
-        df_design = get_df(bucket_one, key)
-
-        df_design = df_drop_column(df_design, ['last_updated', 'created_at'])
+        df_design = get_df(bucket_one, key, context, columns=design_columns)
 
         # df_design = df_design.replace(np.nan, None)
 
-        transformed_dim_design = df_design.to_parquet()
-
-        # Add parquet file to the processed data bucket
-        s3 = boto3.client('s3')
-        s3.put_object(Bucket=bucket_two,
-                      Key=f"{new_folder}/dim_design.parquet",
-                      Body=transformed_dim_design)
+        write_parquet_to_s3(df_design, bucket_two, f"{new_folder}/dim_design.parquet")
 
         logging.info("dim_design.parquet has been successfully created.")
 
@@ -1,15 +1,18 @@
-import boto3
 import logging
 from utils.get_df import get_df
-from utils.df_drop_column import df_drop_column
 from utils.df_rename_column import df_rename_column
 from awswrangler import exceptions as wrexceptions
+from utils.write_parquet_to_s3 import write_parquet_to_s3
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger()
 
+# the columns read from the ingestion table, the timestamps are never used
+location_address_columns = ['address_id', 'address_line_1', 'address_line_2', 'district',
+                            'city', 'postal_code', 'country', 'phone']
 
-def create_dim_location(new_folder, address_key, bucket_one, bucket_two):
+
+def create_dim_location(new_folder, address_key, bucket_one, bucket_two, context=None):
     """
     Create a dimension table 'dim_location' by processing data from a DataFrame and store it as a Parquet file
     in an S3 bucket.
@@ -29,27 +32,18 @@ def create_dim_location(new_folder, address_key, bucket_one, bucket_two):
 
     Note:
         This function assumes that you have defined the following helper functions:
-        - get_df(bucket_name, object_key): Retrieves a DataFrame from the specified S3 bucket and object key.
+        - get_df(bucket_name, object_key, context, columns): Retrieves the given columns of a DataFrame from the specified S3 bucket and object key.
         - df_rename_column(df, rename_dict): Renames columns in the DataFrame based on the given mapping.
-        - df_drop_column(df, columns): Drops specified columns from the DataFrame.
 
     Example:
         create_dim_location("new_folder_name", "address_data.csv", "source_bucket", "target_bucket")
     """
     try:
-        df = get_df(bucket_one, address_key)
+        df = get_df(bucket_one, address_key, context, columns=location_address_columns)
 
         df_rename_column(df, {'address_id': 'location_id'})
 
-        df = df_drop_column(df, ['last_updated', 'created_at'])
-
-        transformed_dim_location = df.to_parquet()
-
-        # Add parquet file to the processed data bucket
-        s3 = boto3.client('s3')
-        s3.put_object(Bucket=bucket_two,
-                      Key=f"{new_folder}/dim_location.parquet",
-                      Body=transformed_dim_location)
+        write_parquet_to_s3(df, bucket_two, f"{new_folder}/dim_location.parquet")
 
         logging.info("dim_location.parquet has been successfully created.")
 
@@ -1,15 +1,17 @@
 import pandas as pd
-import boto3
 import logging
 from utils.get_df import get_df
-from utils.df_drop_column import df_drop_column
 from awswrangler import exceptions as wrexceptions
+from utils.write_parquet_to_s3 import write_parquet_to_s3
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger()
 
+# the columns read from the ingestion table, the timestamps are never used
+payment_type_columns = ['payment_type_id', 'payment_type_name']
 
-def create_dim_payment_type(new_folder, payment_type_key, ingestion_bucket, processed_bucket):
+
+def create_dim_payment_type(new_folder, payment_type_key, ingestion_bucket, processed_bucket, context=None):
     """
     Create a dimension table 'dim_payment_type' by processing data from a DataFrame and store it as a Parquet file
     in an S3 bucket.
@@ -31,16 +33,14 @@ def create_dim_payment_type(new_folder, payment_type_key, ingestion_bucket, proc
 
     Note:
         This function assumes that you have defined the following helper functions:
-        - get_df(bucket_name, object_key): Retrieves a DataFrame from the specified S3 bucket and object key.
-        - df_drop_column(df, columns): Drops specified columns from the DataFrame.
+        - get_df(bucket_name, object_key, context, columns): Retrieves the given columns of a DataFrame from the specified S3 bucket and object key.
 
     Example:
         create_dim_payment_type("new_folder_name", "payment_type_data.csv", "source_bucket", "target_bucket")
     """
     try:
-        payment_type_df = get_df(ingestion_bucket, payment_type_key)
-
-        df_drop_column(payment_type_df, ['created_at', 'last_updated'])
+        payment_type_df = get_df(ingestion_bucket, payment_type_key, context,
+                                 columns=payment_type_columns)
 
         # payment_type_df = payment_type_df.replace(np.nan, None)
 
@@ -48,12 +48,7 @@ def create_dim_payment_type(new_folder, payment_type_key, ingestion_bucket, proc
         payment_type_df = payment_type_df[[
             "payment_type_id", "payment_type_name",]]
 
-        transformed_dim_payment_type = payment_type_df.to_parquet()
-
-        s3 = boto3.client('s3')
-        s3.put_object(Bucket=processed_bucket,
-                      Key=f"{new_folder}/dim_payment_type.parquet",
-                      Body=transformed_dim_payment_type)
+        write_parquet_to_s3(payment_type_df, processed_bucket, f"{new_folder}/dim_payment_type.parquet")
 
         logging.info("dim_payment_type.parquet has been successfully created.")
 
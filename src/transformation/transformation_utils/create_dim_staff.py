@@ -1,14 +1,19 @@
-import boto3
 import logging
 from utils.get_df import get_df
 from utils.df_merge_tables import df_merge_tables
 from utils.df_drop_column import df_drop_column
 from awswrangler import exceptions as wrexceptions
+from utils.write_parquet_to_s3 import write_parquet_to_s3
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger()
 
+# the columns read from the ingestion tables, the timestamps and manager are never used
+staff_columns = ['staff_id', 'first_name', 'last_name', 'department_id', 'email_address']
+department_columns = ['department_id', 'department_name', 'location']
 
-def create_dim_staff(new_folder, staff_key, department_key, bucket_one, bucket_two):
+
+def create_dim_staff(new_folder, staff_key, department_key, bucket_one, bucket_two, context=None,
+                     department_snapshot=None):
     """
     Create a dimension table 'dim_staff' by merging and processing data from two DataFrames: 'staff_df' and 'department_df',
     and store the result as a Parquet file in an S3 bucket.
@@ -19,6 +24,7 @@ def create_dim_staff(new_folder, staff_key, department_key, bucket_one, bucket_t
         department_key (str): The key name for the 'department_df' DataFrame in 'bucket_one'.
         bucket_one (str): The name of the S3 bucket containing 'staff_df' and 'department_df'.
         bucket_two (str): The name of the target S3 bucket where the 'dim_staff.parquet' file will be stored.
+        department_snapshot (ReferenceSnapshot, optional): The latest departments, joined instead of 'department_key', which may then be None.
 
     Raises:
         wrexceptions.NoFilesFound: If any of the specified files (staff_key, department_key) are not found in 'bucket_one'.
@@ -29,7 +35,7 @@ def create_dim_staff(new_folder, staff_key, department_key, bucket_one, bucket_t
 
     Note:
         This function assumes that you have defined the following helper functions:
-        - get_df(bucket_name, object_key): Retrieves a DataFrame from the specified S3 bucket and object key.
+        - get_df(bucket_name, object_key, context, columns): Retrieves the given columns of a DataFrame from the specified S3 bucket and object key.
         - df_drop_column(df, columns): Drops specified columns from the DataFrame.
         - df_merge_tables(left_df, right_df, left_on, right_on, how): Merges two DataFrames based on specific columns.
 
@@ -38,14 +44,14 @@ def create_dim_staff(new_folder, staff_key, department_key, bucket_one, bucket_t
     """
     try:
         # read parquet files
-        staff_df = get_df(bucket_one, staff_key)
-
-        department_df = get_df(bucket_one, department_key)
-
-        staff_df = df_drop_column(staff_df, ['created_at', 'last_updated'])
+        staff_df = get_df(bucket_one, staff_key, context, columns=staff_columns)
 
-        department_df = df_drop_column(department_df, [
-                       'created_at', 'last_updated', 'manager'])
+        if department_snapshot is not None:
+            # the latest version of every department, whether or not it was extracted with the staff
+            department_df = department_snapshot.lookup(staff_df['department_id'])
+        else:
+            department_df = get_df(bucket_one, department_key, context,
+                                   columns=department_columns)
 
         df = df_merge_tables(staff_df, department_df,
                              'department_id', 'department_id', 'left')
@@ -54,11 +60,7 @@ def create_dim_staff(new_folder, staff_key, department_key, bucket_one, bucket_t
 
         # df = df.replace(np.nan, None)
 
-        transformed_staff = df.to_parquet()
-        s3 = boto3.client('s3')
-        s3.put_object(Bucket=bucket_two,
-                      Key=f"{new_folder}/dim_staff.parquet",
-                      Body=transformed_staff)
+        write_parquet_to_s3(df, bucket_two, f"{new_folder}/dim_staff.parquet")
 
         logging.info("dim_staff.parquet has been successfully created.")
 
@@ -1,16 +1,18 @@
 import pandas as pd
-import boto3
 import logging
 from utils.get_df import get_df
-from utils.df_drop_column import df_drop_column
 from utils.df_set_column_type import df_set_column_type
 from awswrangler import exceptions as wrexceptions
+from utils.write_parquet_to_s3 import write_parquet_to_s3
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger()
 
+# the columns read from the ingestion table, the timestamps are never used
+transaction_columns = ['transaction_id', 'transaction_type', 'sales_order_id', 'purchase_order_id']
 
-def create_dim_transaction(new_folder, transaction_key, ingestion_bucket, processed_bucket):
+
+def create_dim_transaction(new_folder, transaction_key, ingestion_bucket, processed_bucket, context=None):
     """
     Create a dimension table 'dim_transaction' by processing data from a DataFrame and store it as a Parquet file
     in an S3 bucket.
@@ -32,20 +34,15 @@ def create_dim_transaction(new_folder, transaction_key, ingestion_bucket, proces
 
     Note:
         This function assumes that you have defined the following helper functions:
-        - get_df(bucket_name, object_key): Retrieves a DataFrame from the specified S3 bucket and object key.
-        - df_drop_column(df, columns): Drops specified columns from the DataFrame.
+        - get_df(bucket_name, object_key, context, columns): Retrieves the given columns of a DataFrame from the specified S3 bucket and object key.
         - df_set_column_type(df, columns, types): Sets specified columns to the provided data types.
 
     Example:
         create_dim_transaction("new_folder_name", "transaction_data.csv", "source_bucket", "target_bucket")
     """
     try:
-        transaction_df = get_df(ingestion_bucket, transaction_key)
-
-        df_drop_column(transaction_df, ['created_at', 'last_updated'])
-
-        # transaction_df.drop(
-        #     columns=['created_at', 'last_updated'], inplace=True)
+        transaction_df = get_df(ingestion_bucket, transaction_key, context,
+                                columns=transaction_columns)
 
         df_set_column_type(transaction_df, ['sales_order_id', 'purchase_order_id'], [
                            'Int64', 'Int64'])
@@ -54,12 +51,7 @@ def create_dim_transaction(new_folder, transaction_key, ingestion_bucket, proces
         transaction_df = transaction_df[[
             "transaction_id", "transaction_type", "sales_order_id", "purchase_order_id",]]
 
-        transformed_dim_transaction = transaction_df.to_parquet()
-
-        s3 = boto3.client('s3')
-        s3.put_object(Bucket=processed_bucket,
-                      Key=f"{new_folder}/dim_transaction.parquet",
-                      Body=transformed_dim_transaction)
+        write_parquet_to_s3(transaction_df, processed_bucket, f"{new_folder}/dim_transaction.parquet")
 
         logging.info("dim_transaction.parquet has been successfully created.")
 
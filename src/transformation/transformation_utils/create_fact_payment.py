@@ -1,15 +1,20 @@
 import pandas as pd
-import boto3
 import logging
 from utils.get_df import get_df
 from utils.df_drop_column import df_drop_column
 from awswrangler import exceptions as wrexceptions
+from utils.write_parquet_to_s3 import write_parquet_to_s3
+from utils.split_timestamp import split_timestamp, to_arrow_date
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger()
 
+# the columns read from the ingestion table, the account numbers are never used
+payment_columns = ['payment_id', 'created_at', 'last_updated', 'transaction_id', 'counterparty_id',
+                   'payment_amount', 'currency_id', 'payment_type_id', 'paid', 'payment_date']
 
-def create_fact_payment(new_folder, payment_key, ingestion_bucket, processed_bucket):
+
+def create_fact_payment(new_folder, payment_key, ingestion_bucket, processed_bucket, context=None):
     """
     Create a fact table 'fact_payment' by processing data from a DataFrame and store it as a Parquet file
     in an S3 bucket.
@@ -31,27 +36,22 @@ def create_fact_payment(new_folder, payment_key, ingestion_bucket, processed_buc
 
     Note:
         This function assumes that you have defined the following helper functions:
-        - get_df(bucket_name, object_key): Retrieves a DataFrame from the specified S3 bucket and object key.
+        - get_df(bucket_name, object_key, context, columns): Retrieves the given columns of a DataFrame from the specified S3 bucket and object key.
         - df_drop_column(df, columns): Drops specified columns from the DataFrame.
 
     Example:
         create_fact_payment("new_folder_name", "payment_data.csv", "source_bucket", "target_bucket")
     """
     try:
-        payment_df = get_df(ingestion_bucket, payment_key)
+        payment_df = get_df(ingestion_bucket, payment_key, context, columns=payment_columns)
 
-        payment_df['created_at'] = pd.to_datetime(payment_df['created_at'])
-        payment_df["created_date"] = payment_df['created_at'].dt.date
-        payment_df["created_time"] = payment_df['created_at'].dt.time
+        split_timestamp(payment_df, 'created_at', 'created_date', 'created_time')
 
-        payment_df['last_updated'] = pd.to_datetime(payment_df['last_updated'])
-        payment_df["last_updated_date"] = payment_df['last_updated'].dt.date
-        payment_df["last_updated_time"] = payment_df['last_updated'].dt.time
+        split_timestamp(payment_df, 'last_updated', 'last_updated_date', 'last_updated_time')
 
         payment_df = df_drop_column(payment_df, ['created_at', 'last_updated'])
 
-        payment_df["payment_date"] = pd.to_datetime(
-            payment_df["payment_date"]).dt.date
+        payment_df["payment_date"] = to_arrow_date(payment_df["payment_date"])
 
         payment_df["payment_amount"] = pd.to_numeric(
             payment_df["payment_amount"])
@@ -59,12 +59,7 @@ def create_fact_payment(new_folder, payment_key, ingestion_bucket, processed_buc
         payment_df = payment_df[["payment_id", "created_date", "created_time", "last_updated_date", "last_updated_time",
                                  "transaction_id", "counterparty_id", "payment_amount", "currency_id", "payment_type_id", "paid", "payment_date",]]
 
-        transformed_fact_payment = payment_df.to_parquet()
-
-        s3 = boto3.client('s3')
-        s3.put_object(Bucket=processed_bucket,
-                      Key=f"{new_folder}/fact_payment.parquet",
-                      Body=transformed_fact_payment)
+        write_parquet_to_s3(payment_df, processed_bucket, f"{new_folder}/fact_payment.parquet")
 
         logging.info("fact_payment.parquet has been successfully created.")
 
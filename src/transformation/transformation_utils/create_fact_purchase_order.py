@@ -1,14 +1,21 @@
 import pandas as pd
-import boto3
 import logging
 from utils.get_df import get_df
 from utils.df_drop_column import df_drop_column
 from awswrangler import exceptions as wrexceptions
+from utils.write_parquet_to_s3 import write_parquet_to_s3
+from utils.split_timestamp import split_timestamp, to_arrow_date
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger()
 
-def create_fact_purchase_order(new_folder, purchase_order_key, ingestion_bucket, processed_bucket):
+# the columns read from the ingestion table, the account numbers are never used
+purchase_order_columns = ['purchase_order_id', 'created_at', 'last_updated', 'staff_id',
+                          'counterparty_id', 'item_code', 'item_quantity', 'item_unit_price',
+                          'currency_id', 'agreed_delivery_date', 'agreed_payment_date',
+                          'agreed_delivery_location_id']
+
+def create_fact_purchase_order(new_folder, purchase_order_key, ingestion_bucket, processed_bucket, context=None):
     """
     Create a fact table 'fact_purchase_order' by processing data from a DataFrame and store it as a Parquet file
     in an S3 bucket.
@@ -30,7 +37,7 @@ def create_fact_purchase_order(new_folder, purchase_order_key, ingestion_bucket,
 
     Note:
         This function assumes that you have defined the following helper functions:
-        - get_df(bucket_name, object_key): Retrieves a DataFrame from the specified S3 bucket and object key.
+        - get_df(bucket_name, object_key, context, columns): Retrieves the given columns of a DataFrame from the specified S3 bucket and object key.
         - df_drop_column(df, columns): Drops specified columns from the DataFrame.
 
     Example:
@@ -39,36 +46,26 @@ def create_fact_purchase_order(new_folder, purchase_order_key, ingestion_bucket,
 
     try:
 
-        purchase_order_df = get_df(ingestion_bucket, purchase_order_key)
+        purchase_order_df = get_df(ingestion_bucket, purchase_order_key, context,
+                                   columns=purchase_order_columns)
 
-        purchase_order_df['created_at'] = pd.to_datetime(
-            purchase_order_df['created_at'])
-        purchase_order_df["created_date"] = purchase_order_df['created_at'].dt.date
-        purchase_order_df["created_time"] = purchase_order_df['created_at'].dt.time
+        split_timestamp(purchase_order_df, 'created_at', 'created_date', 'created_time')
         df_drop_column(purchase_order_df, ['created_at'])
 
-        purchase_order_df['last_updated'] = pd.to_datetime(
-            purchase_order_df['last_updated'])
-        purchase_order_df["last_updated_date"] = purchase_order_df['last_updated'].dt.date
-        purchase_order_df["last_updated_time"] = purchase_order_df['last_updated'].dt.time
+        split_timestamp(purchase_order_df, 'last_updated', 'last_updated_date', 'last_updated_time')
 
-        purchase_order_df["agreed_delivery_date"] = pd.to_datetime(
-            purchase_order_df["agreed_delivery_date"]).dt.date
+        purchase_order_df["agreed_delivery_date"] = to_arrow_date(
+            purchase_order_df["agreed_delivery_date"])
 
-        purchase_order_df["agreed_payment_date"] = pd.to_datetime(
-            purchase_order_df["agreed_payment_date"]).dt.date
+        purchase_order_df["agreed_payment_date"] = to_arrow_date(
+            purchase_order_df["agreed_payment_date"])
 
         purchase_order_df = purchase_order_df[["purchase_order_id", "created_date", "created_time", "last_updated_date", "last_updated_time",
                                                "staff_id", "counterparty_id", "item_code", "item_quantity", "item_unit_price", "currency_id", "agreed_delivery_date", "agreed_payment_date", "agreed_delivery_location_id"]]
 
         # purchase_order_df = purchase_order_df.replace(np.nan, None)
 
-        transformed_fact_purchase_order = purchase_order_df.to_parquet()
-
-        s3 = boto3.client('s3')
-        s3.put_object(Bucket=processed_bucket,
-                      Key=f"{new_folder}/fact_purchase_order.parquet",
-                      Body=transformed_fact_purchase_order)
+        write_parquet_to_s3(purchase_order_df, processed_bucket, f"{new_folder}/fact_purchase_order.parquet")
 
         logging.info("fact_purchase_order.parquet has been successfully created.")
 
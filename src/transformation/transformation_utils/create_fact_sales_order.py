@@ -1,16 +1,22 @@
 import pandas as pd
-import boto3
 import logging
 from utils.get_df import get_df
 from utils.df_drop_column import df_drop_column
 from utils.df_rename_column import df_rename_column
 from awswrangler import exceptions as wrexceptions
+from utils.write_parquet_to_s3 import write_parquet_to_s3
+from utils.split_timestamp import split_timestamp
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger()
 
+# the columns read from the ingestion table
+sales_order_columns = ['sales_order_id', 'created_at', 'last_updated', 'design_id', 'staff_id',
+                       'counterparty_id', 'units_sold', 'unit_price', 'currency_id',
+                       'agreed_delivery_date', 'agreed_payment_date', 'agreed_delivery_location_id']
 
-def create_fact_sales_order(new_folder, key, bucket_one, bucket_two):
+
+def create_fact_sales_order(new_folder, key, bucket_one, bucket_two, context=None):
     """
     Create a fact table 'fact_sales_order' by processing data from a DataFrame and store it as a Parquet file
     in an S3 bucket.
@@ -32,7 +38,7 @@ def create_fact_sales_order(new_folder, key, bucket_one, bucket_two):
 
     Note:
         This function assumes that you have defined the following helper functions:
-        - get_df(bucket_name, object_key): Retrieves a DataFrame from the specified S3 bucket and object key.
+        - get_df(bucket_name, object_key, context, columns): Retrieves the given columns of a DataFrame from the specified S3 bucket and object key.
         - df_drop_column(df, columns): Drops specified columns from the DataFrame.
         - df_rename_column(df, column_mapping): Renames columns in the DataFrame based on the provided mapping.
 
@@ -41,32 +47,19 @@ def create_fact_sales_order(new_folder, key, bucket_one, bucket_two):
     """
     try:
         # Read the sales order data from the specified S3 bucket
-        df = get_df(bucket_one, key)
+        df = get_df(bucket_one, key, context, columns=sales_order_columns)
 
         # Perform data transformations
-        df['created_at'] = pd.to_datetime(df['created_at'])
-        # split the timestamp column into date and time columns
-        df['created_date'] = df['created_at'].dt.date
-        df['created_time'] = df['created_at'].dt.time
-        # convert timestamp column to datetime format
-        df['last_updated'] = pd.to_datetime(df['last_updated'])
-        # split the timestamp column into date and time columns
-        df['last_updated_date'] = df['last_updated'].dt.date
-        df['last_updated_time'] = df['last_updated'].dt.time
+        # split the timestamp columns into Arrow date and time columns
+        split_timestamp(df, 'created_at', 'created_date', 'created_time')
+        split_timestamp(df, 'last_updated', 'last_updated_date', 'last_updated_time')
         df = df_drop_column(df, ['created_at', 'last_updated'])
         # change the column name in place
         df_rename_column(df, {'staff_id': 'sales_staff_id'})
 
         # df = df.replace(np.nan, None)
 
-        # Convert the transformed DataFrame to Parquet format
-        transformed_sales_order = df.to_parquet()
-
-        # Write the Parquet file to the destination bucket
-        s3 = boto3.client('s3')
-        s3.put_object(Bucket=bucket_two,
-                      Key=f"{new_folder}/fact_sales_order.parquet",
-                      Body=transformed_sales_order)
+        write_parquet_to_s3(df, bucket_two, f"{new_folder}/fact_sales_order.parquet")
 
         logging.info("fact_sales_order.parquet has been successfully created.")
 
@@ -95,4 +95,36 @@ resource "aws_iam_policy" "loading_lambda_logging" {
 resource "aws_iam_role_policy_attachment" "loading_lambda_logs" {
   role       = aws_iam_role.iam_for_loading_lambda.name
   policy_arn = aws_iam_policy.loading_lambda_logging.arn
-}
\ No newline at end of file
+}
+
+# I AM POLICY FOR EXTRACTION LAMBDA TO PUBLISH THE TABLE PROBE METRICS
+
+data "aws_iam_policy_document" "extraction_lambda_metrics" {
+
+  statement {
+    effect = "Allow"
+
+    actions = ["cloudwatch:PutMetricData"]
+
+    resources = ["*"]
+
+    condition {
+      test     = "StringEquals"
+      variable = "cloudwatch:namespace"
+      values   = ["Totesys/Extraction"]
+    }
+  }
+
+}
+
+resource "aws_iam_policy" "extraction_lambda_metrics" {
+  name        = "extraction_lambda_metrics"
+  path        = "/"
+  description = "IAM policy for publishing metrics from extraction lambda"
+  policy      = data.aws_iam_policy_document.extraction_lambda_metrics.json
+}
+
+resource "aws_iam_role_policy_attachment" "extraction_lambda_metrics" {
+  role       = aws_iam_role.iam_for_extraction_lambda.name
+  policy_arn = aws_iam_policy.extraction_lambda_metrics.arn
+}
@@ -0,0 +1,18 @@
+import pytest
+
+from utils.aws_clients import clear_clients
+from utils.get_bucket_name import clear_bucket_name_cache
+from utils.get_secret import invalidate_secret
+from utils.reference_snapshot import clear_reference_snapshots
+from utils.warm_connection import close_warm_connections
+
+
+@pytest.fixture(autouse=True)
+def clear_aws_caches():
+    # every test runs against its own moto backend, so nothing cached by a previous test may leak
+    clear_clients()
+    clear_bucket_name_cache()
+    invalidate_secret()
+    close_warm_connections()
+    clear_reference_snapshots()
+    yield
@@ -0,0 +1,155 @@
+from io import BytesIO
+import boto3
+import pandas as pd
+import pytest
+from moto import mock_s3
+
+from src.transformation.transformation_utils.arrow_builders import arrow_builders
+from src.transformation.transformation_utils.create_dim_counterparty import create_dim_counterparty
+from src.transformation.transformation_utils.create_dim_currency import create_dim_currency
+from src.transformation.transformation_utils.create_dim_design import create_dim_design
+from src.transformation.transformation_utils.create_dim_location import create_dim_location
+from src.transformation.transformation_utils.create_dim_payment_type import create_dim_payment_type
+from src.transformation.transformation_utils.create_dim_staff import create_dim_staff
+from src.transformation.transformation_utils.create_dim_transaction import create_dim_transaction
+from utils.arrow_tables import get_table
+from utils.transformation_context import TransformationContext
+
+timestamps = ['2022-11-03 14:20:49.962', '2022-11-03 14:20:49.962', '2022-11-03 14:20:49.962']
+
+test_tables = {
+    'address': pd.DataFrame({
+        'address_id': [1, 2, 3],
+        'address_line_1': ['6826 Herzog Via', '179 Alexie Cliffs', '148 Sincere Fort'],
+        'address_line_2': [None, 'Avon', None],
+        'district': ['Avon', None, 'Bedfordshire'],
+        'city': ['New Patienceburgh', 'Aliso Viejo', 'Lake Charles'],
+        'postal_code': ['28441', '99305-7380', '89360'],
+        'country': ['Turkey', 'San Marino', 'Samoa'],
+        'phone': ['1803 637401', '9621 880720', '0730 783349'],
+        'created_at': timestamps,
+        'last_updated': timestamps
+    }),
+    'counterparty': pd.DataFrame({
+        'counterparty_id': [1, 2, 3],
+        'counterparty_legal_name': ['Fahey and Sons', 'Leannon Inc', 'Armstrong Ltd'],
+        'legal_address_id': [3, 1, 7],
+        'commercial_contact': ['Micheal Toy', None, 'Jean Hane III'],
+        'delivery_contact': ['Mrs. Lucy Runolfsdottir', 'Myra Kovacek', None],
+        'created_at': timestamps,
+        'last_updated': timestamps
+    }),
+    'currency': pd.DataFrame({
+        'currency_id': [1, 2, 3],
+        'currency_code': ['GBP', 'USD', 'EUR'],
+        'created_at': timestamps,
+        'last_updated': timestamps
+    }),
+    'design': pd.DataFrame({
+        'design_id': [8, 51, 69],
+        'created_at': timestamps,
+        'design_name': ['Wooden', 'Bronze', 'Bronze'],
+        'file_location': ['/usr', '/private', '/lost+found'],
+        'file_name': ['wooden-20220717.json', 'bronze-20221024.json', 'bronze-20230102.json'],
+        'last_updated': timestamps
+    }),
+    'department': pd.DataFrame({
+        'department_id': [1, 2],
+        'department_name': ['Sales', 'Purchasing'],
+        'location': ['Manchester', 'Leeds'],
+        'manager': ['Richard Roma', 'Naomi Lapaglia'],
+        'created_at': timestamps[:2],
+        'last_updated': timestamps[:2]
+    }),
+    'staff': pd.DataFrame({
+        'staff_id': [1, 2, 3],
+        'first_name': ['Jeremie', 'Deron', 'Jeanette'],
+        'last_name': ['Franey', 'Beier', 'Erdman'],
+        'department_id': [2, 1, 5],
+        'email_address': ['jeremie.franey@terrifictotes.com', 'deron.beier@terrifictotes.com',
+                          'jeanette.erdman@terrifictotes.com'],
+        'created_at': timestamps,
+        'last_updated': timestamps
+    }),
+    'transaction': pd.DataFrame({
+        'transaction_id': [1, 2, 3],
+        'transaction_type': ['PURCHASE', 'SALE', 'SALE'],
+        'sales_order_id': [None, 1, 2],
+        'purchase_order_id': [2, None, None],
+        'created_at': timestamps,
+        'last_updated': timestamps
+    }),
+    'payment_type': pd.DataFrame({
+        'payment_type_id': [1, 2],
+        'payment_type_name': ['SALES_RECEIPT', 'SALES_REFUND'],
+        'created_at': timestamps[:2],
+        'last_updated': timestamps[:2]
+    })
+}
+
+# the pandas builder of every table of the Arrow engine, and the tables it reads
+pandas_builders = [
+    ('dim_counterparty', create_dim_counterparty, ['counterparty', 'address']),
+    ('dim_currency', create_dim_currency, ['currency']),
+    ('dim_design', create_dim_design, ['design']),
+    ('dim_location', create_dim_location, ['address']),
+    ('dim_payment_type', create_dim_payment_type, ['payment_type']),
+    ('dim_staff', create_dim_staff, ['staff', 'department']),
+    ('dim_transaction', create_dim_transaction, ['transaction'])
+]
+
+
+@pytest.fixture
+def buckets():
+    with mock_s3():
+        s3_client = boto3.client('s3', region_name='eu-west-2')
+        for bucket in ['test-extraction-bucket', 'test-processed-bucket']:
+            s3_client.create_bucket(
+                Bucket=bucket,
+                CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'})
+
+        for name, df in test_tables.items():
+            s3_client.put_object(Bucket='test-extraction-bucket',
+                                 Key=f"folder/{name}.parquet",
+                                 Body=df.to_parquet())
+
+        yield s3_client
+
+
+def read_output(s3_client, key):
+    body = s3_client.get_object(Bucket='test-processed-bucket', Key=key)['Body'].read()
+    return pd.read_parquet(BytesIO(body))
+
+
+def test_every_arrow_builder_has_a_pandas_builder():
+    assert sorted(arrow_builders) == sorted(name for name, _, _ in pandas_builders)
+
+
+@pytest.mark.parametrize('name, pandas_builder, tables', pandas_builders)
+def test_arrow_builder_writes_the_same_table_as_pandas_builder(buckets, name, pandas_builder, tables):
+    keys = [f"folder/{table}.parquet" for table in tables]
+
+    pandas_builder('pandas', *keys, 'test-extraction-bucket', 'test-processed-bucket')
+    arrow_builders[name]('arrow', *keys, 'test-extraction-bucket', 'test-processed-bucket')
+
+    expected = read_output(buckets, f"pandas/{name}.parquet")
+    result = read_output(buckets, f"arrow/{name}.parquet")
+
+    # pandas writes nullable Int64 and object columns where Arrow writes int64 and strings
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_arrow_builders_read_through_the_context(buckets, mocker):
+    context = TransformationContext()
+    mocked_get_table = mocker.patch(
+        'utils.transformation_context.get_table', wraps=get_table)
+
+    arrow_builders['dim_location'](
+        'arrow', 'folder/address.parquet',
+        'test-extraction-bucket', 'test-processed-bucket', context=context)
+    arrow_builders['dim_counterparty'](
+        'arrow', 'folder/counterparty.parquet', 'folder/address.parquet',
+        'test-extraction-bucket', 'test-processed-bucket', context=context)
+
+    assert [call.args[1] for call in mocked_get_table.call_args_list] == [
+        'folder/address.parquet', 'folder/counterparty.parquet']
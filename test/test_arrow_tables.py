@@ -0,0 +1,76 @@
+import boto3
+import pandas as pd
+import pyarrow as pa
+from moto import mock_s3
+from pytest import raises
+
+from utils.arrow_tables import (get_table, put_table, drop_columns, rename_columns,
+                                cast_columns, map_values, left_join)
+
+
+@mock_s3
+def test_put_table_and_get_table_round_trip():
+    s3_client = boto3.client('s3', region_name='eu-west-2')
+    s3_client.create_bucket(
+        Bucket='test-bucket',
+        CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'})
+    table = pa.table({'currency_id': [1, 2], 'currency_code': ['GBP', 'USD']})
+
+    put_table(table, 'test-bucket', 'folder/currency.parquet')
+
+    assert get_table('test-bucket', 'folder/currency.parquet').equals(table)
+
+
+def test_drop_columns_fails_on_missing_columns():
+    table = pa.table({'a': [1], 'b': [2]})
+
+    assert drop_columns(table, ['b']).column_names == ['a']
+    with raises(KeyError):
+        drop_columns(table, ['c'])
+
+
+def test_rename_columns_keeps_the_column_order():
+    table = pa.table({'a': [1], 'b': [2], 'c': [3]})
+
+    assert rename_columns(table, {'b': 'x'}).column_names == ['a', 'x', 'c']
+
+
+def test_cast_columns_casts_integral_doubles():
+    table = pa.table({'id': [1.0, None], 'name': ['a', 'b']})
+
+    result = cast_columns(table, {'id': pa.int64()})
+
+    assert result.schema.field('id').type == pa.int64()
+    assert result.column('id').to_pylist() == [1, None]
+
+
+def test_map_values_maps_unknown_values_to_null():
+    array = pa.array(['GBP', 'JPY', 'EUR'])
+
+    assert map_values(array, {'GBP': 'British Pound', 'EUR': 'Euro'}).to_pylist() == [
+        'British Pound', None, 'Euro']
+
+
+def test_left_join_matches_pandas_merge():
+    left = pd.DataFrame({'id': [3, 1, 2, 4], 'legal_address_id': [20, 10, 20, 99]})
+    right = pd.DataFrame({'address_id': [10, 20], 'city': ['Leeds', 'York']})
+
+    result = left_join(pa.Table.from_pandas(left), pa.Table.from_pandas(right),
+                       'legal_address_id', 'address_id')
+
+    expected = left.merge(right, how='left', left_on='legal_address_id', right_on='address_id')
+    assert result.column_names == list(expected.columns)
+    assert result.column('id').to_pylist() == expected['id'].tolist()
+    assert result.column('city').to_pylist() == [
+        None if pd.isna(city) else city for city in expected['city']]
+
+
+def test_left_join_on_a_shared_key_keeps_one_key_column():
+    left = pa.table({'staff_id': [1, 2], 'department_id': [2, 1]})
+    right = pa.table({'department_id': [1, 2], 'department_name': ['Sales', 'HR']})
+
+    result = left_join(left, right, 'department_id', 'department_id')
+
+    assert result.to_pydict() == {'staff_id': [1, 2],
+                                  'department_id': [2, 1],
+                                  'department_name': ['HR', 'Sales']}
@@ -0,0 +1,34 @@
+from utils.aws_clients import get_client, get_session, clear_clients
+
+
+class TestGetClient:
+    def test_returns_the_same_client_for_the_same_service(self):
+        assert get_client('s3') is get_client('s3')
+
+    def test_returns_separate_clients_for_different_services_and_regions(self):
+        s3 = get_client('s3')
+
+        assert get_client('secretsmanager', region_name='eu-west-2') is not s3
+        assert get_client('s3', region_name='us-east-1') is not s3
+        assert get_client('s3', region_name='us-east-1').meta.region_name == 'us-east-1'
+
+    def test_returns_a_separate_client_for_a_larger_connection_pool(self):
+        s3 = get_client('s3')
+        pooled = get_client('s3', max_pool_connections=16)
+
+        assert pooled is not s3
+        assert pooled is get_client('s3', max_pool_connections=16)
+        assert pooled.meta.config.max_pool_connections == 16
+        assert s3.meta.config.max_pool_connections == 10
+
+    def test_clients_share_one_session(self):
+        assert get_session() is get_session()
+
+    def test_clear_clients_creates_new_clients_on_next_use(self):
+        session = get_session()
+        s3 = get_client('s3')
+
+        clear_clients()
+
+        assert get_session() is not session
+        assert get_client('s3') is not s3
@@ -0,0 +1,111 @@
+from unittest.mock import Mock
+from concurrent.futures import ThreadPoolExecutor
+from pytest import raises
+import threading
+import time
+
+from utils.connection_pool import ConnectionPool
+
+credentials = {
+    "host": "localhost",
+    "port": 5432,
+    "database": "test_db",
+    "user": "test_user",
+    "password": "test_password"
+}
+
+
+class TestConnectionPool:
+    def test_connections_are_reused(self, mocker):
+        mock_connect = mocker.patch(
+            'utils.connection_pool.connect_to_server',
+            side_effect=lambda credentials: Mock())
+
+        pool = ConnectionPool(credentials, max_connections=2)
+
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+
+        assert first is second
+        assert mock_connect.call_count == 1
+        first.commit.assert_called()
+
+    def test_never_opens_more_than_max_connections(self, mocker):
+        mock_connect = mocker.patch(
+            'utils.connection_pool.connect_to_server',
+            side_effect=lambda credentials: Mock())
+
+        pool = ConnectionPool(credentials, max_connections=2)
+        in_use = []
+        lock = threading.Lock()
+
+        def work(_):
+            with pool.connection() as conn:
+                with lock:
+                    in_use.append(conn)
+                    assert len(set(in_use)) <= 2
+                time.sleep(0.01)
+                with lock:
+                    in_use.remove(conn)
+
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            list(executor.map(work, range(12)))
+
+        assert mock_connect.call_count == 2
+
+    def test_transaction_is_rolled_back_on_error(self, mocker):
+        mocker.patch(
+            'utils.connection_pool.connect_to_server',
+            side_effect=lambda credentials: Mock())
+
+        pool = ConnectionPool(credentials)
+
+        with raises(ValueError):
+            with pool.connection() as conn:
+                raise ValueError
+
+        conn.rollback.assert_called_once()
+        conn.commit.assert_not_called()
+
+    def test_close_all_closes_every_connection(self, mocker):
+        mocker.patch(
+            'utils.connection_pool.connect_to_server',
+            side_effect=lambda credentials: Mock())
+
+        pool = ConnectionPool(credentials, max_connections=2)
+        first = pool.get_connection()
+        second = pool.get_connection()
+        pool.put_connection(first)
+
+        pool.close_all()
+
+        first.close.assert_called_once()
+        second.close.assert_called_once()
+
+    def test_failed_connection_is_retried_with_refreshed_credentials(self, mocker):
+        rotated_credentials = dict(credentials, password='rotated_password')
+        connection = Mock()
+        mock_connect = mocker.patch(
+            'utils.connection_pool.connect_to_server',
+            side_effect=[Exception('password authentication failed'), connection])
+
+        pool = ConnectionPool(
+            credentials, refresh_credentials=lambda: rotated_credentials)
+
+        assert pool.get_connection() is connection
+        mock_connect.assert_called_with(rotated_credentials)
+
+    def test_failed_connection_is_not_retried_when_credentials_are_unchanged(self, mocker):
+        mock_connect = mocker.patch(
+            'utils.connection_pool.connect_to_server',
+            side_effect=Exception('could not connect'))
+
+        pool = ConnectionPool(
+            credentials, refresh_credentials=lambda: dict(credentials))
+
+        with raises(Exception):
+            pool.get_connection()
+
+        assert mock_connect.call_count == 1
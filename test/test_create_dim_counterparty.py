@@ -2,8 +2,10 @@ import pandas as pd
 import boto3
 import awswrangler as wr
 from moto import mock_s3
-from src.transformation.transformation_utils.create_dim_counterparty import create_dim_counterparty
+from src.transformation.transformation_utils.create_dim_counterparty import (create_dim_counterparty,
+                                                                             counterparty_address_columns)
 from utils.get_df import get_df
+from utils.reference_snapshot import ReferenceSnapshot
 
 test_counterparty_df = pd.DataFrame(
     {
@@ -92,6 +94,42 @@ def test_function_creates_new_folder_with_new_dim_table():
             drop=True), check_dtype=False)
 
 
+@mock_s3
+def test_function_joins_the_address_snapshot_without_an_address_file():
+    s3_client = boto3.client('s3', region_name='eu-west-2')
+    s3_client.create_bucket(
+        Bucket='test-extraction-bucket-',
+        CreateBucketConfiguration={
+            'LocationConstraint': 'eu-west-2'
+        }
+    )
+    s3_client.create_bucket(
+        Bucket='test-processed-bucket-',
+        CreateBucketConfiguration={
+            'LocationConstraint': 'eu-west-2'
+        }
+    )
+
+    counterparty_df = test_counterparty_df.assign(legal_address_id=[2, 1])
+    wr.s3.to_parquet(
+        df=counterparty_df,
+        path="s3://test-extraction-bucket-/totesys_extraction_data_/counterparty.parquet")
+
+    address_snapshot = ReferenceSnapshot(
+        'test-processed-bucket-', 'address', 'address_id', counterparty_address_columns)
+    address_snapshot.update(test_address_df.assign(city=['Leeds', 'York']), 1.0)
+
+    create_dim_counterparty("dim_folder", 'totesys_extraction_data_/counterparty.parquet', None,
+                            "test-extraction-bucket-", "test-processed-bucket-",
+                            address_snapshot=address_snapshot)
+
+    to_check = get_df('test-processed-bucket-',
+                      'dim_folder/dim_counterparty.parquet')
+
+    assert to_check['counterparty_id'].tolist() == [1, 2]
+    assert to_check['counterparty_legal_city'].tolist() == ['York', 'Leeds']
+
+
 # @mock_s3
 # def test_error_handling(caplog):
 
@@ -3,7 +3,7 @@ import boto3
 import awswrangler as wr
 import logging
 from src.transformation.transformation_utils.create_dim_date import (
-    create_dim_date)
+    create_dim_date, get_calendar, get_distinct_dates, full_calendar_key)
 from moto import mock_s3
 from utils.get_df import get_df
 
@@ -154,3 +154,86 @@ def test_dim_date_error_handling(caplog):
 
     assert caplog.records[0].message == "File not found in bucket"
     assert caplog.records[1].message == "No files Found on: s3://test-extraction-bucket-/totesys_extraction_data_/sales_order.parquet."
+
+
+def test_calendar_is_built_once_per_range():
+    calendar = get_calendar('2022-01-01', '2022-12-31')
+
+    assert get_calendar('2022-01-01', '2022-12-31') is calendar
+    assert len(calendar) == 365
+    assert calendar.loc[pd.Timestamp('2022-11-03'), 'day_name'] == 'Thursday'
+
+
+def test_distinct_dates_drop_times_duplicates_and_missing_values():
+    df = pd.DataFrame({
+        'created_at': ['2022-11-04 10:00:00', '2022-11-03 09:00:00', None],
+        'payment_date': ['2022-11-03', '2022-11-05', '2022-11-04']
+    })
+
+    result = get_distinct_dates([(df, ['created_at', 'payment_date'])])
+
+    assert list(result) == [pd.Timestamp('2022-11-04'),
+                            pd.Timestamp('2022-11-03'),
+                            pd.Timestamp('2022-11-05')]
+
+
+def create_buckets_with_sales_order(sales_order_df):
+    s3_client = boto3.client('s3', region_name='eu-west-2')
+    for bucket in ['test-extraction-bucket-', 'test-processed-bucket-']:
+        s3_client.create_bucket(
+            Bucket=bucket,
+            CreateBucketConfiguration={
+                'LocationConstraint': 'eu-west-2'
+            }
+        )
+
+    wr.s3.to_parquet(
+        df=sales_order_df,
+        path="s3://test-extraction-bucket-/totesys_extraction_data_/sales_order.parquet")
+
+    return s3_client
+
+
+@mock_s3
+def test_dates_outside_calendar_are_still_created():
+    sales_order_df = test_sales_order_df.copy()
+    sales_order_df['agreed_payment_date'] = ['1999-12-31', '2022-11-03']
+    create_buckets_with_sales_order(sales_order_df)
+
+    create_dim_date('dim_folder',
+                    'totesys_extraction_data_/sales_order.parquet',
+                    None,
+                    None,
+                    'test-extraction-bucket-',
+                    'test-processed-bucket-')
+
+    to_check = get_df('test-processed-bucket-',
+                      'dim_folder/dim_date.parquet')
+
+    assert list(to_check['date_id']) == [pd.Timestamp('2022-11-03'),
+                                         pd.Timestamp('1999-12-31')]
+    assert list(to_check['day_name']) == ['Thursday', 'Friday']
+
+
+@mock_s3
+def test_full_mode_emits_the_whole_calendar_once(monkeypatch):
+    monkeypatch.setenv('DIM_DATE_MODE', 'full')
+    s3_client = create_buckets_with_sales_order(test_sales_order_df)
+
+    for folder in ['dim_folder_1', 'dim_folder_2']:
+        create_dim_date(folder,
+                        'totesys_extraction_data_/sales_order.parquet',
+                        None,
+                        None,
+                        'test-extraction-bucket-',
+                        'test-processed-bucket-')
+
+    my_bucket = s3_client.list_objects_v2(Bucket='test-processed-bucket-')
+    result = sorted(item['Key'] for item in my_bucket['Contents'])
+
+    assert result == sorted([full_calendar_key, 'dim_folder_1/dim_date.parquet'])
+
+    to_check = get_df('test-processed-bucket-',
+                      'dim_folder_1/dim_date.parquet')
+    assert pd.Timestamp('2022-11-03') in set(to_check['date_id'])
+    assert len(to_check) > 365
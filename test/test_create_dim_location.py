@@ -115,3 +115,57 @@ def test_dim_location_error_handling(caplog):
 
     assert caplog.records[0].message == "File not found in bucket"
     assert caplog.records[1].message == "No files Found on: s3://test-extraction-bucket-/totesys_extraction_data_/address.parquet."
+
+
+@mock_s3
+def test_function_reads_address_through_shared_context(mocker):
+    from utils.transformation_context import TransformationContext
+    from src.transformation.transformation_utils.create_dim_counterparty import (
+        create_dim_counterparty)
+
+    s3_client = boto3.client('s3', region_name='eu-west-2')
+    for bucket in ['test-extraction-bucket-', 'test-processed-bucket-']:
+        s3_client.create_bucket(
+            Bucket=bucket,
+            CreateBucketConfiguration={
+                'LocationConstraint': 'eu-west-2'
+            }
+        )
+
+    wr.s3.to_parquet(
+        df=test_address_df,
+        path="s3://test-extraction-bucket-/totesys_extraction_data_/address.parquet")
+    wr.s3.to_parquet(
+        df=pd.DataFrame({
+            'counterparty_id': [1],
+            'counterparty_legal_name': ['Dummy'],
+            'legal_address_id': [2],
+            'commercial_contact': ['Dummy'],
+            'delivery_contact': ['Dummy'],
+            'created_at': ['Dummy'],
+            'last_updated': ['Dummy']}),
+        path="s3://test-extraction-bucket-/totesys_extraction_data_/counterparty.parquet")
+
+    read_parquet = mocker.spy(wr.s3, 'read_parquet')
+    context = TransformationContext()
+
+    create_dim_location(
+        'dim_folder',
+        'totesys_extraction_data_/address.parquet',
+        'test-extraction-bucket-',
+        'test-processed-bucket-',
+        context=context)
+    create_dim_counterparty(
+        'dim_folder',
+        'totesys_extraction_data_/counterparty.parquet',
+        'totesys_extraction_data_/address.parquet',
+        'test-extraction-bucket-',
+        'test-processed-bucket-',
+        context=context)
+
+    assert read_parquet.call_count == 2
+
+    to_check = get_df('test-processed-bucket-',
+                      'dim_folder/dim_location.parquet')
+    pd.testing.assert_frame_equal(
+        to_check.reset_index(drop=True), test_final_df, check_dtype=False)
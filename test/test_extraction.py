@@ -2,16 +2,29 @@ from src.extraction.extraction import (create_folder_prefix,
                                        set_start_time_minus_minutes,
                                        get_column_names,
                                        get_latest_table_rows,
+                                       get_latest_table_rows_query,
+                                       stream_table_rows,
+                                       get_all_table_rows_query,
+                                       copy_table_batches,
+                                       extract_table,
+                                       probe_tables,
                                        handler
                                        )
+from utils.watermarks import save_watermarks
 from freezegun import freeze_time
+from pytest import raises
 from datetime import datetime, timezone, timedelta
-from moto import mock_s3, mock_secretsmanager
+from moto import mock_s3, mock_secretsmanager, mock_cloudwatch
 import boto3
 from unittest.mock import Mock, MagicMock
 from psycopg2 import sql
 from argparse import Namespace
+from decimal import Decimal
 import logging
+import pandas as pd
+import pyarrow.parquet as pq
+import io
+import json
 
 
 @freeze_time("2012-01-01")
@@ -91,6 +104,282 @@ class TestGetTableRowsFunc:
                 table=sql.Identifier(table_name), time=sql.Literal(start_time)))
 
 
+class TestGetTableRowsAfterWatermarkFunc:
+    def test_query_uses_primary_key_as_tie_breaker(self):
+        mock_cursor = Mock()
+        mock_cursor.fetchall.return_value = []
+
+        start_time = datetime(2023, 7, 25)
+
+        get_latest_table_rows(mock_cursor, 'sales_order', start_time, 42)
+
+        mock_cursor.execute.assert_called_once_with(
+            sql.SQL("SELECT * FROM {table} WHERE ({table}.last_updated, {table}.{id}) > ({time}, {last_id});").format(
+                table=sql.Identifier('sales_order'),
+                id=sql.Identifier('sales_order_id'),
+                time=sql.Literal(start_time),
+                last_id=sql.Literal(42)))
+
+
+class TestProbeTablesFunc:
+    def test_probes_every_table_in_one_query(self):
+        mock_cursor = Mock()
+        mock_cursor.fetchall.return_value = [
+            ('currency', 0, None),
+            ('sales_order', 2, datetime(2023, 7, 25, 12))]
+        mock_connection = Mock()
+        mock_connection.cursor.return_value = mock_cursor
+
+        result = probe_tables(mock_connection, [
+            ('currency', datetime(2023, 7, 25), None),
+            ('sales_order', datetime(2023, 7, 25), 42)])
+
+        assert result == {'currency': (0, None),
+                          'sales_order': (2, datetime(2023, 7, 25, 12))}
+        mock_cursor.execute.assert_called_once()
+        mock_cursor.close.assert_called_once()
+
+
+@mock_s3
+class TestStreamTableRowsFunc:
+    def create_mock_connection(self, batches):
+        mock_cursor = Mock()
+        mock_cursor.fetchmany.side_effect = batches + [[]]
+        mock_cursor.description = [
+            ('payment_id', 23, None, 4, None, None, None),
+            ('payment_amount', 1700, None, -1, 10, 2, None),
+            ('paid', 16, None, 1, None, None, None),
+            ('last_updated', 1114, None, 8, None, None, None)]
+
+        mock_connection = Mock()
+        mock_connection.cursor.return_value = mock_cursor
+        return mock_connection, mock_cursor
+
+    def test_streams_each_batch_as_a_row_group(self):
+        s3 = boto3.client('s3', region_name='eu-west-2')
+        s3.create_bucket(
+            Bucket='test_bucket',
+            CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'}
+        )
+
+        batches = [
+            [(1, Decimal('10.50'), True, datetime(2023, 7, 1, 12)),
+             (2, None, False, datetime(2023, 7, 1, 13))],
+            [(3, Decimal('3.10'), None, datetime(2023, 7, 2, 9))]]
+        mock_connection, mock_cursor = self.create_mock_connection(batches)
+
+        result = stream_table_rows(
+            mock_connection,
+            get_all_table_rows_query('payment'),
+            'test_bucket',
+            'folder/payment.parquet',
+            batch_size=2)
+
+        assert result == 3
+        mock_connection.cursor.assert_called_once_with(name='stream_payment')
+        mock_cursor.execute.assert_called_once_with(
+            sql.SQL("SELECT * FROM {table};").format(
+                table=sql.Identifier('payment')))
+        mock_cursor.close.assert_called_once()
+
+        body = s3.get_object(
+            Bucket='test_bucket', Key='folder/payment.parquet')['Body'].read()
+        parquet_file = pq.ParquetFile(io.BytesIO(body))
+
+        assert parquet_file.num_row_groups == 2
+        assert str(parquet_file.schema_arrow.field(
+            'payment_amount').type) == 'decimal128(10, 2)'
+
+        df = parquet_file.read().to_pandas()
+        assert df['payment_id'].tolist() == [1, 2, 3]
+        assert df['payment_amount'].tolist()[0] == Decimal('10.50')
+        assert pd.isna(df['payment_amount'].tolist()[1])
+        assert df['last_updated'].tolist()[2] == pd.Timestamp(
+            '2023-07-02 09:00:00')
+
+    def test_keeps_the_schema_when_the_first_batch_only_holds_nulls(self):
+        s3 = boto3.client('s3', region_name='eu-west-2')
+        s3.create_bucket(
+            Bucket='test_bucket',
+            CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'}
+        )
+
+        batches = [[(1, None, None, None)],
+                   [(2, Decimal('0.123456789012345678901'), 'a0eebc99',
+                     Decimal('1234567890123456789012345678901234567890.5'))]]
+        mock_connection, mock_cursor = self.create_mock_connection(batches)
+        # an unconstrained numeric, a uuid, which has no mapping, and a numeric wider than a decimal128
+        mock_cursor.description = [
+            ('payment_id', 23, None, 4, None, None, None),
+            ('payment_amount', 1700, None, -1, 65535, 65535, None),
+            ('reference', 2950, None, 16, None, None, None),
+            ('total', 1700, None, -1, 50, 1, None)]
+
+        result = stream_table_rows(
+            mock_connection,
+            get_all_table_rows_query('payment'),
+            'test_bucket',
+            'folder/payment.parquet',
+            batch_size=1)
+
+        assert result == 2
+
+        body = s3.get_object(
+            Bucket='test_bucket', Key='folder/payment.parquet')['Body'].read()
+        table = pq.read_table(io.BytesIO(body))
+
+        assert str(table.schema.field('payment_amount').type) == 'string'
+        assert str(table.schema.field('reference').type) == 'string'
+        assert table.column('payment_amount').to_pylist() == [
+            None, '0.123456789012345678901']
+        assert table.column('reference').to_pylist() == [None, 'a0eebc99']
+        assert table.column('total').to_pylist() == [
+            None, '1234567890123456789012345678901234567890.5']
+
+    def test_does_not_write_a_file_if_there_are_no_rows(self):
+        s3 = boto3.client('s3', region_name='eu-west-2')
+        s3.create_bucket(
+            Bucket='test_bucket',
+            CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'}
+        )
+
+        mock_connection, mock_cursor = self.create_mock_connection([])
+
+        result = stream_table_rows(
+            mock_connection,
+            get_all_table_rows_query('payment'),
+            'test_bucket',
+            'folder/payment.parquet')
+
+        assert result == 0
+        assert 'Contents' not in s3.list_objects_v2(Bucket='test_bucket')
+        mock_cursor.close.assert_called_once()
+
+
+class TestCopyTableBatchesFunc:
+    def create_mock_connection(self, csv_data):
+        mock_cursor = Mock()
+        mock_cursor.description = [
+            ('sales_order_id', 23, None, 4, None, None, None),
+            ('last_updated', 1114, None, 8, None, None, None),
+            ('unit_price', 1700, None, -1, 10, 2, None),
+            ('agreed_delivery_date', 1043, None, -1, None, None, None),
+            ('paid', 16, None, 1, None, None, None)]
+        mock_cursor.copy_expert.side_effect = lambda statement, file: file.write(
+            csv_data)
+
+        mock_connection = Mock()
+        mock_connection.cursor.return_value = mock_cursor
+        return mock_connection, mock_cursor
+
+    def test_parses_copy_output_into_typed_columns(self):
+        csv_data = (b'sales_order_id,last_updated,unit_price,agreed_delivery_date,paid\n'
+                    b'1,2022-11-03 14:20:52.186,3.94,2022-11-10,t\n'
+                    b'2,2022-11-04 09:00:00,,"",f\n')
+        mock_connection, mock_cursor = self.create_mock_connection(csv_data)
+
+        batches = list(copy_table_batches(mock_connection, 'sales_order'))
+
+        mock_cursor.copy_expert.assert_called_once()
+        assert mock_cursor.copy_expert.call_args[0][0] == sql.SQL(
+            "COPY (SELECT * FROM {table}) TO STDOUT WITH (FORMAT csv, HEADER true);").format(
+            table=sql.Identifier('sales_order'))
+        mock_cursor.close.assert_called_once()
+
+        assert len(batches) == 1
+        assert batches[0].to_pydict() == {
+            'sales_order_id': [1, 2],
+            'last_updated': [datetime(2022, 11, 3, 14, 20, 52, 186000),
+                             datetime(2022, 11, 4, 9)],
+            'unit_price': [Decimal('3.94'), None],
+            'agreed_delivery_date': ['2022-11-10', ''],
+            'paid': [True, False]}
+
+    def test_streams_copy_output_larger_than_the_pipe_in_batches(self):
+        rows = b''.join(b'%d,2022-11-03 14:20:52.186,3.94,2022-11-10,t\n' % n
+                        for n in range(20000))
+        csv_data = b'sales_order_id,last_updated,unit_price,agreed_delivery_date,paid\n' + rows
+        mock_connection, mock_cursor = self.create_mock_connection(csv_data)
+
+        batches = list(copy_table_batches(mock_connection, 'sales_order', block_size=64 * 1024))
+
+        assert len(batches) > 1
+        assert sum(batch.num_rows for batch in batches) == 20000
+        mock_cursor.close.assert_called_once()
+
+    def test_raises_the_error_of_a_failed_copy(self):
+        mock_connection, mock_cursor = self.create_mock_connection(b'')
+
+        def failing_copy(statement, file):
+            file.write(b'sales_order_id,last_updated,unit_price,agreed_delivery_date,paid\n'
+                       b'1,2022-11-03 14:20:52.186,3.94,2022-11-10,t\n')
+            raise ValueError('connection lost')
+        mock_cursor.copy_expert.side_effect = failing_copy
+
+        with raises(ValueError, match='connection lost'):
+            list(copy_table_batches(mock_connection, 'sales_order'))
+
+        mock_cursor.close.assert_called_once()
+
+    def test_stops_the_copy_when_the_batches_are_no_longer_read(self):
+        rows = b''.join(b'%d,2022-11-03 14:20:52.186,3.94,2022-11-10,t\n' % n
+                        for n in range(200000))
+        csv_data = b'sales_order_id,last_updated,unit_price,agreed_delivery_date,paid\n' + rows
+        mock_connection, mock_cursor = self.create_mock_connection(csv_data)
+
+        batches = copy_table_batches(mock_connection, 'sales_order', block_size=64 * 1024)
+        next(batches)
+        batches.close()
+
+        mock_cursor.close.assert_called_once()
+
+    def test_writes_unconstrained_numerics_as_text(self):
+        csv_data = (b'payment_id,payment_amount\n'
+                    b'1,0.123456789012345678901\n'
+                    b'2,\n')
+        mock_connection, mock_cursor = self.create_mock_connection(csv_data)
+        mock_cursor.description = [
+            ('payment_id', 23, None, 4, None, None, None),
+            ('payment_amount', 1700, None, -1, 65535, 65535, None)]
+
+        batches = list(copy_table_batches(mock_connection, 'payment'))
+
+        assert str(batches[0].schema.field('payment_amount').type) == 'string'
+        assert batches[0].to_pydict() == {
+            'payment_id': [1, 2],
+            'payment_amount': ['0.123456789012345678901', None]}
+
+    @mock_s3
+    def test_extract_table_writes_copy_snapshot_to_s3(self):
+        s3 = boto3.client('s3', region_name='eu-west-2')
+        s3.create_bucket(
+            Bucket='test_bucket',
+            CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'}
+        )
+
+        csv_data = (b'sales_order_id,last_updated,unit_price,agreed_delivery_date,paid\n'
+                    b'1,2022-11-03 14:20:52.186,3.94,2022-11-10,t\n'
+                    b'2,2022-11-03 14:20:52.186,2.50,2022-11-11,f\n')
+        mock_connection, mock_cursor = self.create_mock_connection(csv_data)
+
+        row_count, watermark = extract_table(
+            mock_connection,
+            'sales_order',
+            'test_bucket',
+            'folder',
+            snapshot_mode='copy')
+
+        assert row_count == 2
+        assert watermark == {
+            'last_updated': datetime(2022, 11, 3, 14, 20, 52, 186000), 'id': 2}
+        mock_cursor.fetchall.assert_not_called()
+
+        body = s3.get_object(
+            Bucket='test_bucket', Key='folder/sales_order.parquet')['Body'].read()
+        df = pq.read_table(io.BytesIO(body)).to_pandas()
+        assert df['sales_order_id'].tolist() == [1, 2]
+
+
 @freeze_time("2023-07-01")
 @mock_secretsmanager
 @mock_s3
@@ -129,6 +418,8 @@ class TestHandlerTest:
         mocked_connection = MagicMock(
             return_value=Namespace(
                 cursor=mocked_cursor,
+                commit=lambda: None,
+                rollback=lambda: None,
                 close=lambda: None))
 
         mocker.patch(
@@ -147,6 +438,325 @@ class TestHandlerTest:
         assert result == 'totesys_extraction_data_1688169600.0/test_table.parquet'
 
 
+@freeze_time("2023-07-01")
+@mock_secretsmanager
+@mock_s3
+class TestHandlerWatermarks:
+    def test_next_run_extracts_rows_after_saved_watermark(self, mocker):
+        s3_client = boto3.client('s3', region_name='eu-west-2')
+        s3_client.create_bucket(
+            Bucket='nc-project-ingestion-zone-',
+            CreateBucketConfiguration={
+                'LocationConstraint': 'eu-west-2'
+            }
+        )
+        secret_client = boto3.client("secretsmanager", region_name='eu-west-2')
+
+        secret_client.create_secret(
+            Name="pg-oltp-db", SecretString='''{
+                "host": "test_host",
+                "port": 5432,
+                "database": "test_db",
+                "user": "test_user",
+                "password": "test_pass"
+            }''')
+
+        mock_cursor = Mock()
+        mock_cursor.fetchall.return_value = [
+            (1, datetime(2023, 6, 30, 23, 50)),
+            (2, datetime(2023, 6, 30, 23, 55))]
+        mock_cursor.description = [['test_table_id'], ['last_updated']]
+        mock_connection = Mock()
+        mock_connection.cursor.return_value = mock_cursor
+
+        mocker.patch(
+            "src.extraction.extraction.connect_to_server",
+            return_value=mock_connection)
+        mocker.patch(
+            "src.extraction.extraction.lst_table_names",
+            new=['test_table'])
+
+        handler('test', 'test')
+        handler('test', 'test')
+
+        mock_cursor.execute.assert_called_with(
+            sql.SQL("SELECT * FROM {table} WHERE ({table}.last_updated, {table}.{id}) > ({time}, {last_id});").format(
+                table=sql.Identifier('test_table'),
+                id=sql.Identifier('test_table_id'),
+                time=sql.Literal(datetime(2023, 6, 30, 23, 55)),
+                last_id=sql.Literal(2)))
+
+    def test_tables_without_a_watermark_are_extracted_in_full(self, mocker):
+        s3_client = boto3.client('s3', region_name='eu-west-2')
+        s3_client.create_bucket(
+            Bucket='nc-project-ingestion-zone-',
+            CreateBucketConfiguration={
+                'LocationConstraint': 'eu-west-2'
+            }
+        )
+        save_watermarks('nc-project-ingestion-zone-', {
+            'table_one': {'last_updated': datetime(2023, 6, 30, 23, 50), 'id': 1}})
+        secret_client = boto3.client("secretsmanager", region_name='eu-west-2')
+
+        secret_client.create_secret(
+            Name="pg-oltp-db", SecretString='''{
+                "host": "test_host",
+                "port": 5432,
+                "database": "test_db",
+                "user": "test_user",
+                "password": "test_pass"
+            }''')
+
+        mock_cursor = Mock()
+        mock_cursor.fetchall.return_value = []
+        mock_connection = Mock()
+        mock_connection.cursor.return_value = mock_cursor
+
+        mocker.patch(
+            "src.extraction.extraction.connect_to_server",
+            return_value=mock_connection)
+        mocker.patch(
+            "src.extraction.extraction.lst_table_names",
+            new=['table_one', 'table_two'])
+
+        handler('test', 'test')
+
+        assert [call[0][0] for call in mock_cursor.execute.call_args_list] == [
+            get_latest_table_rows_query('table_one', datetime(2023, 6, 30, 23, 50), 1),
+            get_all_table_rows_query('table_two')]
+
+
+@freeze_time("2023-07-01")
+@mock_secretsmanager
+@mock_s3
+class TestHandlerConcurrentExtraction:
+    def test_tables_are_extracted_on_pooled_connections(self, mocker, monkeypatch):
+        s3_client = boto3.client('s3', region_name='eu-west-2')
+        s3_client.create_bucket(
+            Bucket='nc-project-ingestion-zone-',
+            CreateBucketConfiguration={
+                'LocationConstraint': 'eu-west-2'
+            }
+        )
+        secret_client = boto3.client("secretsmanager", region_name='eu-west-2')
+
+        secret_client.create_secret(
+            Name="pg-oltp-db", SecretString='''{
+                "host": "test_host",
+                "port": 5432,
+                "database": "test_db",
+                "user": "test_user",
+                "password": "test_pass"
+            }''')
+
+        def create_mock_connection(credentials):
+            mock_cursor = Mock()
+            mock_cursor.fetchall.return_value = [(1, 'Huzaifa')]
+            mock_cursor.description = [['person_id'], ['forename']]
+            mock_connection = Mock()
+            mock_connection.cursor.return_value = mock_cursor
+            return mock_connection
+
+        mock_connect = mocker.patch(
+            "utils.connection_pool.connect_to_server",
+            side_effect=create_mock_connection)
+        mocker.patch(
+            "src.extraction.extraction.lst_table_names",
+            new=['table_one', 'table_two', 'table_three', 'table_four'])
+        monkeypatch.setenv('EXTRACTION_MAX_WORKERS', '2')
+
+        handler('test', 'test')
+
+        my_bucket = s3_client.list_objects_v2(
+            Bucket='nc-project-ingestion-zone-')
+        result = sorted(item['Key'] for item in my_bucket['Contents'])
+
+        assert result == [
+            'totesys_extraction_data_1688169600.0/table_four.parquet',
+            'totesys_extraction_data_1688169600.0/table_one.parquet',
+            'totesys_extraction_data_1688169600.0/table_three.parquet',
+            'totesys_extraction_data_1688169600.0/table_two.parquet']
+        assert 1 <= mock_connect.call_count <= 2
+
+
+@freeze_time("2023-07-01")
+@mock_secretsmanager
+@mock_s3
+class TestHandlerPartitionedLayout:
+    def test_writes_partitions_and_a_manifest(self, mocker, monkeypatch):
+        s3_client = boto3.client('s3', region_name='eu-west-2')
+        s3_client.create_bucket(
+            Bucket='nc-project-ingestion-zone-',
+            CreateBucketConfiguration={
+                'LocationConstraint': 'eu-west-2'
+            }
+        )
+        secret_client = boto3.client("secretsmanager", region_name='eu-west-2')
+
+        secret_client.create_secret(
+            Name="pg-oltp-db", SecretString='''{
+                "host": "test_host",
+                "port": 5432,
+                "database": "test_db",
+                "user": "test_user",
+                "password": "test_pass"
+            }''')
+
+        mock_cursor = Mock()
+        mock_cursor.fetchall.side_effect = [[(1, 'Huzaifa')], []]
+        mock_cursor.description = [['person_id'], ['forename']]
+        mock_connection = Mock()
+        mock_connection.cursor.return_value = mock_cursor
+
+        mocker.patch(
+            "src.extraction.extraction.connect_to_server", return_value=mock_connection)
+        mocker.patch(
+            "src.extraction.extraction.lst_table_names", new=['table_one', 'table_two'])
+        monkeypatch.setenv('INGESTION_LAYOUT', 'hive')
+
+        handler('test', 'test')
+
+        my_bucket = s3_client.list_objects_v2(Bucket='nc-project-ingestion-zone-')
+        result = sorted(item['Key'] for item in my_bucket['Contents'])
+
+        assert result == [
+            'manifests/totesys_extraction_data_1688169600.0.json',
+            'table=table_one/date=2023-07-01/hour=00/totesys_extraction_data_1688169600.0.parquet']
+
+        manifest = s3_client.get_object(
+            Bucket='nc-project-ingestion-zone-',
+            Key='manifests/totesys_extraction_data_1688169600.0.json')
+        assert json.loads(manifest['Body'].read())['files'] == [
+            'table=table_one/date=2023-07-01/hour=00/totesys_extraction_data_1688169600.0.parquet']
+
+
+@freeze_time("2023-07-01")
+@mock_cloudwatch
+@mock_secretsmanager
+@mock_s3
+class TestHandlerProbe:
+    def test_only_changed_tables_are_extracted(self, mocker, monkeypatch):
+        s3_client = boto3.client('s3', region_name='eu-west-2')
+        s3_client.create_bucket(
+            Bucket='nc-project-ingestion-zone-',
+            CreateBucketConfiguration={
+                'LocationConstraint': 'eu-west-2'
+            }
+        )
+        save_watermarks('nc-project-ingestion-zone-', {
+            table: {'last_updated': datetime(2023, 6, 30, 23, 45), 'id': 1}
+            for table in ['table_one', 'table_two']})
+        secret_client = boto3.client("secretsmanager", region_name='eu-west-2')
+
+        secret_client.create_secret(
+            Name="pg-oltp-db", SecretString='''{
+                "host": "test_host",
+                "port": 5432,
+                "database": "test_db",
+                "user": "test_user",
+                "password": "test_pass"
+            }''')
+
+        mock_cursor = Mock()
+        mock_cursor.fetchall.side_effect = [
+            [('table_one', 1, datetime(2023, 6, 30, 23, 50)), ('table_two', 0, None)],
+            [(1, 'Huzaifa')]]
+        mock_cursor.description = [['person_id'], ['forename']]
+        mock_connection = Mock()
+        mock_connection.cursor.return_value = mock_cursor
+
+        mocker.patch(
+            "src.extraction.extraction.connect_to_server", return_value=mock_connection)
+        mocker.patch(
+            "src.extraction.extraction.lst_table_names", new=['table_one', 'table_two'])
+        monkeypatch.setenv('EXTRACTION_PROBE', '1')
+
+        handler('test', 'test')
+
+        my_bucket = s3_client.list_objects_v2(
+            Bucket='nc-project-ingestion-zone-', Prefix='totesys_extraction_data_1688169600.0')
+        result = [item['Key'] for item in my_bucket['Contents']]
+
+        assert result == ['totesys_extraction_data_1688169600.0/table_one.parquet']
+        assert mock_cursor.execute.call_count == 2
+
+        metrics = boto3.client('cloudwatch', region_name='eu-west-2').list_metrics(
+            Namespace='Totesys/Extraction')['Metrics']
+        assert sorted(metric['Dimensions'][0]['Value'] for metric in metrics) == [
+            'table_one', 'table_two']
+
+
+@freeze_time("2023-07-01")
+@mock_secretsmanager
+@mock_s3
+class TestHandlerChangeDataCapture:
+    def create_resources(self):
+        s3_client = boto3.client('s3', region_name='eu-west-2')
+        s3_client.create_bucket(
+            Bucket='nc-project-ingestion-zone-',
+            CreateBucketConfiguration={
+                'LocationConstraint': 'eu-west-2'
+            }
+        )
+        secret_client = boto3.client("secretsmanager", region_name='eu-west-2')
+
+        secret_client.create_secret(
+            Name="pg-oltp-db", SecretString='''{
+                "host": "test_host",
+                "port": 5432,
+                "database": "test_db",
+                "user": "test_user",
+                "password": "test_pass"
+            }''')
+
+    def test_consumes_the_slot_instead_of_polling(self, mocker, monkeypatch):
+        self.create_resources()
+        replication_connection = Mock()
+        mocker.patch(
+            "src.extraction.extraction.open_replication_connection",
+            return_value=replication_connection)
+        mocker.patch(
+            "src.extraction.extraction.ensure_replication_slot", return_value=False)
+        mock_consume = mocker.patch(
+            "src.extraction.extraction.consume_changes", return_value=3)
+        mock_connect = mocker.patch("src.extraction.extraction.connect_to_server")
+        monkeypatch.setenv('EXTRACTION_SOURCE', 'cdc')
+        monkeypatch.setenv('CDC_MAX_SECONDS', '30')
+
+        handler('test', 'test')
+
+        assert mock_consume.call_args[1]['max_seconds'] == 30
+        mock_connect.assert_not_called()
+        replication_connection.close.assert_called_once()
+
+    def test_polls_once_when_the_slot_is_created(self, mocker, monkeypatch):
+        self.create_resources()
+        mocker.patch("src.extraction.extraction.open_replication_connection")
+        mocker.patch(
+            "src.extraction.extraction.ensure_replication_slot", return_value=True)
+        mock_consume = mocker.patch("src.extraction.extraction.consume_changes")
+        mock_cursor = Mock()
+        mock_cursor.fetchall.return_value = [(1, 'Huzaifa')]
+        mock_cursor.description = [['person_id'], ['forename']]
+        mock_connection = Mock()
+        mock_connection.cursor.return_value = mock_cursor
+        mocker.patch(
+            "src.extraction.extraction.connect_to_server", return_value=mock_connection)
+        mocker.patch(
+            "src.extraction.extraction.lst_table_names", new=['test_table'])
+        monkeypatch.setenv('EXTRACTION_SOURCE', 'cdc')
+
+        handler('test', 'test')
+
+        s3_client = boto3.client('s3', region_name='eu-west-2')
+        my_bucket = s3_client.list_objects_v2(
+            Bucket='nc-project-ingestion-zone-')
+
+        assert my_bucket['Contents'][0]['Key'] == \
+            'totesys_extraction_data_1688169600.0/test_table.parquet'
+        mock_consume.assert_not_called()
+
+
 @freeze_time("2023-07-01")
 @mock_secretsmanager
 @mock_s3
@@ -182,6 +792,8 @@ class TestLogging:
         mocked_connection = MagicMock(
             return_value=Namespace(
                 cursor=mocked_cursor,
+                commit=lambda: None,
+                rollback=lambda: None,
                 close=lambda: None))
 
         mocker.patch(
@@ -195,5 +807,5 @@ class TestLogging:
             handler("test", "test")
         # or, if you really need to check the log-level
         assert caplog.records[-1].levelname == "INFO"
-        assert caplog.records[-1].message == "No new data within test_table in from 2023-06-30 23:45:00 to 2023-07-01 00:00:00"
+        assert caplog.records[-1].message == "No data within test_table up to 2023-07-01 00:00:00"
         handler("test", "test")
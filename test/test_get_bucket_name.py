@@ -3,6 +3,7 @@ import boto3
 from pytest import raises
 
 from utils.get_bucket_name import get_bucket_name
+from utils.aws_clients import get_client
 
 
 @mock_s3
@@ -55,3 +56,34 @@ class TestGetBucketName:
         assert len(caplog.records) == 1
         assert caplog.records[0].levelname == "ERROR"
         assert "Buckets need to be created before extraction" in caplog.records[0].message
+
+    def test_resolved_name_is_reused_without_listing_buckets(self, mocker):
+        s3_client = boto3.client('s3')
+        s3_client.create_bucket(
+            Bucket='mockbucket-45789',
+            CreateBucketConfiguration={
+                'LocationConstraint': 'eu-west-2'
+            }
+        )
+
+        assert get_bucket_name("mockbucket") == 'mockbucket-45789'
+
+        list_buckets = mocker.spy(get_client('s3'), 'list_buckets')
+        assert get_bucket_name("mockbucket") == 'mockbucket-45789'
+        list_buckets.assert_not_called()
+
+    def test_buckets_are_listed_again_when_the_cache_is_disabled(self, monkeypatch):
+        monkeypatch.setenv('BUCKET_NAME_CACHE_TTL', '0')
+        s3_client = boto3.client('s3')
+        s3_client.create_bucket(
+            Bucket='mockbucket-1',
+            CreateBucketConfiguration={
+                'LocationConstraint': 'eu-west-2'
+            }
+        )
+
+        assert get_bucket_name("mockbucket") == 'mockbucket-1'
+
+        s3_client.delete_bucket(Bucket='mockbucket-1')
+        with raises(IndexError):
+            get_bucket_name("mockbucket")
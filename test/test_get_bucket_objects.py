@@ -3,7 +3,7 @@ import boto3
 import pandas as pd
 from pytest import raises
 
-from utils.get_bucket_objects import get_bucket_objects
+from utils.get_bucket_objects import get_bucket_objects, get_bucket_prefixes
 from data.test_df_data import currency_data
 
 
@@ -94,3 +94,94 @@ class TestGetBucketObjects:
 
         with raises(Exception):
             get_bucket_objects('hello')
+
+    def test_function_returns_every_object_when_there_are_more_than_1000(self):
+
+        s3 = boto3.client('s3', region_name='eu-west-2')
+        bucket_name = 'test_bucket'
+
+        s3.create_bucket(
+            Bucket=bucket_name,
+            CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'}
+        )
+
+        for number in range(1005):
+            s3.put_object(
+                Bucket=bucket_name, Key=f'folder/{number:04}.parquet', Body=b'')
+
+        my_objects = get_bucket_objects(bucket_name, s3_client=s3)
+        assert len(my_objects) == 1005
+        assert my_objects[-1] == 'folder/1004.parquet'
+
+    def test_function_only_returns_objects_under_prefix(self):
+
+        s3 = boto3.client('s3', region_name='eu-west-2')
+        bucket_name = 'test_bucket'
+
+        s3.create_bucket(
+            Bucket=bucket_name,
+            CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'}
+        )
+
+        for key in ['totesys_extraction_data_2/currency.parquet',
+                    'totesys_transformed_data_1/currency.parquet',
+                    'extraction_state/watermarks.json']:
+            s3.put_object(Bucket=bucket_name, Key=key, Body=b'')
+
+        my_objects = get_bucket_objects(
+            bucket_name, prefix='totesys_extraction_data_')
+        assert my_objects == ['totesys_extraction_data_2/currency.parquet']
+
+        assert get_bucket_objects(bucket_name, prefix='missing') is None
+
+    def test_function_stops_after_max_keys(self):
+
+        s3 = boto3.client('s3', region_name='eu-west-2')
+        bucket_name = 'test_bucket'
+
+        s3.create_bucket(
+            Bucket=bucket_name,
+            CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'}
+        )
+
+        for key in ['data1.parquet', 'data2.parquet', 'data3.parquet']:
+            s3.put_object(Bucket=bucket_name, Key=key, Body=b'')
+
+        assert get_bucket_objects(bucket_name, max_keys=1) == ['data1.parquet']
+
+
+@mock_s3
+class TestGetBucketPrefixes:
+
+    def test_function_returns_folders_under_prefix(self):
+
+        s3 = boto3.client('s3', region_name='eu-west-2')
+        bucket_name = 'test_bucket'
+
+        s3.create_bucket(
+            Bucket=bucket_name,
+            CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'}
+        )
+
+        for key in ['totesys_processed_data_1/dim_currency.parquet',
+                    'totesys_processed_data_1/dim_design.parquet',
+                    'totesys_processed_data_2/dim_currency.parquet',
+                    'totesys_loaded_data_0/dim_currency.parquet']:
+            s3.put_object(Bucket=bucket_name, Key=key, Body=b'')
+
+        my_folders = get_bucket_prefixes(
+            bucket_name, prefix='totesys_processed_data_')
+        assert my_folders == ['totesys_processed_data_1',
+                              'totesys_processed_data_2']
+
+    def test_function_returns_empty_list_if_there_are_no_folders(self):
+
+        s3 = boto3.client('s3', region_name='eu-west-2')
+        bucket_name = 'test_bucket'
+
+        s3.create_bucket(
+            Bucket=bucket_name,
+            CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'}
+        )
+
+        assert get_bucket_prefixes(bucket_name) == []
@@ -0,0 +1,80 @@
+from utils.get_folder_batches import (get_folder_batches, get_batch_table_files, get_extraction_time,
+                                      get_table_file_name, get_run_name)
+
+grouped_files = {
+    'totesys_extraction_data_1691420262.308896': [
+        'totesys_extraction_data_1691420262.308896/address.parquet'],
+    'totesys_extraction_data_999999999.5': [
+        'totesys_extraction_data_999999999.5/address.parquet',
+        'totesys_extraction_data_999999999.5/staff.parquet'],
+    'totesys_extraction_data_1691420862.1': [
+        'totesys_extraction_data_1691420862.1/staff.parquet']
+}
+
+
+class TestGetFolderBatches:
+    def test_every_folder_is_its_own_batch_by_default(self):
+        result = get_folder_batches(grouped_files)
+
+        assert [[folder for folder, _ in batch] for batch in result] == [
+            ['totesys_extraction_data_999999999.5'],
+            ['totesys_extraction_data_1691420262.308896'],
+            ['totesys_extraction_data_1691420862.1']]
+
+    def test_folders_are_batched_oldest_first_by_extraction_time(self):
+        result = get_folder_batches(grouped_files, batch_size=2)
+
+        assert [[folder for folder, _ in batch] for batch in result] == [
+            ['totesys_extraction_data_999999999.5',
+             'totesys_extraction_data_1691420262.308896'],
+            ['totesys_extraction_data_1691420862.1']]
+        assert result[1][0][1] == [
+            'totesys_extraction_data_1691420862.1/staff.parquet']
+
+    def test_batch_sizes_below_one_put_every_folder_in_its_own_batch(self):
+        for batch_size in [0, -3]:
+            result = get_folder_batches(grouped_files, batch_size=batch_size)
+
+            assert [[folder for folder, _ in batch] for batch in result] == [
+                ['totesys_extraction_data_999999999.5'],
+                ['totesys_extraction_data_1691420262.308896'],
+                ['totesys_extraction_data_1691420862.1']]
+
+    def test_returns_empty_list_when_there_are_no_folders(self):
+        assert get_folder_batches({}, batch_size=5) == []
+
+
+class TestGetBatchTableFiles:
+    def test_groups_files_of_each_table_oldest_first(self):
+        batch = get_folder_batches(grouped_files, batch_size=3)[0]
+
+        assert get_batch_table_files(batch) == {
+            'address.parquet': [
+                'totesys_extraction_data_999999999.5/address.parquet',
+                'totesys_extraction_data_1691420262.308896/address.parquet'],
+            'staff.parquet': [
+                'totesys_extraction_data_999999999.5/staff.parquet',
+                'totesys_extraction_data_1691420862.1/staff.parquet']}
+
+    def test_groups_partitioned_files_by_their_table(self):
+        batch = [('totesys_extraction_data_1.0', [
+            'table=staff/date=1970-01-01/hour=00/totesys_extraction_data_1.0.parquet']),
+            ('totesys_extraction_data_2.0', [
+                'table=staff/date=1970-01-01/hour=00/totesys_extraction_data_2.0.parquet'])]
+
+        assert get_batch_table_files(batch) == {'staff.parquet': [
+            'table=staff/date=1970-01-01/hour=00/totesys_extraction_data_1.0.parquet',
+            'table=staff/date=1970-01-01/hour=00/totesys_extraction_data_2.0.parquet']}
+
+
+def test_get_extraction_time_reads_the_timestamp_of_a_folder():
+    assert get_extraction_time('totesys_extraction_data_1691420262.308896') == 1691420262.308896
+    assert get_extraction_time('totesys_extraction_data_') == float('inf')
+
+
+def test_keys_of_both_layouts_name_their_table_and_run():
+    flat = 'totesys_extraction_data_1.5/sales_order.parquet'
+    partitioned = 'table=sales_order/date=1970-01-01/hour=00/totesys_extraction_data_1.5.parquet'
+
+    assert get_table_file_name(flat) == get_table_file_name(partitioned) == 'sales_order.parquet'
+    assert get_run_name(flat) == get_run_name(partitioned) == 'totesys_extraction_data_1.5'
@@ -4,7 +4,8 @@ import json
 from pytest import raises
 import logging
 
-from utils.get_secret import get_secret
+from utils.get_secret import get_secret, invalidate_secret
+from utils.aws_clients import get_client
 
 
 @mock_secretsmanager
@@ -39,3 +40,65 @@ class TestGetSecret:
         # or, if you really need to check the log-level
         assert caplog.records[-1].levelname == "DEBUG"
         assert caplog.records[-1].message == "This secret doesn't exist."
+
+    def test_get_secret_returns_cached_secret_without_calling_secrets_manager(
+            self, mocker):
+        secret_manager = boto3.client(
+            'secretsmanager', region_name='eu-west-2')
+        secret_manager.create_secret(
+            Name='secret',
+            SecretString=json.dumps({'user': 'Hasan', 'password': 'Password'})
+        )
+
+        get_secret('secret')
+
+        get_secret_value = mocker.spy(
+            get_client('secretsmanager', region_name='eu-west-2'), 'get_secret_value')
+        result = get_secret('secret')
+
+        assert result == {'user': 'Hasan', 'password': 'Password'}
+        get_secret_value.assert_not_called()
+
+    def test_get_secret_fetches_rotated_secret_when_refreshed_or_invalidated(
+            self):
+        secret_manager = boto3.client(
+            'secretsmanager', region_name='eu-west-2')
+        secret_manager.create_secret(
+            Name='secret',
+            SecretString=json.dumps({'user': 'Hasan', 'password': 'Password'})
+        )
+
+        get_secret('secret')
+
+        secret_manager.put_secret_value(
+            SecretId='secret',
+            SecretString=json.dumps({'user': 'Hasan', 'password': 'Rotated'})
+        )
+
+        assert get_secret('secret')['password'] == 'Password'
+        assert get_secret('secret', refresh=True)['password'] == 'Rotated'
+
+        secret_manager.put_secret_value(
+            SecretId='secret',
+            SecretString=json.dumps({'user': 'Hasan', 'password': 'Rotated again'})
+        )
+        invalidate_secret('secret')
+
+        assert get_secret('secret')['password'] == 'Rotated again'
+
+    def test_get_secret_does_not_cache_when_ttl_is_zero(self, monkeypatch):
+        monkeypatch.setenv('SECRET_CACHE_TTL', '0')
+        secret_manager = boto3.client(
+            'secretsmanager', region_name='eu-west-2')
+        secret_manager.create_secret(
+            Name='secret',
+            SecretString=json.dumps({'password': 'Password'})
+        )
+
+        get_secret('secret')
+        secret_manager.put_secret_value(
+            SecretId='secret',
+            SecretString=json.dumps({'password': 'Rotated'})
+        )
+
+        assert get_secret('secret') == {'password': 'Rotated'}
@@ -1,7 +1,8 @@
-from src.loading.loading import insert_transformed_data_into_warehouse, format_column_names_for_sql_query, format_values_for_sql_query, rename_folder_in_s3_bucket_once_loaded, handler
+from src.loading.loading import insert_transformed_data_into_warehouse, format_column_names_for_sql_query, format_values_for_sql_query, rename_folder_in_s3_bucket_once_loaded, handler, copy_transformed_data_into_warehouse, format_dataframe_for_copy, format_dataframe_for_sql_query, deduplicate_fact_table
 from data.test_loading_data import single_processed_data_object_keys, multiple_processed_data_object_keys, single_loaded_data_object_keys, multiple_loaded_data_object_keys
 from data.test_df_data import currency_data, design_data, paymenmt_type_data
 from utils.get_bucket_objects import get_bucket_objects
+from utils.run_ledger import RunLedger
 
 from moto import mock_s3
 import boto3
@@ -90,6 +91,34 @@ class TestSQLQueryFormattingValuesFunction:
         assert result == excepted
 
 
+class TestSQLQueryFormattingDataFrameFunction:
+    def test_function_returns_a_tuple_for_each_row(self):
+
+        input = pd.DataFrame(data=currency_data)
+        excepted = [(1, 'GBP', 'British Pounds'),
+                    (2, 'USD', 'US Dollars'),
+                    (3, 'EUR', 'Euros')]
+
+        result = format_dataframe_for_sql_query(input)
+
+        assert result == excepted
+        assert type(result[0][0]) is int
+
+    def test_function_returns_None_for_na_values_of_every_type(self):
+
+        input = pd.DataFrame({
+            'name': ['Hello', None],
+            'amount': [55.5, np.NaN],
+            'count': pd.array([1, None], dtype='Int64'),
+            'date': pd.to_datetime(['2022-11-03', None])})
+        excepted = [('Hello', 55.5, 1, pd.Timestamp('2022-11-03')),
+                    (None, None, None, None)]
+
+        result = format_dataframe_for_sql_query(input)
+
+        assert result == excepted
+
+
 @mock_s3
 class TestRenamingS3FolderOnceLoaded:
     def test_folder_in_s3_is_renamed_from_transformed_to_loaded_when_passed_one_object_not_loaded(
@@ -311,6 +340,92 @@ class TestLoadingFunction:
                 mock_cursor, table_name, column_names, single_value_list)
 
 
+class TestFactTableDeduplicationFunction:
+    def test_only_rows_with_the_inserted_ids_are_deduplicated(self):
+        mock_cursor = Mock()
+
+        column_names = [Identifier('sales_order_id'), Identifier('units_sold')]
+        value_list = [(5, 10), (7, 20), (5, 30)]
+
+        insert_transformed_data_into_warehouse(
+            mock_cursor, 'fact_sales_order', column_names, value_list)
+
+        delete_statement, delete_parameters = mock_cursor.execute.call_args[0]
+        assert mock_cursor.execute.call_count == 1
+        assert delete_statement == SQL("DELETE FROM {table} a USING {table} b WHERE a.{record_id} > b.{record_id} AND a.{id} = b.{id} AND a.{id} = ANY(%s);").format(
+            table=Identifier('project_team_6', 'fact_sales_order'),
+            record_id=Identifier('sales_record_id'),
+            id=Identifier('sales_order_id'))
+        assert sorted(delete_parameters[0]) == [5, 7]
+
+    def test_dimension_tables_and_empty_batches_are_not_deduplicated(self):
+        mock_cursor = Mock()
+
+        deduplicate_fact_table(mock_cursor, 'dim_currency', [1])
+        deduplicate_fact_table(mock_cursor, 'fact_payment', [])
+
+        mock_cursor.execute.assert_not_called()
+
+
+class TestCopyFormattingFunction:
+    def test_function_writes_na_values_as_null_marker(self):
+        data = pd.DataFrame({
+            'design_id': [1, 2],
+            'design_name': ['Good', None],
+            'unit_price': [2.5, np.NaN]})
+
+        result = format_dataframe_for_copy(data).getvalue()
+
+        assert result == '1,Good,2.5\n2,\\N,\\N\n'
+
+    def test_function_writes_whole_number_float_columns_as_integers(self):
+        data = pd.DataFrame({
+            'sales_order_id': [1.0, np.NaN, 3.0]})
+
+        result = format_dataframe_for_copy(data).getvalue()
+
+        assert result == '1\n\\N\n3\n'
+
+
+class TestCopyLoadingFunction:
+    def test_copies_data_through_a_staging_table(self):
+        mock_cursor = Mock()
+        data = pd.DataFrame(data=currency_data)
+        columns = SQL(',').join([Identifier('currency_id'),
+                                 Identifier('currency_code'),
+                                 Identifier('currency_name')])
+        staging = Identifier('staging_dim_currency')
+
+        result = copy_transformed_data_into_warehouse(
+            mock_cursor, 'dim_currency', data)
+
+        assert result == 3
+
+        copy_statement, copy_file = mock_cursor.copy_expert.call_args[0]
+        assert copy_statement == SQL("COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N');").format(
+            staging=staging, columns=columns)
+        assert copy_file.getvalue() == '1,GBP,British Pounds\n2,USD,US Dollars\n3,EUR,Euros\n'
+
+        executed = [call[0][0] for call in mock_cursor.execute.call_args_list]
+        assert executed == [
+            SQL("DROP TABLE IF EXISTS {staging};").format(staging=staging),
+            SQL("CREATE TEMP TABLE {staging} AS SELECT {columns} FROM {table} WITH NO DATA;").format(
+                staging=staging, columns=columns, table=Identifier('dim_currency')),
+            SQL("INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} ON CONFLICT DO NOTHING;").format(
+                table=Identifier('dim_currency'), columns=columns, staging=staging),
+            SQL("DROP TABLE {staging};").format(staging=staging)]
+
+    def test_function_raises_an_exception_if_invalid_table_name_is_passed(
+            self):
+        mock_cursor = Mock()
+
+        with raises(Exception):
+            copy_transformed_data_into_warehouse(
+                mock_cursor, 'dim_dummy_table', pd.DataFrame(data=currency_data))
+
+        mock_cursor.execute.assert_not_called()
+
+
 @mock_s3
 class TestHandlerFunction:
 
@@ -418,3 +533,152 @@ class TestHandlerFunction:
             # # assert 'No new data to load.\n' in captured.out
 
             # # assert caplog.records[0].message == 'No new data to load.'
+
+    @patch('src.loading.loading.get_secret',
+           return_value={
+               "host": "localhost",
+               "port": 5432,
+               "database": "test_db",
+               "user": "test_user",
+               "password": "test_password"
+           })
+    @patch('src.loading.loading.get_bucket_objects',
+           return_value=single_processed_data_object_keys)
+    def test_handler_uses_copy_loader_when_loading_mode_is_copy(
+            self, mock_get_bucket_objects, mock_get_secret, monkeypatch):
+
+        monkeypatch.setenv('LOADING_MODE', 'copy')
+
+        s3 = boto3.client('s3', region_name='eu-west-2')
+        folder_name = 'totesys_processed_data_1690986094.604827'
+        bucket_name = 'nc-project-processed-data-8372747'
+
+        s3.create_bucket(
+            Bucket=bucket_name,
+            CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'}
+        )
+
+        s3.put_object(
+            Bucket=bucket_name,
+            Key=f"{folder_name}/dim_currency.parquet",
+            Body=pd.DataFrame(data=currency_data).to_parquet()
+        )
+
+        with patch('src.loading.loading.connect_to_server', return_value=MagicMock()):
+
+            with patch('src.loading.loading.copy_transformed_data_into_warehouse') as mock_copy_data_fn, \
+                    patch('src.loading.loading.insert_transformed_data_into_warehouse') as mock_insert_data_fn, \
+                    patch('src.loading.loading.rename_folder_in_s3_bucket_once_loaded'):
+
+                handler('event', 'context')
+
+                assert mock_copy_data_fn.call_count == 1
+                assert mock_copy_data_fn.call_args[0][1] == 'dim_currency'
+                assert mock_insert_data_fn.call_count == 0
+
+    @patch('src.loading.loading.get_secret',
+           side_effect=[{"host": "localhost", "password": "stale_password"},
+                        {"host": "localhost", "password": "rotated_password"}])
+    @patch('src.loading.loading.get_bucket_prefixes', return_value=[])
+    def test_handler_refetches_secret_and_retries_when_connection_fails(
+            self, mock_get_bucket_prefixes, mock_get_secret):
+
+        with patch('src.loading.loading.get_bucket_name', return_value='bucket'), \
+                patch('src.loading.loading.connect_to_server',
+                      side_effect=[Exception, MagicMock()]) as mock_connect:
+
+            assert handler('event', 'context') == 'No new data to load.'
+
+            mock_get_secret.assert_called_with("pg-olap-db", refresh=True)
+            mock_connect.assert_called_with(
+                {"host": "localhost", "password": "rotated_password"})
+
+    @patch('src.loading.loading.get_secret', return_value={"host": "localhost"})
+    @patch('src.loading.loading.get_bucket_prefixes', return_value=[])
+    def test_handler_reuses_healthy_connection_across_invocations(
+            self, mock_get_bucket_prefixes, mock_get_secret):
+
+        connection = MagicMock()
+        connection.closed = 0
+
+        with patch('src.loading.loading.get_bucket_name', return_value='bucket'), \
+                patch('src.loading.loading.connect_to_server',
+                      return_value=connection) as mock_connect:
+
+            handler('event', 'context')
+            handler('event', 'context')
+
+            assert mock_connect.call_count == 1
+            connection.close.assert_not_called()
+
+    @patch('src.loading.loading.get_secret', return_value={"host": "localhost"})
+    def test_handler_loads_the_runs_handed_over_in_the_ledger(
+            self, mock_get_secret, monkeypatch):
+
+        monkeypatch.setenv('PIPELINE_HANDOFF', 'manifest')
+
+        s3 = boto3.client('s3', region_name='eu-west-2')
+        run_name = 'totesys_extraction_data_1690986094.604827'
+        key = 'totesys_processed_data_1690986094.604827/dim_currency.parquet'
+
+        for bucket_name in ['nc-project-ingestion-zone-8372747', 'nc-project-processed-data-8372747']:
+            s3.create_bucket(
+                Bucket=bucket_name,
+                CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'}
+            )
+
+        s3.put_object(
+            Bucket='nc-project-processed-data-8372747',
+            Key=key,
+            Body=pd.DataFrame(data=currency_data).to_parquet()
+        )
+
+        ledger = RunLedger('nc-project-ingestion-zone-8372747')
+        ledger.complete_stage(run_name, 'transformation', [key], next_stage='loading')
+
+        with patch('src.loading.loading.connect_to_server', return_value=MagicMock()):
+
+            with patch('src.loading.loading.insert_transformed_data_into_warehouse') as mock_insert_data_fn:
+
+                handler('event', 'context')
+
+                assert mock_insert_data_fn.call_args[0][1] == 'dim_currency'
+
+        assert ledger.get_pending('loading') == []
+        assert 'loading' in ledger.get_run(run_name)['stages']
+        assert get_bucket_objects('nc-project-processed-data-8372747') == [key]
+
+    @patch('src.loading.loading.get_secret', return_value={"host": "localhost"})
+    def test_handler_rolls_back_a_partly_loaded_folder(self, mock_get_secret):
+
+        s3 = boto3.client('s3', region_name='eu-west-2')
+        folder_name = 'totesys_processed_data_1690986094.604827'
+        bucket_name = 'nc-project-processed-data-8372747'
+
+        s3.create_bucket(
+            Bucket=bucket_name,
+            CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'}
+        )
+
+        for table_name in ['dim_currency', 'fact_sales_order']:
+            s3.put_object(
+                Bucket=bucket_name,
+                Key=f"{folder_name}/{table_name}.parquet",
+                Body=pd.DataFrame(data=currency_data).to_parquet()
+            )
+
+        connection = MagicMock()
+        connection.closed = 0
+
+        with patch('src.loading.loading.connect_to_server', return_value=connection):
+
+            with patch('src.loading.loading.insert_transformed_data_into_warehouse',
+                       side_effect=[None, Exception]), \
+                    patch('src.loading.loading.rename_folder_in_s3_bucket_once_loaded') as mock_renaming_folder_fn:
+
+                with raises(Exception):
+                    handler('event', 'context')
+
+                connection.commit.assert_not_called()
+                connection.rollback.assert_called()
+                mock_renaming_folder_fn.assert_not_called()
@@ -0,0 +1,352 @@
+from utils.logical_replication import (ensure_replication_slot,
+                                       get_arrow_type,
+                                       values_to_arrow,
+                                       ChangeBuffer,
+                                       flush_changes,
+                                       consume_changes)
+from argparse import Namespace
+from datetime import date, datetime, time
+from decimal import Decimal
+from unittest.mock import Mock
+from moto import mock_s3
+import boto3
+import io
+import json
+import os
+import psycopg2
+import psycopg2.errors
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+
+@pytest.fixture
+def s3():
+    with mock_s3():
+        s3_client = boto3.client('s3', region_name='eu-west-2')
+        s3_client.create_bucket(
+            Bucket='nc-project-ingestion-zone-',
+            CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'})
+        yield s3_client
+
+
+def read_parquet(s3_client, key):
+    body = s3_client.get_object(Bucket='nc-project-ingestion-zone-', Key=key)['Body'].read()
+    return pq.read_table(io.BytesIO(body))
+
+
+def column(name, type_name, value):
+    return {'name': name, 'type': type_name, 'value': value}
+
+
+def insert(table, **values):
+    return {'action': 'I', 'schema': 'public', 'table': table,
+            'columns': [column(name, type_name, value)
+                        for name, (type_name, value) in values.items()]}
+
+
+def currency(currency_id, code, action='I'):
+    change = insert('currency',
+                    currency_id=('integer', currency_id),
+                    currency_code=('character varying(3)', code))
+    change['action'] = action
+    return change
+
+
+class TestGetArrowType:
+    def test_maps_postgres_types(self):
+        assert get_arrow_type('integer') == pa.int64()
+        assert get_arrow_type('character varying(3)') == pa.string()
+        assert get_arrow_type('numeric(10,2)') == pa.decimal128(10, 2)
+        assert get_arrow_type('timestamp without time zone') == pa.timestamp('us')
+        assert get_arrow_type('numeric') == pa.string()
+
+    def test_unknown_types_are_inferred(self):
+        assert get_arrow_type('jsonb') is None
+
+
+class TestValuesToArrow:
+    def test_parses_dates_times_and_timestamps(self):
+        assert values_to_arrow(['2023-07-01', None], pa.date32()).to_pylist() == [
+            date(2023, 7, 1), None]
+        assert values_to_arrow(['12:30:00.5'], pa.time64('us')).to_pylist() == [
+            time(12, 30, 0, 500000)]
+        assert values_to_arrow(['2023-07-01 12:30:00.123'], pa.timestamp('us')).to_pylist() == [
+            datetime(2023, 7, 1, 12, 30, 0, 123000)]
+
+    def test_keeps_decimals_exact(self):
+        result = values_to_arrow([Decimal('3.68')], pa.decimal128(10, 2))
+
+        assert result.to_pylist() == [Decimal('3.68')]
+
+    def test_keeps_unconstrained_numerics_exact_as_text(self):
+        values = [Decimal('0.123456789012345678901'), 42, None]
+
+        result = values_to_arrow(values, get_arrow_type('numeric'))
+
+        assert result.to_pylist() == ['0.123456789012345678901', '42', None]
+
+
+class TestEnsureReplicationSlot:
+    def test_creates_the_slot(self):
+        cursor = Mock()
+
+        assert ensure_replication_slot(cursor, 'slot') is True
+        cursor.create_replication_slot.assert_called_once_with('slot', output_plugin='wal2json')
+
+    def test_returns_false_if_the_slot_exists(self):
+        cursor = Mock()
+        cursor.create_replication_slot.side_effect = psycopg2.errors.DuplicateObject()
+
+        assert ensure_replication_slot(cursor, 'slot') is False
+
+
+class TestChangeBuffer:
+    def test_keeps_the_latest_version_of_each_row(self):
+        buffer = ChangeBuffer()
+        buffer.add(currency(1, 'GBP'), 10)
+        buffer.add(currency(2, 'USD'), 11)
+        buffer.add(currency(1, 'EUR', action='U'), 12)
+        buffer.add({'action': 'C'}, 13)
+
+        [(table, upserts)] = buffer.get_tables()
+
+        assert table == 'currency'
+        assert upserts.to_pylist() == [{'currency_id': 1, 'currency_code': 'EUR'},
+                                       {'currency_id': 2, 'currency_code': 'USD'}]
+        assert buffer.change_count == 3
+
+    def test_deletes_drop_the_buffered_row(self):
+        buffer = ChangeBuffer()
+        buffer.add(currency(1, 'GBP'), 10)
+        buffer.add({'action': 'D', 'schema': 'public', 'table': 'currency',
+                    'identity': [column('currency_id', 'integer', 1)]}, 11)
+        buffer.add({'action': 'C'}, 12)
+
+        assert buffer.get_tables() == []
+        assert len(buffer) == 0
+        assert buffer.change_count == 2
+
+    def test_only_commits_move_the_commit_lsn(self):
+        buffer = ChangeBuffer()
+        buffer.add({'action': 'B'}, 9)
+        buffer.add(currency(1, 'GBP'), 10)
+
+        assert buffer.commit_lsn is None
+
+        buffer.add({'action': 'C'}, 11)
+
+        assert buffer.commit_lsn == 11
+        assert len(buffer) == 1
+
+    def test_only_committed_transactions_are_buffered(self):
+        buffer = ChangeBuffer()
+        buffer.add(currency(1, 'GBP'), 10)
+        buffer.add({'action': 'C'}, 11)
+        buffer.add(currency(2, 'USD'), 12)
+
+        assert len(buffer) == 1
+        assert buffer.change_count == 1
+
+        buffer.clear()
+        buffer.add({'action': 'C'}, 13)
+
+        [(_, upserts)] = buffer.get_tables()
+        assert upserts.to_pylist() == [{'currency_id': 2, 'currency_code': 'USD'}]
+
+
+class TestFlushChanges:
+    def test_writes_the_extraction_layout(self, s3):
+        buffer = ChangeBuffer()
+        buffer.add(currency(1, 'GBP'), 10)
+        buffer.add({'action': 'D', 'schema': 'public', 'table': 'currency',
+                    'identity': [column('currency_id', 'integer', 2)]}, 11)
+        buffer.add({'action': 'C'}, 12)
+
+        row_count = flush_changes(buffer, 'nc-project-ingestion-zone-', 'folder')
+
+        assert row_count == 1
+        assert read_parquet(s3, 'folder/currency.parquet').to_pylist() == [
+            {'currency_id': 1, 'currency_code': 'GBP'}]
+        # deletes are not propagated, see ChangeBuffer
+        assert s3.list_objects_v2(Bucket='nc-project-ingestion-zone-')['KeyCount'] == 1
+
+    def test_writes_the_partitioned_layout_with_a_manifest(self, s3):
+        buffer = ChangeBuffer()
+        buffer.add(currency(1, 'GBP'), 10)
+        buffer.add({'action': 'C'}, 11)
+
+        flush_changes(buffer, 'nc-project-ingestion-zone-',
+                      'totesys_extraction_data_1688169600.0', 'hive')
+
+        key = 'table=currency/date=2023-07-01/hour=00/totesys_extraction_data_1688169600.0.parquet'
+        assert read_parquet(s3, key).num_rows == 1
+        manifest = s3.get_object(Bucket='nc-project-ingestion-zone-',
+                                 Key='manifests/totesys_extraction_data_1688169600.0.json')
+        assert json.loads(manifest['Body'].read())['files'] == [key]
+
+    def test_advances_the_watermarks_to_the_newest_row_written(self, s3):
+        buffer = ChangeBuffer()
+        for currency_id, last_updated in [(1, '2023-07-01 10:00:00'), (2, '2023-07-01 09:00:00')]:
+            change = currency(currency_id, 'GBP')
+            change['columns'].append(column('last_updated', 'timestamp without time zone',
+                                            last_updated))
+            buffer.add(change, currency_id)
+        buffer.add({'action': 'C'}, 3)
+        watermarks = {'staff': {'last_updated': datetime(2023, 7, 1), 'id': 5}}
+
+        flush_changes(buffer, 'nc-project-ingestion-zone-', 'folder', watermarks=watermarks)
+
+        assert watermarks == {
+            'staff': {'last_updated': datetime(2023, 7, 1), 'id': 5},
+            'currency': {'last_updated': datetime(2023, 7, 1, 10), 'id': 1}}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def select(self, readers, writers, errors, timeout):
+        self.now += timeout
+        return [], [], []
+
+
+class TestConsumeChanges:
+    def test_flushes_micro_batches_and_acknowledges_commits(self, s3, mocker):
+        clock = FakeClock()
+        mocker.patch('utils.logical_replication.time.monotonic', side_effect=clock.monotonic)
+        mocker.patch('utils.logical_replication.select.select', side_effect=clock.select)
+
+        messages = [(currency(1, 'GBP'), 10), ({'action': 'C'}, 11),
+                    (currency(2, 'USD'), 12)]
+
+        def read_message():
+            if messages:
+                change, lsn = messages.pop(0)
+                return Namespace(payload=json.dumps(change), data_start=lsn)
+            return None
+
+        cursor = Mock()
+        cursor.read_message.side_effect = read_message
+        folders = iter(['folder_1', 'folder_2'])
+
+        change_count = consume_changes(
+            cursor, 'slot', 'nc-project-ingestion-zone-', lambda: next(folders),
+            ['currency'], max_seconds=12, flush_seconds=5)
+
+        assert change_count == 1
+        assert cursor.start_replication.call_args[1]['options']['add-tables'] == \
+            'public.currency'
+        assert read_parquet(s3, 'folder_1/currency.parquet').num_rows == 1
+        # the second change was not committed, so it is not written and is sent again by the slot
+        cursor.send_feedback.assert_called_with(flush_lsn=11, force=True)
+
+    def test_flushes_when_enough_rows_are_buffered(self, s3, mocker):
+        clock = FakeClock()
+        mocker.patch('utils.logical_replication.time.monotonic', side_effect=clock.monotonic)
+        mocker.patch('utils.logical_replication.select.select', side_effect=clock.select)
+
+        messages = [(currency(1, 'GBP'), 10), ({'action': 'C'}, 11),
+                    (currency(2, 'USD'), 12), ({'action': 'C'}, 13)]
+
+        def read_message():
+            if messages:
+                change, lsn = messages.pop(0)
+                return Namespace(payload=json.dumps(change), data_start=lsn)
+            return None
+
+        cursor = Mock()
+        cursor.read_message.side_effect = read_message
+        folders = iter(['folder_1', 'folder_2'])
+
+        consume_changes(cursor, 'slot', 'nc-project-ingestion-zone-', lambda: next(folders),
+                        ['currency'], max_seconds=1, flush_seconds=5, flush_rows=1)
+
+        assert read_parquet(s3, 'folder_1/currency.parquet').num_rows == 1
+        assert read_parquet(s3, 'folder_2/currency.parquet').num_rows == 1
+
+    def test_never_splits_a_transaction_across_folders(self, s3, mocker):
+        clock = FakeClock()
+        mocker.patch('utils.logical_replication.time.monotonic', side_effect=clock.monotonic)
+        mocker.patch('utils.logical_replication.select.select', side_effect=clock.select)
+
+        messages = [(currency(1, 'GBP'), 10), (currency(2, 'USD'), 11), ({'action': 'C'}, 12)]
+
+        def read_message():
+            if messages:
+                change, lsn = messages.pop(0)
+                return Namespace(payload=json.dumps(change), data_start=lsn)
+            return None
+
+        cursor = Mock()
+        cursor.read_message.side_effect = read_message
+        create_folder_prefix = Mock(return_value='folder')
+
+        consume_changes(cursor, 'slot', 'nc-project-ingestion-zone-', create_folder_prefix,
+                        ['currency'], max_seconds=1, flush_seconds=5, flush_rows=1)
+
+        create_folder_prefix.assert_called_once()
+        assert read_parquet(s3, 'folder/currency.parquet').num_rows == 2
+        cursor.send_feedback.assert_called_with(flush_lsn=12, force=True)
+
+    def test_acknowledges_deletes_without_writing_a_folder(self, s3, mocker):
+        clock = FakeClock()
+        mocker.patch('utils.logical_replication.time.monotonic', side_effect=clock.monotonic)
+        mocker.patch('utils.logical_replication.select.select', side_effect=clock.select)
+
+        messages = [({'action': 'D', 'schema': 'public', 'table': 'currency',
+                      'identity': [column('currency_id', 'integer', 1)]}, 10),
+                    ({'action': 'C'}, 11)]
+
+        def read_message():
+            if messages:
+                change, lsn = messages.pop(0)
+                return Namespace(payload=json.dumps(change), data_start=lsn)
+            return None
+
+        cursor = Mock()
+        cursor.read_message.side_effect = read_message
+        create_folder_prefix = Mock()
+
+        change_count = consume_changes(
+            cursor, 'slot', 'nc-project-ingestion-zone-', create_folder_prefix,
+            ['currency'], max_seconds=6, flush_seconds=5)
+
+        assert change_count == 1
+        create_folder_prefix.assert_not_called()
+        cursor.send_feedback.assert_called_with(flush_lsn=11, force=True)
+
+
+@pytest.mark.skipif('CDC_TEST_DSN' not in os.environ,
+                    reason='needs a Postgres with wal2json, e.g. a local container')
+def test_consumes_a_real_replication_slot(s3):
+    from psycopg2.extras import LogicalReplicationConnection
+
+    conn = psycopg2.connect(os.environ['CDC_TEST_DSN'])
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute('CREATE TABLE IF NOT EXISTS currency '
+                       '(currency_id serial PRIMARY KEY, currency_code varchar(3))')
+
+    replication = psycopg2.connect(os.environ['CDC_TEST_DSN'],
+                                   connection_factory=LogicalReplicationConnection)
+    replication_cursor = replication.cursor()
+    try:
+        ensure_replication_slot(replication_cursor, 'test_slot')
+        with conn.cursor() as cursor:
+            cursor.execute("INSERT INTO currency (currency_code) VALUES ('GBP')")
+
+        change_count = consume_changes(
+            replication_cursor, 'test_slot', 'nc-project-ingestion-zone-', lambda: 'folder',
+            ['currency'], max_seconds=3, flush_seconds=1)
+
+        assert change_count >= 1
+        assert read_parquet(s3, 'folder/currency.parquet').column(
+            'currency_code').to_pylist()[-1] == 'GBP'
+    finally:
+        replication_cursor.drop_replication_slot('test_slot')
+        replication.close()
+        conn.close()
@@ -1,6 +1,8 @@
 from moto import mock_s3
 import boto3
 from pytest import raises
+from unittest.mock import Mock
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 
 from utils.move_s3_objects import move_s3_objects_to_new_folder
@@ -180,3 +182,96 @@ class TestMoveS3ObjectsToNewFolder:
                 current_folder_name,
                 new_folder_name,
                 'bucket_name')
+
+    def test_function_moves_more_than_1000_objects_in_delete_batches(self):
+
+        s3 = boto3.client('s3', region_name='eu-west-2')
+
+        bucket_name = 'test_bucket'
+        files = [f'totesys_processed_data/{number:04}.parquet'
+                 for number in range(1001)]
+
+        s3.create_bucket(
+            Bucket=bucket_name,
+            CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'}
+        )
+
+        for file in files:
+            s3.put_object(Bucket=bucket_name, Key=file, Body=b'data')
+
+        move_s3_objects_to_new_folder(
+            files,
+            'totesys_processed_data',
+            'totesys_loaded_data',
+            bucket_name,
+            s3_client=s3)
+
+        my_new_folder = get_bucket_objects(bucket_name)
+        assert my_new_folder == [file.replace('processed', 'loaded')
+                                 for file in files]
+
+    def test_function_does_not_delete_any_object_when_a_copy_fails(self):
+
+        s3 = Mock()
+        s3.meta.config.max_pool_connections = 10
+        s3.copy.side_effect = [None, Exception('copy failed')]
+
+        with raises(Exception):
+            move_s3_objects_to_new_folder(
+                ['totesys_processed_data/data1.parquet',
+                 'totesys_processed_data/data2.parquet'],
+                'totesys_processed_data',
+                'totesys_loaded_data',
+                'test_bucket',
+                s3_client=s3)
+
+        assert s3.copy.call_count == 2
+        s3.delete_objects.assert_not_called()
+
+    def test_function_uses_no_more_workers_than_the_client_has_connections(self, mocker):
+
+        s3 = Mock()
+        s3.meta.config.max_pool_connections = 2
+        s3.delete_objects.return_value = {}
+        mock_executor = mocker.patch(
+            'utils.move_s3_objects.ThreadPoolExecutor', wraps=ThreadPoolExecutor)
+
+        move_s3_objects_to_new_folder(
+            [f'totesys_processed_data/data{index}.parquet' for index in range(5)],
+            'totesys_processed_data',
+            'totesys_loaded_data',
+            'test_bucket',
+            s3_client=s3)
+
+        mock_executor.assert_called_once_with(max_workers=2)
+        assert s3.copy.call_count == 5
+
+    def test_function_pools_a_connection_for_every_copy_worker(self, mocker):
+
+        mock_get_client = mocker.patch('utils.move_s3_objects.get_client')
+        mock_get_client.return_value.meta.config.max_pool_connections = 16
+        mock_get_client.return_value.delete_objects.return_value = {}
+
+        move_s3_objects_to_new_folder(
+            ['totesys_processed_data/data1.parquet'],
+            'totesys_processed_data',
+            'totesys_loaded_data',
+            'test_bucket')
+
+        mock_get_client.assert_called_once_with('s3', max_pool_connections=16)
+
+    def test_function_raises_an_exception_when_objects_cannot_be_deleted(self):
+
+        s3 = Mock()
+        s3.meta.config.max_pool_connections = 10
+        s3.delete_objects.return_value = {
+            'Errors': [{'Key': 'totesys_processed_data/data1.parquet',
+                        'Code': 'AccessDenied'}]}
+
+        with raises(Exception):
+            move_s3_objects_to_new_folder(
+                ['totesys_processed_data/data1.parquet'],
+                'totesys_processed_data',
+                'totesys_loaded_data',
+                'test_bucket',
+                s3_client=s3)
@@ -0,0 +1,78 @@
+from utils.partitioned_layout import (get_extraction_key,
+                                      get_manifest_key,
+                                      write_manifest,
+                                      get_pending_runs,
+                                      get_partition_runs)
+from utils.move_s3_objects import move_s3_objects_to_new_folder
+from datetime import date
+from moto import mock_s3
+import boto3
+import json
+import pytest
+
+
+@pytest.fixture
+def s3():
+    with mock_s3():
+        s3_client = boto3.client('s3', region_name='eu-west-2')
+        s3_client.create_bucket(
+            Bucket='nc-project-ingestion-zone-',
+            CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'})
+        yield s3_client
+
+
+def put_run(s3_client, run_name, tables):
+    files = [get_extraction_key(run_name, table, 'hive') for table in tables]
+    for key in files:
+        s3_client.put_object(Bucket='nc-project-ingestion-zone-', Key=key, Body=b'')
+    return files
+
+
+class TestGetExtractionKey:
+    def test_flat_layout_writes_one_folder_per_run(self):
+        assert get_extraction_key('totesys_extraction_data_1688169600.0', 'staff') == \
+            'totesys_extraction_data_1688169600.0/staff.parquet'
+
+    def test_hive_layout_partitions_by_table_date_and_hour(self):
+        assert get_extraction_key('totesys_extraction_data_1688218200.5', 'staff', 'hive') == \
+            'table=staff/date=2023-07-01/hour=13/totesys_extraction_data_1688218200.5.parquet'
+
+
+class TestManifests:
+    def test_only_runs_with_a_pending_manifest_are_listed(self, s3):
+        files = put_run(s3, 'totesys_extraction_data_1688169600.0', ['staff', 'address'])
+        write_manifest('nc-project-ingestion-zone-', 'totesys_extraction_data_1688169600.0', files)
+        put_run(s3, 'totesys_extraction_data_1688170200.0', ['staff'])
+
+        result = get_pending_runs('nc-project-ingestion-zone-')
+
+        assert result == {'totesys_extraction_data_1688169600.0': sorted(files)}
+
+    def test_renamed_manifests_are_no_longer_pending(self, s3):
+        files = put_run(s3, 'totesys_extraction_data_1688169600.0', ['staff'])
+        write_manifest('nc-project-ingestion-zone-', 'totesys_extraction_data_1688169600.0', files)
+
+        move_s3_objects_to_new_folder(
+            [get_manifest_key('totesys_extraction_data_1688169600.0')],
+            'totesys_extraction_data_1688169600.0',
+            'totesys_transformed_data_1688169600.0',
+            'nc-project-ingestion-zone-')
+
+        assert get_pending_runs('nc-project-ingestion-zone-') == {}
+        manifest = s3.get_object(Bucket='nc-project-ingestion-zone-',
+                                 Key='manifests/totesys_transformed_data_1688169600.0.json')
+        assert json.loads(manifest['Body'].read())['files'] == files
+
+
+class TestGetPartitionRuns:
+    def test_lists_only_the_partitions_of_the_date_range(self, s3):
+        june = put_run(s3, 'totesys_extraction_data_1688083200.0', ['staff', 'address'])
+        july = put_run(s3, 'totesys_extraction_data_1688169600.0', ['staff'])
+        put_run(s3, 'totesys_extraction_data_1688256000.0', ['staff'])
+
+        result = get_partition_runs('nc-project-ingestion-zone-',
+                                    date(2023, 6, 30), date(2023, 7, 1))
+
+        assert {run: sorted(files) for run, files in result.items()} == {
+            'totesys_extraction_data_1688083200.0': sorted(june),
+            'totesys_extraction_data_1688169600.0': july}
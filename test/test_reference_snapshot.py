@@ -0,0 +1,139 @@
+from io import BytesIO
+from moto import mock_s3
+import awswrangler as wr
+import boto3
+import pandas as pd
+import pytest
+
+from utils.reference_snapshot import (ReferenceSnapshot, get_reference_snapshot,
+                                      clear_reference_snapshots)
+from utils.run_ledger import RunLedger
+
+
+def address_df(ids, city):
+    return pd.DataFrame({
+        'address_id': ids,
+        'city': [city] * len(ids),
+        'created_at': ['Dummy'] * len(ids)
+    })
+
+
+@pytest.fixture
+def s3():
+    with mock_s3():
+        s3 = boto3.client('s3', region_name='eu-west-2')
+        for bucket in ['test-extraction-bucket', 'test-processed-bucket']:
+            s3.create_bucket(
+                Bucket=bucket,
+                CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'}
+            )
+        yield s3
+
+
+class TestReferenceSnapshot:
+    def test_update_keeps_the_newest_version_of_each_row(self, s3):
+        snapshot = ReferenceSnapshot(
+            'test-processed-bucket', 'address', 'address_id', ['address_id', 'city'])
+
+        snapshot.update(address_df([1, 2], 'Leeds'), 1.0)
+        snapshot.update(address_df([2, 3], 'York'), 2.0)
+
+        result = snapshot.lookup([3, 2, 1])
+        assert result.to_dict('list') == {'address_id': [1, 2, 3],
+                                          'city': ['Leeds', 'York', 'York']}
+
+    def test_an_older_folder_cannot_overwrite_a_newer_one(self, s3):
+        snapshot = ReferenceSnapshot(
+            'test-processed-bucket', 'address', 'address_id', ['address_id', 'city'])
+
+        snapshot.update(address_df([1], 'York'), 2.0)
+        snapshot.update(address_df([1], 'Leeds'), 1.0)
+
+        assert snapshot.lookup([1])['city'].tolist() == ['York']
+
+    def test_lookup_leaves_out_unknown_and_null_ids(self, s3):
+        snapshot = ReferenceSnapshot(
+            'test-processed-bucket', 'address', 'address_id', ['address_id', 'city'])
+        snapshot.update(address_df([1, 2], 'Leeds'), 1.0)
+
+        result = snapshot.lookup(pd.Series([1, None, 1, 7]))
+
+        assert result['address_id'].tolist() == [1]
+
+    def test_snapshot_is_persisted_in_the_processed_bucket(self, s3):
+        get_reference_snapshot(
+            'test-processed-bucket', 'address', 'address_id',
+            ['address_id', 'city']).update(address_df([1], 'Leeds'), 1.0)
+        clear_reference_snapshots()
+
+        snapshot = get_reference_snapshot(
+            'test-processed-bucket', 'address', 'address_id', ['address_id', 'city'])
+
+        assert snapshot.exists()
+        assert snapshot.lookup([1])['city'].tolist() == ['Leeds']
+        body = s3.get_object(Bucket='test-processed-bucket',
+                             Key='reference/address.parquet')['Body'].read()
+        assert 'created_at' not in pd.read_parquet(BytesIO(body)).columns
+
+    def test_changes_written_by_another_process_are_read(self, s3):
+        first = ReferenceSnapshot(
+            'test-processed-bucket', 'address', 'address_id', ['address_id', 'city'])
+        second = ReferenceSnapshot(
+            'test-processed-bucket', 'address', 'address_id', ['address_id', 'city'])
+        first.update(address_df([1], 'Leeds'), 1.0)
+        assert second.lookup([1])['city'].tolist() == ['Leeds']
+
+        first.update(address_df([1], 'York'), 2.0)
+
+        assert second.lookup([1])['city'].tolist() == ['York']
+
+    def test_seed_reads_every_transformed_extraction_oldest_first(self, s3):
+        wr.s3.to_parquet(
+            address_df([1, 2], 'York'),
+            's3://test-extraction-bucket/totesys_transformed_data_20.5/address.parquet')
+        wr.s3.to_parquet(
+            address_df([1], 'Leeds'),
+            's3://test-extraction-bucket/totesys_transformed_data_3.5/address.parquet')
+        wr.s3.to_parquet(
+            address_df([3], 'Hull'),
+            's3://test-extraction-bucket/totesys_extraction_data_30.5/address.parquet')
+        snapshot = ReferenceSnapshot(
+            'test-processed-bucket', 'address', 'address_id', ['address_id', 'city'])
+        assert not snapshot.exists()
+
+        snapshot.seed('test-extraction-bucket')
+
+        assert snapshot.exists()
+        assert snapshot.lookup([1, 2, 3]).to_dict('list') == {'address_id': [1, 2],
+                                                              'city': ['York', 'York']}
+
+    def test_seed_reads_the_partitioned_layout(self, s3):
+        wr.s3.to_parquet(
+            address_df([1], 'York'),
+            's3://test-extraction-bucket/totesys_transformed_data_3.5/address.parquet')
+        wr.s3.to_parquet(
+            address_df([1], 'Leeds'),
+            's3://test-extraction-bucket/table=address/date=1970-01-01/hour=00/'
+            'totesys_extraction_data_20.5.parquet')
+        snapshot = ReferenceSnapshot(
+            'test-processed-bucket', 'address', 'address_id', ['address_id', 'city'])
+
+        snapshot.seed('test-extraction-bucket')
+
+        assert snapshot.lookup([1])['city'].tolist() == ['Leeds']
+
+    def test_seed_reads_the_runs_the_ledger_records_as_transformed(self, s3):
+        ledger = RunLedger('test-extraction-bucket')
+        for run, city in [('totesys_extraction_data_3.5', 'York'),
+                          ('totesys_extraction_data_20.5', 'Leeds')]:
+            key = f"{run}/address.parquet"
+            wr.s3.to_parquet(address_df([1], city), f"s3://test-extraction-bucket/{key}")
+            ledger.complete_stage(run, 'extraction', [key], next_stage='transformation')
+        ledger.complete_stage('totesys_extraction_data_3.5', 'transformation')
+        snapshot = ReferenceSnapshot(
+            'test-processed-bucket', 'address', 'address_id', ['address_id', 'city'])
+
+        snapshot.seed('test-extraction-bucket')
+
+        # the newer run is still waiting for the transformation
+        assert snapshot.lookup([1])['city'].tolist() == ['York']
@@ -0,0 +1,104 @@
+from pytest import raises
+import threading
+import time
+
+from utils.run_dag import run_dag
+
+
+class TestRunDag:
+    def test_returns_the_result_of_every_task(self):
+        tasks = {
+            'read address': (lambda: 'address', []),
+            'dim_location': (lambda: 'dim_location', ['read address']),
+            'dim_currency': (lambda: 'dim_currency', [])
+        }
+
+        assert run_dag(tasks) == {
+            'read address': 'address',
+            'dim_location': 'dim_location',
+            'dim_currency': 'dim_currency'}
+
+    def test_tasks_only_start_after_their_dependencies_complete(self):
+        order = []
+        lock = threading.Lock()
+
+        def task(name, seconds=0):
+            def run():
+                time.sleep(seconds)
+                with lock:
+                    order.append(name)
+            return run
+
+        tasks = {
+            'read address': (task('read address', 0.05), []),
+            'read counterparty': (task('read counterparty'), []),
+            'dim_location': (task('dim_location'), ['read address']),
+            'dim_counterparty': (task('dim_counterparty'), ['read counterparty', 'read address'])
+        }
+
+        run_dag(tasks, max_workers=4)
+
+        assert order.index('dim_location') > order.index('read address')
+        assert order.index('dim_counterparty') > order.index('read address')
+        assert order.index('dim_counterparty') > order.index('read counterparty')
+
+    def test_independent_tasks_run_concurrently(self):
+        barrier = threading.Barrier(3, timeout=5)
+
+        tasks = {name: (barrier.wait, []) for name in ['dim_design', 'dim_currency', 'dim_staff']}
+
+        run_dag(tasks, max_workers=3)
+
+    def test_runs_tasks_one_at_a_time_with_one_worker(self):
+        running = []
+        overlapped = []
+
+        def task():
+            if running:
+                overlapped.append(True)
+            running.append(True)
+            time.sleep(0.01)
+            running.pop()
+
+        run_dag({name: (task, []) for name in ['a', 'b', 'c']}, max_workers=1)
+
+        assert overlapped == []
+
+    def test_failed_task_is_raised_and_its_dependents_never_start(self):
+        started = []
+
+        def fail():
+            raise ValueError('builder failed')
+
+        tasks = {
+            'read sales_order': (fail, []),
+            'fact_sales_order': (lambda: started.append('fact_sales_order'), ['read sales_order'])
+        }
+
+        with raises(ValueError):
+            run_dag(tasks)
+
+        assert started == []
+
+    def test_raises_for_unknown_dependencies(self):
+        with raises(ValueError):
+            run_dag({'dim_staff': (lambda: None, ['read department'])})
+
+    def test_raises_for_cycles(self):
+        tasks = {
+            'a': (lambda: None, ['b']),
+            'b': (lambda: None, ['a'])
+        }
+
+        with raises(ValueError):
+            run_dag(tasks)
+
+    def test_raises_for_cycles_after_other_tasks_complete(self):
+        tasks = {
+            'start': (lambda: None, []),
+            'a': (lambda: None, ['start', 'b']),
+            'b': (lambda: None, ['a'])
+        }
+
+        with raises(ValueError):
+            run_dag(tasks)
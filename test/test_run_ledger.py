@@ -0,0 +1,77 @@
+from utils.run_ledger import RunLedger, publish_extraction
+from utils.get_bucket_objects import get_bucket_objects
+from moto import mock_s3
+import boto3
+import pytest
+
+
+@pytest.fixture
+def s3():
+    with mock_s3():
+        s3_client = boto3.client('s3', region_name='eu-west-2')
+        s3_client.create_bucket(
+            Bucket='nc-project-ingestion-zone-',
+            CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'})
+        yield s3_client
+
+
+class TestRunLedger:
+    def test_pending_runs_are_listed_oldest_first(self, s3):
+        ledger = RunLedger('nc-project-ingestion-zone-')
+        for run_name in ['totesys_extraction_data_20.5', 'totesys_extraction_data_3.5']:
+            ledger.complete_stage(run_name, 'extraction', [f"{run_name}/staff.parquet"],
+                                  next_stage='transformation')
+
+        assert ledger.get_pending('transformation') == [
+            'totesys_extraction_data_3.5', 'totesys_extraction_data_20.5']
+        assert ledger.get_pending('loading') == []
+        assert sorted(ledger.get_runs()) == [
+            'totesys_extraction_data_20.5', 'totesys_extraction_data_3.5']
+
+    def test_stages_are_appended_to_the_manifest(self, s3):
+        ledger = RunLedger('nc-project-ingestion-zone-')
+        ledger.complete_stage('totesys_extraction_data_1.5', 'extraction',
+                              ['totesys_extraction_data_1.5/staff.parquet'],
+                              next_stage='transformation')
+        ledger.complete_stage('totesys_extraction_data_1.5', 'transformation',
+                              ['totesys_processed_data_1.5/dim_staff.parquet'],
+                              next_stage='loading')
+
+        manifest = ledger.get_run('totesys_extraction_data_1.5')
+
+        assert sorted(manifest['stages']) == ['extraction', 'transformation']
+        assert ledger.get_stage_files('totesys_extraction_data_1.5', 'extraction') == [
+            'totesys_extraction_data_1.5/staff.parquet']
+        assert ledger.get_pending('transformation') == []
+        assert ledger.get_pending('loading') == ['totesys_extraction_data_1.5']
+
+    def test_a_run_without_a_manifest_has_no_stages(self, s3):
+        ledger = RunLedger('nc-project-ingestion-zone-')
+
+        assert ledger.get_run('totesys_extraction_data_1.5') == {
+            'run': 'totesys_extraction_data_1.5', 'stages': {}}
+
+
+class TestPublishExtraction:
+    def test_flat_runs_need_no_manifest(self, s3):
+        publish_extraction('nc-project-ingestion-zone-', 'totesys_extraction_data_1.5',
+                           ['totesys_extraction_data_1.5/staff.parquet'])
+
+        assert get_bucket_objects('nc-project-ingestion-zone-') is None
+
+    def test_partitioned_runs_write_their_manifest(self, s3):
+        publish_extraction('nc-project-ingestion-zone-', 'totesys_extraction_data_1.5',
+                           ['table=staff/date=1970-01-01/hour=00/totesys_extraction_data_1.5.parquet'],
+                           layout='hive')
+
+        assert get_bucket_objects('nc-project-ingestion-zone-') == [
+            'manifests/totesys_extraction_data_1.5.json']
+
+    def test_ledger_handoff_replaces_the_partitioned_manifest(self, s3):
+        publish_extraction('nc-project-ingestion-zone-', 'totesys_extraction_data_1.5',
+                           ['table=staff/date=1970-01-01/hour=00/totesys_extraction_data_1.5.parquet'],
+                           layout='hive', handoff='manifest')
+
+        assert get_bucket_objects('nc-project-ingestion-zone-') == [
+            'ledger/pending/transformation/totesys_extraction_data_1.5',
+            'ledger/runs/totesys_extraction_data_1.5.json']
@@ -0,0 +1,57 @@
+from moto import mock_s3
+import boto3
+from pytest import raises
+
+from utils.s3_stream_writer import S3StreamWriter, MIN_PART_SIZE
+
+
+@mock_s3
+class TestS3StreamWriter:
+    def test_small_object_is_written_in_a_single_put(self):
+        s3 = boto3.client('s3', region_name='eu-west-2')
+        s3.create_bucket(
+            Bucket='test_bucket',
+            CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'}
+        )
+
+        with S3StreamWriter('test_bucket', 'folder/test.bin') as writer:
+            writer.write(b'hello ')
+            writer.write(b'world')
+
+        body = s3.get_object(
+            Bucket='test_bucket', Key='folder/test.bin')['Body'].read()
+        assert body == b'hello world'
+
+    def test_large_object_is_written_as_a_multipart_upload(self):
+        s3 = boto3.client('s3', region_name='eu-west-2')
+        s3.create_bucket(
+            Bucket='test_bucket',
+            CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'}
+        )
+
+        chunk = b'a' * (MIN_PART_SIZE // 2)
+
+        with S3StreamWriter('test_bucket', 'test.bin') as writer:
+            for _ in range(5):
+                writer.write(chunk)
+
+            assert len(writer._parts) == 2
+            assert writer.tell() == len(chunk) * 5
+
+        body = s3.get_object(Bucket='test_bucket', Key='test.bin')['Body'].read()
+        assert body == chunk * 5
+
+    def test_upload_is_aborted_if_an_exception_is_raised(self):
+        s3 = boto3.client('s3', region_name='eu-west-2')
+        s3.create_bucket(
+            Bucket='test_bucket',
+            CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'}
+        )
+
+        with raises(ValueError):
+            with S3StreamWriter('test_bucket', 'test.bin') as writer:
+                writer.write(b'a' * MIN_PART_SIZE)
+                raise ValueError
+
+        assert 'Contents' not in s3.list_objects_v2(Bucket='test_bucket')
+        assert 'Uploads' not in s3.list_multipart_uploads(Bucket='test_bucket')
@@ -0,0 +1,62 @@
+import datetime
+import pandas as pd
+import pyarrow as pa
+
+from utils.split_timestamp import split_timestamp, to_arrow_date, to_arrow_time
+
+
+class TestSplitTimestamp:
+    def test_adds_arrow_date_and_time_columns(self):
+        df = pd.DataFrame({
+            'created_at': ['2022-11-03 14:20:52.186', '2022-11-04 00:00:00.000']})
+
+        result = split_timestamp(df, 'created_at', 'created_date', 'created_time')
+
+        assert result is df
+        assert df['created_date'].dtype == pd.ArrowDtype(pa.date32())
+        assert df['created_time'].dtype == pd.ArrowDtype(pa.time64('us'))
+        assert list(df['created_date']) == [datetime.date(2022, 11, 3),
+                                            datetime.date(2022, 11, 4)]
+        assert list(df['created_time']) == [datetime.time(14, 20, 52, 186000),
+                                            datetime.time(0, 0)]
+
+    def test_falls_back_to_date_and_time_objects_without_arrow_columns(self, monkeypatch):
+        monkeypatch.delattr(pd.arrays, 'ArrowExtensionArray')
+        df = pd.DataFrame({'created_at': [pd.Timestamp('2022-11-03 14:20:52.186'), None]})
+
+        split_timestamp(df, 'created_at', 'created_date', 'created_time')
+
+        assert df['created_date'].dtype == object
+        assert list(df['created_date']) == [datetime.date(2022, 11, 3), None]
+        assert list(df['created_time']) == [datetime.time(14, 20, 52, 186000), None]
+
+    def test_missing_timestamps_stay_missing(self):
+        df = pd.DataFrame({'created_at': [pd.Timestamp('2022-11-03 10:00'), None]})
+
+        split_timestamp(df, 'created_at', 'created_date', 'created_time')
+
+        assert df['created_date'].isna().tolist() == [False, True]
+        assert df['created_time'].isna().tolist() == [False, True]
+
+    def test_keeps_wall_time_of_time_zone_aware_timestamps(self):
+        series = pd.Series(pd.to_datetime(['2022-11-03 23:30:00']).tz_localize('Europe/London'))
+
+        assert list(to_arrow_date(series)) == [datetime.date(2022, 11, 3)]
+        assert list(to_arrow_time(series)) == [datetime.time(23, 30)]
+
+    def test_keeps_index_and_name_of_the_column(self):
+        series = pd.Series(['2022-11-03'], index=[7], name='payment_date')
+
+        result = to_arrow_date(series)
+
+        assert list(result.index) == [7]
+        assert result.name == 'payment_date'
+
+    def test_columns_are_written_to_parquet_as_date_and_time(self):
+        df = pd.DataFrame({'created_at': ['2022-11-03 14:20:52.186']})
+        split_timestamp(df, 'created_at', 'created_date', 'created_time')
+
+        schema = pa.Table.from_pandas(df).schema
+
+        assert schema.field('created_date').type == pa.date32()
+        assert schema.field('created_time').type == pa.time64('us')
@@ -0,0 +1,29 @@
+from utils.table_metrics import put_table_metrics
+from moto import mock_cloudwatch
+from unittest.mock import Mock
+import boto3
+import logging
+
+
+@mock_cloudwatch
+class TestPutTableMetrics:
+    def test_publishes_a_metric_per_table(self):
+        put_table_metrics({'currency': {'ChangedRows': 0},
+                           'sales_order': {'ChangedRows': 12}})
+
+        cloudwatch = boto3.client('cloudwatch', region_name='eu-west-2')
+        metrics = cloudwatch.list_metrics(Namespace='Totesys/Extraction')['Metrics']
+
+        assert sorted((metric['MetricName'], metric['Dimensions'][0]['Value'])
+                      for metric in metrics) == [('ChangedRows', 'currency'),
+                                                 ('ChangedRows', 'sales_order')]
+
+    def test_failures_are_logged_not_raised(self, mocker, caplog):
+        mock_client = Mock()
+        mock_client.put_metric_data.side_effect = Exception('AccessDenied')
+        mocker.patch('utils.table_metrics.get_client', return_value=mock_client)
+
+        with caplog.at_level(logging.WARNING):
+            put_table_metrics({'currency': {'ChangedRows': 0}})
+
+        assert 'AccessDenied' in caplog.text
@@ -0,0 +1,281 @@
+import io
+import logging
+import os
+import sys
+
+import boto3
+import pandas as pd
+import pytest
+from moto import mock_s3
+
+# transformation.py imports its builders the way they are laid out in the Lambda zip
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'src', 'transformation'))
+
+from transformation import handler  # noqa: E402
+from utils.partitioned_layout import get_extraction_key, write_manifest  # noqa: E402
+from utils.run_ledger import RunLedger, publish_extraction  # noqa: E402
+
+ingestion_bucket = 'nc-project-ingestion-zone-1'
+processed_bucket = 'nc-project-processed-data-1'
+
+now = pd.Timestamp('2023-07-01 10:00:00')
+
+
+def currency_df(code='GBP'):
+    return pd.DataFrame({'currency_id': [1], 'currency_code': [code],
+                         'created_at': [now], 'last_updated': [now]})
+
+
+def address_df(city='York'):
+    return pd.DataFrame({'address_id': [1], 'address_line_1': ['1 Street'],
+                         # nullable columns are typed like the extraction writes them
+                         'address_line_2': pd.array([None], dtype='string'),
+                         'district': pd.array([None], dtype='string'), 'city': [city],
+                         'postal_code': ['Y1'], 'country': ['UK'], 'phone': ['123'],
+                         'created_at': [now], 'last_updated': [now]})
+
+
+def counterparty_df(name='Acme'):
+    return pd.DataFrame({'counterparty_id': [1], 'counterparty_legal_name': [name],
+                         'legal_address_id': [1], 'commercial_contact': ['Ann'],
+                         'delivery_contact': ['Bob'], 'created_at': [now], 'last_updated': [now]})
+
+
+def sales_order_df(units_sold=5):
+    return pd.DataFrame({'sales_order_id': [1], 'created_at': [now], 'last_updated': [now],
+                         'design_id': [1], 'staff_id': [1], 'counterparty_id': [1],
+                         'units_sold': [units_sold], 'unit_price': [1.5], 'currency_id': [1],
+                         'agreed_delivery_date': ['2023-07-02'],
+                         'agreed_payment_date': ['2023-07-03'],
+                         'agreed_delivery_location_id': [1]})
+
+
+@pytest.fixture
+def s3():
+    with mock_s3():
+        s3_client = boto3.client('s3', region_name='eu-west-2')
+        for bucket in [ingestion_bucket, processed_bucket]:
+            s3_client.create_bucket(
+                Bucket=bucket,
+                CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'})
+        yield s3_client
+
+
+def put_folder(s3_client, folder_name, tables, layout='flat'):
+    keys = []
+    for table_name, df in tables.items():
+        key = get_extraction_key(folder_name, table_name, layout)
+        s3_client.put_object(Bucket=ingestion_bucket, Key=key, Body=df.to_parquet())
+        keys.append(key)
+    return keys
+
+
+def list_keys(s3_client, bucket, prefix=''):
+    response = s3_client.list_objects_v2(Bucket=bucket, Prefix=prefix)
+    return sorted(item['Key'] for item in response.get('Contents', []))
+
+
+def read_processed(s3_client, key):
+    body = s3_client.get_object(Bucket=processed_bucket, Key=key)['Body'].read()
+    return pd.read_parquet(io.BytesIO(body))
+
+
+class TestHandler:
+    def test_logs_when_there_is_nothing_to_transform(self, s3, caplog):
+        with caplog.at_level(logging.INFO):
+            handler('event', 'context')
+
+        assert 'There are no untransformed files in the extraction bucket.' in caplog.text
+        assert list_keys(s3, processed_bucket) == []
+
+    def test_builds_every_table_of_a_folder_and_renames_it(self, s3):
+        put_folder(s3, 'totesys_extraction_data_1.0', {
+            'currency': currency_df(), 'address': address_df(),
+            'counterparty': counterparty_df(), 'sales_order': sales_order_df()})
+
+        handler('event', 'context')
+
+        assert list_keys(s3, processed_bucket) == [
+            'totesys_processed_data_1.0/dim_counterparty.parquet',
+            'totesys_processed_data_1.0/dim_currency.parquet',
+            'totesys_processed_data_1.0/dim_date.parquet',
+            'totesys_processed_data_1.0/dim_location.parquet',
+            'totesys_processed_data_1.0/fact_sales_order.parquet']
+        assert list_keys(s3, ingestion_bucket) == [
+            'totesys_transformed_data_1.0/address.parquet',
+            'totesys_transformed_data_1.0/counterparty.parquet',
+            'totesys_transformed_data_1.0/currency.parquet',
+            'totesys_transformed_data_1.0/sales_order.parquet']
+
+        dim_counterparty = read_processed(
+            s3, 'totesys_processed_data_1.0/dim_counterparty.parquet')
+        assert dim_counterparty['counterparty_legal_city'].tolist() == ['York']
+
+    def test_a_failing_batch_is_left_untransformed_while_the_others_are_renamed(self, s3):
+        put_folder(s3, 'totesys_extraction_data_1.0', {'currency': currency_df('GBP')})
+        s3.put_object(Bucket=ingestion_bucket,
+                      Key='totesys_extraction_data_2.0/currency.parquet', Body=b'not parquet')
+        put_folder(s3, 'totesys_extraction_data_3.0', {'currency': currency_df('EUR')})
+
+        with pytest.raises(Exception) as err:
+            handler('event', 'context')
+
+        assert 'totesys_extraction_data_2.0' in str(err.value)
+        assert list_keys(s3, ingestion_bucket) == [
+            'totesys_extraction_data_2.0/currency.parquet',
+            'totesys_transformed_data_1.0/currency.parquet',
+            'totesys_transformed_data_3.0/currency.parquet']
+        assert list_keys(s3, processed_bucket) == [
+            'totesys_processed_data_1.0/dim_currency.parquet',
+            'totesys_processed_data_3.0/dim_currency.parquet']
+
+    def test_folders_are_transformed_concurrently(self, s3, monkeypatch):
+        monkeypatch.setenv('TRANSFORMATION_FOLDER_WORKERS', '2')
+        for time in range(1, 4):
+            put_folder(s3, f'totesys_extraction_data_{time}.0', {'currency': currency_df()})
+
+        handler('event', 'context')
+
+        assert list_keys(s3, processed_bucket) == [
+            f'totesys_processed_data_{time}.0/dim_currency.parquet' for time in range(1, 4)]
+        assert list_keys(s3, ingestion_bucket, 'totesys_extraction_data_') == []
+
+    def test_coalesced_folders_are_written_to_the_newest_folder(self, s3, monkeypatch):
+        monkeypatch.setenv('TRANSFORMATION_COALESCE_FOLDERS', '2')
+        put_folder(s3, 'totesys_extraction_data_1.0', {'currency': currency_df('GBP')})
+        put_folder(s3, 'totesys_extraction_data_2.0', {'currency': currency_df('USD')})
+        put_folder(s3, 'totesys_extraction_data_3.0', {'currency': currency_df('EUR')})
+
+        handler('event', 'context')
+
+        assert list_keys(s3, processed_bucket) == [
+            'totesys_processed_data_2.0/dim_currency.parquet',
+            'totesys_processed_data_3.0/dim_currency.parquet']
+        assert list_keys(s3, ingestion_bucket) == [
+            f'totesys_transformed_data_{time}.0/currency.parquet' for time in range(1, 4)]
+
+    def test_coalescing_keeps_the_versions_the_loading_keeps(self, s3, monkeypatch):
+        folders = {'totesys_extraction_data_1.0': sales_order_df(5),
+                   'totesys_extraction_data_2.0': sales_order_df(7)}
+        for folder_name, df in folders.items():
+            put_folder(s3, folder_name, {'sales_order': df})
+        handler('event', 'context')
+
+        # the loading keeps the oldest record of every sales order
+        loaded = pd.concat([read_processed(
+            s3, f'totesys_processed_data_{time}.0/fact_sales_order.parquet')
+            for time in [1, 2]], ignore_index=True).drop_duplicates(
+            subset='sales_order_id', keep='first')
+
+        monkeypatch.setenv('TRANSFORMATION_COALESCE_FOLDERS', '2')
+        for folder_name, df in folders.items():
+            put_folder(s3, folder_name.replace('_data_', '_data_1'), {'sales_order': df})
+        handler('event', 'context')
+
+        coalesced = read_processed(s3, 'totesys_processed_data_12.0/fact_sales_order.parquet')
+        assert coalesced['units_sold'].tolist() == [5]
+        pd.testing.assert_frame_equal(coalesced, loaded, check_dtype=False)
+
+    def test_coalesced_folders_update_the_reference_snapshots_in_order(self, s3, monkeypatch):
+        monkeypatch.setenv('TRANSFORMATION_REFERENCE_SNAPSHOTS', '1')
+        monkeypatch.setenv('TRANSFORMATION_COALESCE_FOLDERS', '2')
+        put_folder(s3, 'totesys_extraction_data_1.0', {'address': address_df('Leeds')})
+        put_folder(s3, 'totesys_extraction_data_2.0', {'address': address_df('York')})
+        handler('event', 'context')
+
+        put_folder(s3, 'totesys_extraction_data_3.0', {'counterparty': counterparty_df()})
+        handler('event', 'context')
+
+        dim_counterparty = read_processed(
+            s3, 'totesys_processed_data_3.0/dim_counterparty.parquet')
+        assert dim_counterparty['counterparty_legal_city'].tolist() == ['York']
+
+    def test_arrow_engine_builds_the_same_tables(self, s3, monkeypatch):
+        tables = {'currency': currency_df(), 'address': address_df(),
+                  'counterparty': counterparty_df()}
+        put_folder(s3, 'totesys_extraction_data_1.0', tables)
+        handler('event', 'context')
+
+        monkeypatch.setenv('TRANSFORMATION_ENGINE', 'arrow')
+        put_folder(s3, 'totesys_extraction_data_2.0', tables)
+        handler('event', 'context')
+
+        for table in ['dim_currency', 'dim_location', 'dim_counterparty']:
+            pd.testing.assert_frame_equal(
+                read_processed(s3, f'totesys_processed_data_2.0/{table}.parquet'),
+                read_processed(s3, f'totesys_processed_data_1.0/{table}.parquet'),
+                check_dtype=False)
+
+    def test_reference_snapshots_join_counterparties_extracted_without_addresses(
+            self, s3, monkeypatch):
+        monkeypatch.setenv('TRANSFORMATION_REFERENCE_SNAPSHOTS', '1')
+        put_folder(s3, 'totesys_extraction_data_1.0', {'address': address_df('Leeds')})
+        handler('event', 'context')
+
+        put_folder(s3, 'totesys_extraction_data_2.0', {'counterparty': counterparty_df()})
+        handler('event', 'context')
+
+        dim_counterparty = read_processed(
+            s3, 'totesys_processed_data_2.0/dim_counterparty.parquet')
+        assert dim_counterparty['counterparty_legal_city'].tolist() == ['Leeds']
+        assert 'reference/address.parquet' in list_keys(s3, processed_bucket)
+
+
+class TestHandlerPartitionedLayout:
+    def test_pending_manifests_are_transformed_and_renamed(self, s3, monkeypatch):
+        monkeypatch.setenv('INGESTION_LAYOUT', 'hive')
+        files = put_folder(s3, 'totesys_extraction_data_1688169600.0',
+                           {'currency': currency_df()}, 'hive')
+        write_manifest(ingestion_bucket, 'totesys_extraction_data_1688169600.0', files)
+        # a run without a manifest is still being written
+        put_folder(s3, 'totesys_extraction_data_1688170200.0', {'currency': currency_df()}, 'hive')
+
+        handler('event', 'context')
+
+        assert list_keys(s3, processed_bucket) == [
+            'totesys_processed_data_1688169600.0/dim_currency.parquet']
+        assert list_keys(s3, ingestion_bucket, 'manifests/') == [
+            'manifests/totesys_transformed_data_1688169600.0.json']
+        assert files[0] in list_keys(s3, ingestion_bucket)
+
+    def test_backfill_transforms_the_runs_of_a_date_range_again(self, s3, monkeypatch):
+        monkeypatch.setenv('INGESTION_LAYOUT', 'hive')
+        put_folder(s3, 'totesys_extraction_data_1688169600.0', {'currency': currency_df()}, 'hive')
+        put_folder(s3, 'totesys_extraction_data_1688256000.0', {'currency': currency_df()}, 'hive')
+
+        handler({'backfill_start': '2023-07-01', 'backfill_end': '2023-07-01'}, 'context')
+
+        assert list_keys(s3, processed_bucket) == [
+            'totesys_processed_data_1688169600.0/dim_currency.parquet']
+        assert list_keys(s3, ingestion_bucket, 'manifests/') == []
+
+
+class TestHandlerLedgerHandoff:
+    def test_runs_are_handed_over_to_the_loading(self, s3, monkeypatch):
+        monkeypatch.setenv('PIPELINE_HANDOFF', 'manifest')
+        files = put_folder(s3, 'totesys_extraction_data_1.0', {'currency': currency_df()})
+        publish_extraction(ingestion_bucket, 'totesys_extraction_data_1.0', files,
+                           handoff='manifest')
+
+        handler('event', 'context')
+
+        ledger = RunLedger(ingestion_bucket)
+        assert ledger.get_pending('transformation') == []
+        assert ledger.get_pending('loading') == ['totesys_extraction_data_1.0']
+        assert ledger.get_stage_files('totesys_extraction_data_1.0', 'transformation') == [
+            'totesys_processed_data_1.0/dim_currency.parquet']
+        # nothing is renamed
+        assert files[0] in list_keys(s3, ingestion_bucket)
+
+    def test_backfilled_runs_are_handed_over_to_the_loading(self, s3, monkeypatch):
+        monkeypatch.setenv('INGESTION_LAYOUT', 'hive')
+        monkeypatch.setenv('PIPELINE_HANDOFF', 'manifest')
+        put_folder(s3, 'totesys_extraction_data_1688169600.0', {'currency': currency_df()}, 'hive')
+
+        handler({'backfill_start': '2023-07-01', 'backfill_end': '2023-07-01'}, 'context')
+
+        ledger = RunLedger(ingestion_bucket)
+        assert ledger.get_pending('loading') == ['totesys_extraction_data_1688169600.0']
+        assert ledger.get_stage_files('totesys_extraction_data_1688169600.0', 'transformation') == [
+            'totesys_processed_data_1688169600.0/dim_currency.parquet']
@@ -0,0 +1,184 @@
+from unittest.mock import Mock
+from concurrent.futures import ThreadPoolExecutor
+from pytest import raises
+import pandas as pd
+import pyarrow as pa
+
+from utils.transformation_context import TransformationContext
+
+test_address_df = pd.DataFrame(
+    {
+        'address_id': [1, 2],
+        'city': ['Leeds', 'York']
+    }
+)
+
+
+class TestTransformationContext:
+    def test_each_file_is_read_once(self, mocker):
+        mock_get_df = mocker.patch(
+            'utils.transformation_context.get_df', return_value=test_address_df)
+        context = TransformationContext()
+
+        first = context.get_df('bucket', 'folder/address.parquet')
+        second = context.get_df('bucket', 'folder/address.parquet')
+
+        mock_get_df.assert_called_once()
+        assert mock_get_df.call_args[0] == ('bucket', 'folder/address.parquet')
+        pd.testing.assert_frame_equal(first, test_address_df)
+        pd.testing.assert_frame_equal(second, test_address_df)
+
+    def test_different_files_are_read_separately(self, mocker):
+        mock_get_df = mocker.patch(
+            'utils.transformation_context.get_df', return_value=test_address_df)
+        context = TransformationContext()
+
+        context.get_df('bucket', 'folder/address.parquet')
+        context.get_df('bucket', 'folder/staff.parquet')
+        context.get_df('other_bucket', 'folder/address.parquet')
+
+        assert mock_get_df.call_count == 3
+
+    def test_callers_cannot_modify_each_others_dataframe(self, mocker):
+        mocker.patch(
+            'utils.transformation_context.get_df', return_value=test_address_df.copy())
+        context = TransformationContext()
+
+        first = context.get_df('bucket', 'folder/address.parquet')
+        first.rename(columns={'city': 'location_city'}, inplace=True)
+        first.loc[0, 'location_city'] = 'Hull'
+
+        second = context.get_df('bucket', 'folder/address.parquet')
+
+        pd.testing.assert_frame_equal(second, test_address_df)
+
+    def test_failed_reads_are_not_memoized(self, mocker):
+        mock_get_df = mocker.patch(
+            'utils.transformation_context.get_df',
+            side_effect=[Exception('read failed'), test_address_df])
+        context = TransformationContext()
+
+        with raises(Exception):
+            context.get_df('bucket', 'folder/address.parquet')
+
+        pd.testing.assert_frame_equal(
+            context.get_df('bucket', 'folder/address.parquet'), test_address_df)
+        assert mock_get_df.call_count == 2
+
+    def test_concurrent_reads_of_one_file_download_it_once(self, mocker):
+        mock_get_df = mocker.patch(
+            'utils.transformation_context.get_df', return_value=test_address_df)
+        context = TransformationContext()
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(
+                lambda _: context.get_df('bucket', 'folder/address.parquet'), range(8)))
+
+        assert len(results) == 8
+        mock_get_df.assert_called_once()
+
+    def test_get_df_uses_context_when_given(self):
+        from utils.get_df import get_df
+
+        context = Mock()
+        context.get_df.return_value = test_address_df
+
+        assert get_df('bucket', 'folder/address.parquet', context) is test_address_df
+        context.get_df.assert_called_once_with('bucket', 'folder/address.parquet', None)
+
+    def test_get_df_returns_the_requested_columns(self, mocker):
+        mock_get_df = mocker.patch(
+            'utils.transformation_context.get_df', return_value=test_address_df[['city']])
+        context = TransformationContext()
+
+        result = context.get_df('bucket', 'folder/address.parquet', ['city'])
+
+        assert mock_get_df.call_args.kwargs['columns'] == ['city']
+        pd.testing.assert_frame_equal(result, test_address_df[['city']])
+
+    def test_columns_already_read_are_not_read_again(self, mocker):
+        mock_get_df = mocker.patch(
+            'utils.transformation_context.get_df',
+            side_effect=lambda bucket_name, key, boto3_session=None, columns=None:
+                test_address_df[columns] if columns else test_address_df)
+        context = TransformationContext()
+
+        context.prefetch('bucket', 'folder/address.parquet', ['address_id', 'city'])
+        only_city = context.get_df('bucket', 'folder/address.parquet', ['city'])
+
+        mock_get_df.assert_called_once()
+        assert list(only_city.columns) == ['city']
+
+    def test_missing_columns_are_read_with_the_ones_held(self, mocker):
+        mock_get_df = mocker.patch(
+            'utils.transformation_context.get_df',
+            side_effect=lambda bucket_name, key, boto3_session=None, columns=None:
+                test_address_df[columns] if columns else test_address_df)
+        context = TransformationContext()
+
+        context.get_df('bucket', 'folder/address.parquet', ['city'])
+        context.get_df('bucket', 'folder/address.parquet', ['address_id'])
+        context.get_df('bucket', 'folder/address.parquet')
+        context.get_df('bucket', 'folder/address.parquet', ['city'])
+
+        assert [call.kwargs['columns'] for call in mock_get_df.call_args_list] == [
+            ['city'], ['city', 'address_id'], None]
+
+    def test_coalesce_keeps_the_first_version_of_each_row(self, mocker):
+        frames = {
+            'folder_1/address.parquet': pd.DataFrame(
+                {'address_id': [1, 2], 'city': ['Leeds', 'York']}),
+            'folder_2/address.parquet': pd.DataFrame(
+                {'address_id': [2, 3], 'city': ['Hull', 'Bath']})
+        }
+        mocker.patch(
+            'utils.transformation_context.get_df',
+            side_effect=lambda bucket_name, key, boto3_session=None, columns=None: frames[key])
+        context = TransformationContext()
+
+        key = context.coalesce(
+            'bucket', ['folder_1/address.parquet', 'folder_2/address.parquet'], 'address_id')
+
+        assert key == 'folder_2/address.parquet'
+        pd.testing.assert_frame_equal(
+            context.get_df('bucket', key),
+            pd.DataFrame({'address_id': [1, 2, 3], 'city': ['Leeds', 'York', 'Bath']}))
+        assert context.get_sources('bucket', key) == [
+            'folder_1/address.parquet', 'folder_2/address.parquet']
+        assert context.get_sources('bucket', 'folder_3/address.parquet') == [
+            'folder_3/address.parquet']
+
+    def test_coalesce_concatenates_tables_without_id_column(self, mocker):
+        mocker.patch(
+            'utils.transformation_context.get_df', return_value=test_address_df)
+        context = TransformationContext()
+
+        key = context.coalesce(
+            'bucket', ['folder_1/address.parquet', 'folder_2/address.parquet'], 'missing_id')
+
+        assert len(context.get_df('bucket', key)) == 4
+
+    def test_each_table_is_read_once(self, mocker):
+        mocked_get_table = mocker.patch(
+            'utils.transformation_context.get_table',
+            return_value=pa.Table.from_pandas(test_address_df))
+        context = TransformationContext()
+
+        first = context.get_table('bucket', 'folder/address.parquet')
+        second = context.get_table('bucket', 'folder/address.parquet')
+
+        assert mocked_get_table.call_count == 1
+        assert first.equals(second)
+
+    def test_get_table_reads_coalesced_tables_from_the_context(self, mocker):
+        mocker.patch(
+            'utils.transformation_context.get_df', return_value=test_address_df)
+        mocked_get_table = mocker.patch('utils.transformation_context.get_table')
+        context = TransformationContext()
+
+        key = context.coalesce(
+            'bucket', ['folder_1/address.parquet', 'folder_2/address.parquet'], 'address_id')
+        table = context.get_table('bucket', key)
+
+        mocked_get_table.assert_not_called()
+        assert table.to_pydict() == {'address_id': [1, 2], 'city': ['Leeds', 'York']}
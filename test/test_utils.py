@@ -196,6 +196,27 @@ class TestGetDF:
         pd.testing.assert_frame_equal(
             result2, self.test_address_df, check_dtype=False)
 
+    def test_reads_only_the_requested_columns(self):
+        s3_client = boto3.client('s3', region_name='eu-west-2')
+        s3_client.create_bucket(
+            Bucket='test-extraction-bucket-',
+            CreateBucketConfiguration={
+                'LocationConstraint': 'eu-west-2'
+            }
+        )
+
+        wr.s3.to_parquet(
+            df=self.test_address_df,
+            path="s3://test-extraction-bucket-/totesys_extraction_data_/address.parquet")
+
+        result = get_df(
+            'test-extraction-bucket-',
+            'totesys_extraction_data_/address.parquet',
+            columns=['city', 'address_id'])
+
+        pd.testing.assert_frame_equal(
+            result, self.test_address_df[['city', 'address_id']], check_dtype=False)
+
 
 @mock_s3
 class TestMergeTables:
@@ -0,0 +1,110 @@
+from unittest.mock import Mock
+from pytest import raises
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INERROR
+
+from utils.warm_connection import WarmConnection, is_connection_healthy, close_warm_connections
+
+
+def create_mock_connection():
+    conn = Mock()
+    conn.closed = 0
+    conn.autocommit = False
+    conn.get_transaction_status.return_value = TRANSACTION_STATUS_IDLE
+    return conn
+
+
+class TestIsConnectionHealthy:
+    def test_open_connection_that_can_query_is_healthy(self):
+        conn = create_mock_connection()
+
+        assert is_connection_healthy(conn)
+        conn.cursor.return_value.execute.assert_called_with('SELECT 1;')
+        conn.rollback.assert_called_once()
+
+    def test_closed_connection_is_not_healthy(self):
+        conn = create_mock_connection()
+        conn.closed = 1
+
+        assert not is_connection_healthy(conn)
+        conn.cursor.assert_not_called()
+
+    def test_connection_that_cannot_query_is_not_healthy(self):
+        conn = create_mock_connection()
+        conn.cursor.return_value.execute.side_effect = Exception(
+            'server closed the connection unexpectedly')
+
+        assert not is_connection_healthy(conn)
+
+    def test_failed_transaction_is_rolled_back_before_checking(self):
+        conn = create_mock_connection()
+        conn.autocommit = True
+        conn.get_transaction_status.return_value = TRANSACTION_STATUS_INERROR
+
+        assert is_connection_healthy(conn)
+        conn.rollback.assert_called_once()
+
+
+class TestWarmConnection:
+    def test_connection_is_reused_while_healthy(self):
+        connect = Mock(side_effect=create_mock_connection)
+        warm_connection = WarmConnection(connect)
+
+        first = warm_connection.get_connection()
+        second = warm_connection.get_connection()
+
+        assert first is second
+        assert connect.call_count == 1
+
+    def test_unhealthy_connection_is_closed_and_replaced(self):
+        connect = Mock(side_effect=create_mock_connection)
+        warm_connection = WarmConnection(connect)
+
+        first = warm_connection.get_connection()
+        first.closed = 2
+        second = warm_connection.get_connection()
+
+        assert first is not second
+        first.close.assert_called_once()
+        assert connect.call_count == 2
+
+    def test_transaction_commits_when_block_completes(self):
+        warm_connection = WarmConnection(create_mock_connection)
+
+        with warm_connection.transaction() as conn:
+            pass
+
+        conn.commit.assert_called_once()
+
+    def test_transaction_rolls_back_and_raises_when_block_fails(self):
+        warm_connection = WarmConnection(create_mock_connection)
+
+        with raises(ValueError):
+            with warm_connection.transaction() as conn:
+                raise ValueError
+
+        conn.commit.assert_not_called()
+        conn.rollback.assert_called()
+        assert warm_connection.get_connection() is conn
+
+    def test_connection_is_discarded_when_it_cannot_be_rolled_back(self):
+        warm_connection = WarmConnection(create_mock_connection)
+
+        with raises(ValueError):
+            with warm_connection.transaction() as conn:
+                conn.rollback.side_effect = Exception('connection already closed')
+                raise ValueError
+
+        assert warm_connection.conn is None
+        assert warm_connection.get_connection() is not conn
+
+    def test_close_warm_connections_closes_every_connection(self):
+        first = WarmConnection(create_mock_connection)
+        second = WarmConnection(create_mock_connection)
+        first_conn = first.get_connection()
+        second_conn = second.get_connection()
+
+        close_warm_connections()
+
+        first_conn.close.assert_called_once()
+        second_conn.close.assert_called_once()
+        assert first.conn is None and second.conn is None
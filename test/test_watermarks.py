@@ -0,0 +1,82 @@
+from moto import mock_s3
+import boto3
+from datetime import datetime
+
+from utils.watermarks import get_watermarks, save_watermarks, get_rows_watermark, get_batch_watermark
+import pyarrow as pa
+
+
+@mock_s3
+class TestGetAndSaveWatermarks:
+    def test_get_watermarks_returns_empty_dictionary_if_nothing_saved(self):
+        s3 = boto3.client('s3', region_name='eu-west-2')
+        s3.create_bucket(
+            Bucket='test_bucket',
+            CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'}
+        )
+
+        assert get_watermarks('test_bucket') == {}
+
+    def test_saved_watermarks_can_be_read_back(self):
+        s3 = boto3.client('s3', region_name='eu-west-2')
+        s3.create_bucket(
+            Bucket='test_bucket',
+            CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'}
+        )
+
+        watermarks = {
+            'sales_order': {'last_updated': datetime(2023, 7, 1, 12, 30, 0, 123000), 'id': 42},
+            'currency': {'last_updated': datetime(2022, 11, 3, 14, 20), 'id': 3}}
+
+        save_watermarks('test_bucket', watermarks)
+
+        assert get_watermarks('test_bucket') == watermarks
+
+
+class TestGetRowsWatermark:
+    def test_returns_newest_row_using_id_as_tie_breaker(self):
+        column_names = ['sales_order_id', 'last_updated']
+        rows = [(1, datetime(2023, 7, 1)),
+                (7, datetime(2023, 7, 2)),
+                (5, datetime(2023, 7, 2)),
+                (9, datetime(2023, 6, 30))]
+
+        result = get_rows_watermark(column_names, rows, 'sales_order')
+
+        assert result == {'last_updated': datetime(2023, 7, 2), 'id': 7}
+
+    def test_keeps_existing_watermark_if_it_is_newer(self):
+        column_names = ['sales_order_id', 'last_updated']
+        rows = [(1, datetime(2023, 7, 1))]
+        watermark = {'last_updated': datetime(2023, 7, 3), 'id': 2}
+
+        result = get_rows_watermark(
+            column_names, rows, 'sales_order', watermark)
+
+        assert result == watermark
+
+    def test_returns_given_watermark_if_columns_are_missing(self):
+        column_names = ['person_id', 'date']
+        rows = [(1, datetime(2023, 7, 1))]
+
+        assert get_rows_watermark(column_names, rows, 'person') is None
+
+
+class TestGetBatchWatermark:
+    def test_returns_newest_row_using_id_as_tie_breaker(self):
+        batch = pa.table({
+            'sales_order_id': [1, 7, 5, 9],
+            'last_updated': [datetime(2023, 7, 1), datetime(2023, 7, 2),
+                             datetime(2023, 7, 2), datetime(2023, 6, 30)]})
+
+        result = get_batch_watermark(batch, 'sales_order')
+
+        assert result == {'last_updated': datetime(2023, 7, 2), 'id': 7}
+
+    def test_keeps_existing_watermark_if_it_is_newer(self):
+        batch = pa.table({
+            'sales_order_id': [1],
+            'last_updated': [datetime(2023, 7, 1)]})
+        watermark = {'last_updated': datetime(2023, 7, 3), 'id': 2}
+
+        assert get_batch_watermark(batch, 'sales_order', watermark) == watermark
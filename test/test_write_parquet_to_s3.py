@@ -0,0 +1,82 @@
+from io import BytesIO
+from moto import mock_s3
+import boto3
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from pytest import raises
+
+from utils.write_parquet_to_s3 import write_parquet_to_s3
+
+
+def read_parquet_file(s3, key):
+    body = s3.get_object(Bucket='test_bucket', Key=key)['Body'].read()
+    return pq.ParquetFile(BytesIO(body))
+
+
+@pytest.fixture
+def s3():
+    with mock_s3():
+        s3 = boto3.client('s3', region_name='eu-west-2')
+        s3.create_bucket(
+            Bucket='test_bucket',
+            CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'}
+        )
+        yield s3
+
+
+class TestWriteParquetToS3:
+    def test_dataframe_is_written_in_row_groups(self, s3):
+        df = pd.DataFrame({'id': range(5), 'name': ['a', None, 'c', 'd', 'e']})
+
+        row_count = write_parquet_to_s3(df, 'test_bucket', 'test.parquet', row_group_size=2)
+
+        parquet_file = read_parquet_file(s3, 'test.parquet')
+        assert row_count == 5
+        assert parquet_file.metadata.num_row_groups == 3
+        pd.testing.assert_frame_equal(parquet_file.read().to_pandas(), df)
+
+    def test_dataframe_is_read_back_like_to_parquet(self, s3):
+        df = pd.DataFrame({'id': pd.array([1, None, 3], dtype='Int64'),
+                           'name': [None, None, 'c']})
+
+        write_parquet_to_s3(df, 'test_bucket', 'test.parquet', row_group_size=1)
+
+        result = read_parquet_file(s3, 'test.parquet').read().to_pandas()
+        pd.testing.assert_frame_equal(result, pd.read_parquet(BytesIO(df.to_parquet())))
+
+    def test_empty_dataframe_still_creates_the_file(self, s3):
+        df = pd.DataFrame({'id': pd.Series([], dtype='int64')})
+
+        assert write_parquet_to_s3(df, 'test_bucket', 'test.parquet') == 0
+        assert read_parquet_file(s3, 'test.parquet').schema_arrow.names == ['id']
+
+    def test_compression_is_configurable(self, s3, monkeypatch):
+        monkeypatch.setenv('PARQUET_COMPRESSION', 'zstd')
+        table = pa.table({'id': [1, 2]})
+
+        write_parquet_to_s3(table, 'test_bucket', 'test.parquet')
+
+        column = read_parquet_file(s3, 'test.parquet').metadata.row_group(0).column(0)
+        assert column.compression == 'ZSTD'
+
+    def test_batches_are_written_as_row_groups(self, s3):
+        batches = [pa.table({'id': [1, 2]}), pa.table({'id': []}, schema=pa.schema([('id', pa.int64())])),
+                   pa.record_batch([pa.array([3])], names=['id'])]
+
+        row_count = write_parquet_to_s3(iter(batches), 'test_bucket', 'test.parquet')
+
+        parquet_file = read_parquet_file(s3, 'test.parquet')
+        assert row_count == 3
+        assert parquet_file.metadata.num_row_groups == 2
+
+    def test_upload_is_aborted_if_the_batches_fail(self, s3):
+        def failing_batches():
+            yield pa.table({'id': [1, 2]})
+            raise ValueError('the query failed')
+
+        with raises(ValueError):
+            write_parquet_to_s3(failing_batches(), 'test_bucket', 'test.parquet')
+
+        assert 'Contents' not in s3.list_objects_v2(Bucket='test_bucket')
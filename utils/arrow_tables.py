@@ -0,0 +1,82 @@
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from utils.aws_clients import get_client
+from utils.write_parquet_to_s3 import write_parquet_to_s3
+
+
+def get_table(bucket_name, key, context=None):
+    """Read a Parquet file from an S3 bucket into a pyarrow Table."""
+
+    if context is not None:
+        return context.get_table(bucket_name, key)
+
+    body = get_client('s3').get_object(Bucket=bucket_name, Key=key)['Body'].read()
+    return pq.read_table(pa.BufferReader(body))
+
+
+def put_table(table, bucket_name, key):
+    """Write a pyarrow Table as a Parquet file to an S3 bucket, streaming it one row group at a time."""
+
+    write_parquet_to_s3(table, bucket_name, key)
+
+
+def drop_columns(table, column_names):
+    """
+    Remove columns from a table, like DataFrame.drop it fails if one of them does not exist.
+    """
+
+    return table.drop(column_names)
+
+
+def rename_columns(table, rename_dict):
+    """
+    Rename the columns of a table found in 'rename_dict', keeping their order.
+    """
+
+    return table.rename_columns([rename_dict.get(name, name) for name in table.column_names])
+
+
+def select_columns(table, column_names):
+    """
+    Keep only the given columns of a table, in the given order.
+    """
+
+    return table.select(column_names)
+
+
+def cast_columns(table, column_types):
+    """Cast columns of a table to new Arrow types, e.g. integral doubles to int64."""
+
+    for name, arrow_type in column_types.items():
+        index = table.schema.get_field_index(name)
+        table = table.set_column(index, name, pc.cast(table.column(name), arrow_type))
+
+    return table
+
+
+def map_values(array, mapping):
+    """Replace every value of an array by its value in 'mapping', or null if it has none."""
+
+    indices = pc.index_in(array, value_set=pa.array(list(mapping.keys())))
+    return pa.array(list(mapping.values())).take(indices)
+
+
+def left_join(left, right, left_on, right_on):
+    """Left join two tables the way DataFrame.merge(how='left') does."""
+
+    row_order = '__left_row_order'
+    join_key = '__right_join_key'
+
+    left = left.append_column(row_order, pa.array(range(left.num_rows), pa.int64()))
+    if right_on != left_on:
+        # Arrow drops the right key, so join on a copy of it to keep the original column
+        right = right.append_column(join_key, right.column(right_on))
+        right_on = join_key
+
+    joined = left.join(right, keys=left_on, right_keys=right_on, join_type='left outer')
+    joined = joined.sort_by(row_order).drop([row_order])
+
+    right_names = [name for name in right.column_names if name != right_on]
+    return joined.select(
+        [name for name in left.column_names if name != row_order] + right_names)
@@ -0,0 +1,46 @@
+import boto3
+import threading
+from botocore.config import Config
+
+_session = None
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_session():
+    """Get the boto3 Session shared by the whole process."""
+
+    global _session
+
+    with _lock:
+        if _session is None:
+            _session = boto3.Session()
+        return _session
+
+
+def get_client(service_name, region_name=None, max_pool_connections=None):
+    """Get a boto3 client shared by the whole process, creating it on first use."""
+
+    key = (service_name, region_name, max_pool_connections)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    session = get_session()
+    with _lock:
+        if key not in _clients:
+            config = Config(max_pool_connections=max_pool_connections) \
+                if max_pool_connections else None
+            _clients[key] = session.client(
+                service_name, region_name=region_name, config=config)
+        return _clients[key]
+
+
+def clear_clients():
+    """Forget the shared session and every cached client, so new ones are created on next use."""
+
+    global _session
+
+    with _lock:
+        _session = None
+        _clients.clear()
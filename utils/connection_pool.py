@@ -0,0 +1,74 @@
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+from utils.connect_to_server import connect_to_server
+
+
+class ConnectionPool:
+    """A small thread-safe pool of psycopg2 connections created with connect_to_server."""
+
+    def __init__(self, credentials, max_connections=4, refresh_credentials=None):
+        self.credentials = credentials
+        self.max_connections = max_connections
+        self.refresh_credentials = refresh_credentials
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def get_connection(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if len(self._connections) < self.max_connections:
+                conn = self._connect()
+                self._connections.append(conn)
+                return conn
+
+        return self._idle.get()
+
+    def _connect(self):
+        try:
+            return connect_to_server(self.credentials)
+        except Exception:
+            if self.refresh_credentials is None:
+                raise
+
+            credentials = self.refresh_credentials()
+            if credentials == self.credentials:
+                raise
+
+            self.credentials = credentials
+            return connect_to_server(self.credentials)
+
+    def put_connection(self, conn):
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a with block."""
+
+        conn = self.get_connection()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.put_connection(conn)
+
+    def close_all(self):
+        logger = logging.getLogger('Utils')
+
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except Exception as err:
+                    logger.error(err)
+            self._connections = []
+            self._idle = queue.LifoQueue()
@@ -1,16 +1,37 @@
-import boto3
 import logging
+import os
+import time
+from utils.aws_clients import get_client
+
+# bucket names resolved by this process, kept across warm Lambda invocations
+_bucket_names = {}
+
 
 def get_bucket_name(name):
+    """Find the first S3 bucket whose name contains the given string."""
 
     logger = logging.getLogger('Utils')
-    s3_client = boto3.client('s3')
+    # 0 disables the cache
+    ttl = float(os.environ.get('BUCKET_NAME_CACHE_TTL', 900))
+
+    cached = _bucket_names.get(name)
+    if cached and time.monotonic() - cached[1] < ttl:
+        return cached[0]
+
+    s3_client = get_client('s3')
 
     try:
         s3_bucket_list = [bucket['Name'] for bucket in s3_client.list_buckets()[
             'Buckets'] if name in bucket['Name']]
+        _bucket_names[name] = (s3_bucket_list[0], time.monotonic())
         return s3_bucket_list[0]
-    
+
     except IndexError:
         logger.error("Buckets need to be created before extraction")
-        raise IndexError("No buckets in list")
\ No newline at end of file
+        raise IndexError("No buckets in list")
+
+
+def clear_bucket_name_cache():
+    """Forget every cached bucket name, so the next lookups list the buckets again."""
+
+    _bucket_names.clear()
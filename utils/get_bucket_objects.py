@@ -1,25 +1,48 @@
-import boto3
 import logging
+from utils.aws_clients import get_client
 
 
-def get_bucket_objects(bucket_name):
+def get_bucket_objects(bucket_name, prefix='', s3_client=None, max_keys=None):
+    """List the keys of the objects in an S3 bucket, following every page of results."""
     try:
         logger = logging.getLogger('Utils')
 
-        s3 = boto3.client('s3')
+        s3 = s3_client if s3_client else get_client('s3')
 
-        bucket_objects = s3.list_objects_v2(Bucket=bucket_name)
-        
-        if 'Contents' in bucket_objects.keys():
+        pages = s3.get_paginator('list_objects_v2').paginate(
+            Bucket=bucket_name,
+            Prefix=prefix,
+            PaginationConfig={'MaxItems': max_keys})
 
-            object_keys = [
-                object['Key'] for object in s3.list_objects_v2(
-                    Bucket=bucket_name)['Contents']]
+        object_keys = [
+            object['Key'] for page in pages for object in page.get('Contents', [])]
+
+        if len(object_keys) > 0:
             return object_keys
-        
+
         else:
             return None
-    
+
+    except Exception as err:
+        logger.error(err)
+        raise Exception
+
+
+def get_bucket_prefixes(bucket_name, prefix='', delimiter='/', s3_client=None):
+    """List the "folders" directly under a prefix in an S3 bucket, following every page of results."""
+    try:
+        logger = logging.getLogger('Utils')
+
+        s3 = s3_client if s3_client else get_client('s3')
+
+        pages = s3.get_paginator('list_objects_v2').paginate(
+            Bucket=bucket_name,
+            Prefix=prefix,
+            Delimiter=delimiter)
+
+        return [common_prefix['Prefix'][:-len(delimiter)]
+                for page in pages for common_prefix in page.get('CommonPrefixes', [])]
+
     except Exception as err:
         logger.error(err)
         raise Exception
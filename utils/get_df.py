@@ -1,5 +1,10 @@
 import awswrangler as wr
 
-def get_df(bucket_one, key):
+
+def get_df(bucket_one, key, context=None, boto3_session=None, columns=None):
+    if context is not None:
+        return context.get_df(bucket_one, key, columns)
+
+    # only the column chunks of 'columns' are downloaded and decoded
     return wr.s3.read_parquet(
-            f"s3://{bucket_one}/{key}")
\ No newline at end of file
+        f"s3://{bucket_one}/{key}", columns=columns, boto3_session=boto3_session)
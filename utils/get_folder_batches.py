@@ -0,0 +1,59 @@
+import logging
+
+
+def get_table_file_name(key):
+    """Get the file name of the table a key holds, e.g. 'address.parquet', in either layout."""
+
+    if key.startswith('table='):
+        return f"{key.split('/')[0][len('table='):]}.parquet"
+    return key.split('/')[-1]
+
+
+def get_run_name(key):
+    """
+    Get the name of the extraction run a key was written by, e.g. 'totesys_extraction_data_<time>'.
+    """
+
+    if key.startswith('table='):
+        return key.split('/')[-1].rsplit('.', 1)[0]
+    return key.split('/')[0]
+
+
+def get_extraction_time(folder_name):
+    """
+    Get the timestamp an extraction folder name ends with, or infinity if it has none.
+    """
+
+    try:
+        return float(folder_name.rsplit('_', 1)[1])
+    except (IndexError, ValueError):
+        return float('inf')
+
+
+def get_folder_batches(grouped_files, batch_size=1):
+    """Split folders of extracted files into batches of consecutive folders, oldest first."""
+
+    logger = logging.getLogger('Utils')
+
+    try:
+        batch_size = max(int(batch_size), 1)
+        folders = sorted(grouped_files.items(),
+                         key=lambda folder: (get_extraction_time(folder[0]), folder[0]))
+
+        return [folders[start:start + batch_size]
+                for start in range(0, len(folders), batch_size)]
+
+    except Exception as err:
+        logger.error(err)
+        raise Exception
+
+
+def get_batch_table_files(batch):
+    """Group the files of a batch of folders by the table they were extracted from."""
+
+    table_files = {}
+    for _, files in batch:
+        for file in files:
+            table_files.setdefault(get_table_file_name(file), []).append(file)
+
+    return table_files
@@ -1,17 +1,32 @@
-import boto3
 from botocore.exceptions import ClientError
 import json
 import logging
+import os
+import time
+from utils.aws_clients import get_client
 
+# secrets fetched by this process, kept across warm Lambda invocations
+_secrets = {}
 
-def get_secret(secret_name):
+
+def get_secret(secret_name, refresh=False):
+    """Fetch a JSON secret from Secrets Manager."""
 
     logger = logging.getLogger('Utils')
-    secret_manager = boto3.client('secretsmanager', region_name="eu-west-2")
+    # 0 disables the cache
+    ttl = float(os.environ.get('SECRET_CACHE_TTL', 3600))
+
+    cached = _secrets.get(secret_name)
+    if cached and not refresh and time.monotonic() - cached[1] < ttl:
+        return dict(cached[0])
+
+    secret_manager = get_client('secretsmanager', region_name="eu-west-2")
 
     try:
         secret = secret_manager.get_secret_value(SecretId=secret_name)
-        return json.loads(secret['SecretString'])
+        value = json.loads(secret['SecretString'])
+        _secrets[secret_name] = (value, time.monotonic())
+        return dict(value)
 
     except ClientError as err:
         if err.response['Error']['Code'] == 'ResourceNotFoundException':
@@ -20,3 +35,12 @@ def get_secret(secret_name):
         else:
             logger.error(err)
             raise Exception
+
+
+def invalidate_secret(secret_name=None):
+    """Remove a secret from the cache, or every secret if no name is given."""
+
+    if secret_name is None:
+        _secrets.clear()
+    else:
+        _secrets.pop(secret_name, None)
@@ -0,0 +1,274 @@
+import json
+import logging
+import re
+import select
+import time
+from decimal import Decimal
+import psycopg2
+import psycopg2.errors
+import pyarrow as pa
+import pyarrow.compute as pc
+from psycopg2.extras import LogicalReplicationConnection
+from utils.write_parquet_to_s3 import write_parquet_to_s3
+from utils.partitioned_layout import get_extraction_key
+from utils.run_ledger import publish_extraction
+from utils.watermarks import get_batch_watermark
+
+# wal2json emits one JSON document per change, with the Postgres type of every column
+wal2json_options = {
+    'format-version': '2',
+    'include-types': '1',
+    'include-typmod': '1'
+}
+
+wal2json_arrow_types = {
+    'smallint': pa.int64(),
+    'integer': pa.int64(),
+    'bigint': pa.int64(),
+    'boolean': pa.bool_(),
+    'real': pa.float64(),
+    'double precision': pa.float64(),
+    # a numeric without a precision can hold any number of digits, like the polling extraction
+    # it is written as text rather than rounded
+    'numeric': pa.string(),
+    'text': pa.string(),
+    'date': pa.date32(),
+    'time without time zone': pa.time64('us'),
+    'timestamp without time zone': pa.timestamp('us'),
+    'timestamp with time zone': pa.timestamp('us', tz='UTC'),
+}
+
+
+def open_replication_connection(secrets):
+    """Open a logical replication connection to a Postgres database."""
+
+    return psycopg2.connect(host=secrets['host'],
+                            port=secrets['port'],
+                            dbname=secrets['database'],
+                            user=secrets['user'],
+                            password=secrets['password'],
+                            connection_factory=LogicalReplicationConnection)
+
+
+def ensure_replication_slot(cursor, slot_name, output_plugin='wal2json'):
+    """Create a logical replication slot unless it already exists."""
+
+    logger = logging.getLogger('Utils')
+
+    try:
+        cursor.create_replication_slot(slot_name, output_plugin=output_plugin)
+        logger.info(f"Created the replication slot {slot_name}.")
+        return True
+    except psycopg2.errors.DuplicateObject:
+        return False
+
+
+def get_arrow_type(type_name):
+    """Get the Arrow type of a Postgres type name as written by wal2json, e.g. 'numeric(10,2)'."""
+
+    decimal = re.fullmatch(r'numeric\((\d+),(\d+)\)', type_name)
+    if decimal:
+        return pa.decimal128(int(decimal.group(1)), int(decimal.group(2)))
+
+    if type_name.startswith('character'):
+        return pa.string()
+
+    return wal2json_arrow_types.get(type_name)
+
+
+def values_to_arrow(values, arrow_type):
+    """Convert the JSON values of a column into an Arrow array of its type."""
+
+    if arrow_type is None:
+        return pa.array(values)
+
+    if pa.types.is_date(arrow_type):
+        return pc.cast(pc.cast(pa.array(values, pa.string()), pa.timestamp('s')), arrow_type)
+
+    if pa.types.is_time(arrow_type):
+        timestamps = pc.binary_join_element_wise(
+            '1970-01-01 ', pa.array(values, pa.string()), '')
+        return pc.cast(pc.cast(timestamps, pa.timestamp('us')), arrow_type)
+
+    if pa.types.is_timestamp(arrow_type):
+        return pc.cast(pa.array(values, pa.string()), arrow_type)
+
+    if pa.types.is_string(arrow_type):
+        return pa.array([value if value is None or isinstance(value, str) else str(value)
+                         for value in values], arrow_type)
+
+    if pa.types.is_floating(arrow_type):
+        return pa.array([None if value is None else float(value) for value in values], arrow_type)
+
+    return pa.array(values, arrow_type)
+
+
+class ChangeBuffer:
+    """Buffers the changes decoded from a replication slot, table by table."""
+
+    def __init__(self):
+        self._upserts = {}
+        self._types = {}
+        self._uncommitted = []
+        self.change_count = 0
+        self.commit_lsn = None
+
+    def __len__(self):
+        return sum(len(rows) for rows in self._upserts.values())
+
+    def add(self, change, lsn):
+        """Buffer one change decoded from wal2json with format-version 2."""
+
+        action = change['action']
+
+        # a transaction is only buffered once committed, so a flush never writes part of one
+        if action == 'C':
+            for uncommitted_change in self._uncommitted:
+                self._apply(uncommitted_change)
+            self._uncommitted = []
+            self.commit_lsn = lsn
+
+        elif action in ('I', 'U', 'D'):
+            self._uncommitted.append(change)
+
+    def _apply(self, change):
+        action = change['action']
+        table = change['table']
+        upserts = self._upserts.setdefault(table, {})
+        self.change_count += 1
+
+        # like the polling extraction, deletes are not propagated to the warehouse
+        if action == 'D':
+            identity = self._read_columns(table, change['identity'])
+            upserts.pop(self._get_key(table, identity), None)
+            return
+
+        row = self._read_columns(table, change['columns'])
+        key = self._get_key(table, row)
+
+        if action == 'U' and change.get('identity'):
+            # the primary key itself has been updated
+            identity = self._read_columns(table, change['identity'])
+            old_key = self._get_key(table, identity)
+            if old_key != key:
+                upserts.pop(old_key, None)
+
+        upserts[key] = row
+
+    def get_tables(self):
+        """Convert the buffered changes into Arrow tables."""
+
+        return [(table, self._to_arrow(table, list(self._upserts[table].values())))
+                for table in sorted(self._upserts) if self._upserts[table]]
+
+    def clear(self):
+        # the changes of a transaction not committed yet are kept for the next flush
+        self._upserts = {}
+        self.change_count = 0
+
+    def _read_columns(self, table, columns):
+        types = self._types.setdefault(table, {})
+        for column in columns:
+            types[column['name']] = column.get('type', '')
+        return {column['name']: column['value'] for column in columns}
+
+    def _get_key(self, table, row):
+        id_column = f"{table}_id"
+        if id_column in row:
+            return row[id_column]
+        return tuple(sorted(row.items(), key=lambda item: item[0]))
+
+    def _to_arrow(self, table, rows):
+        if not rows:
+            return None
+
+        names = []
+        for row in rows:
+            names.extend(name for name in row if name not in names)
+
+        types = self._types[table]
+        return pa.Table.from_arrays(
+            [values_to_arrow([row.get(name) for row in rows], get_arrow_type(types[name]))
+             for name in names],
+            names=names)
+
+
+def flush_changes(buffer, bucket_name, folder_prefix, layout='flat', handoff='rename', watermarks=None):
+    """Write the buffered changes to S3 in the layout of the polling extraction, without deleted rows."""
+
+    row_count = 0
+    files = []
+
+    for table, rows in buffer.get_tables():
+        key = get_extraction_key(folder_prefix, table, layout)
+        row_count += write_parquet_to_s3([rows], bucket_name, key)
+        files.append(key)
+
+        if watermarks is not None:
+            watermark = get_batch_watermark(rows, table, watermarks.get(table))
+            if watermark:
+                watermarks[table] = watermark
+
+    if files:
+        publish_extraction(bucket_name, folder_prefix, files, layout, handoff)
+
+    return row_count
+
+
+def consume_changes(
+        cursor,
+        slot_name,
+        bucket_name,
+        create_folder_prefix,
+        tables,
+        max_seconds=240,
+        flush_seconds=5,
+        flush_rows=10000,
+        layout='flat',
+        handoff='rename',
+        watermarks=None):
+    """Stream the changes of a logical replication slot into micro-batches of extraction folders."""
+
+    logger = logging.getLogger('Utils')
+
+    options = dict(wal2json_options)
+    options['add-tables'] = ','.join(f"public.{table}" for table in tables)
+    cursor.start_replication(slot_name=slot_name, decode=True, options=options)
+
+    buffer = ChangeBuffer()
+    change_count = 0
+    deadline = time.monotonic() + max_seconds
+    last_flush = time.monotonic()
+
+    while True:
+        now = time.monotonic()
+
+        if now >= deadline or now - last_flush >= flush_seconds or len(buffer) >= flush_rows:
+            if len(buffer):
+                folder_prefix = create_folder_prefix()
+                row_count = flush_changes(
+                    buffer, bucket_name, folder_prefix, layout, handoff, watermarks)
+                logger.info(
+                    f"Wrote {row_count} rows from {buffer.change_count} changes to {folder_prefix}.")
+
+            # changes that left nothing to write, e.g. deletes, are acknowledged all the same
+            change_count += buffer.change_count
+            buffer.clear()
+
+            # forced, as the connection is closed soon after the deadline and psycopg2 would
+            # otherwise defer the feedback, leaving the last micro-batch unacknowledged
+            if buffer.commit_lsn is not None:
+                cursor.send_feedback(flush_lsn=buffer.commit_lsn, force=True)
+            last_flush = now
+
+            if now >= deadline:
+                return change_count
+
+        message = cursor.read_message()
+        if message is None:
+            # wait for the server, but no longer than until the next flush is due
+            timeout = max(0, min(deadline, last_flush + flush_seconds) - time.monotonic())
+            select.select([cursor], [], [], timeout)
+            continue
+
+        buffer.add(json.loads(message.payload, parse_float=Decimal), message.data_start)
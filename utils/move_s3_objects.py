@@ -1,22 +1,57 @@
-import boto3
 import logging
+from boto3.s3.transfer import TransferConfig
+from concurrent.futures import ThreadPoolExecutor
+from utils.aws_clients import get_client
 
-def move_s3_objects_to_new_folder(files, current_folder_name, new_folder_name, s3_bucket):    
+max_copy_workers = 16
+max_delete_batch_size = 1000
+# copy_object cannot copy objects over 5 GB, so larger ones are copied in parts
+multipart_copy_config = TransferConfig(
+    multipart_threshold=5 * 1024 ** 3,
+    multipart_chunksize=512 * 1024 ** 2,
+    use_threads=False)
+
+
+def move_s3_objects_to_new_folder(files, current_folder_name, new_folder_name, s3_bucket, s3_client=None):
+    """Move objects into a new folder of an S3 bucket using server-side copies."""
 
     logger = logging.getLogger('Utils')
 
     try:
+        s3 = s3_client if s3_client else get_client(
+            's3', max_pool_connections=max_copy_workers)
+
+        moves = []
         for file in files:
-            new_file_name = file.replace(
-                current_folder_name, new_folder_name)
-            s3 = boto3.client('s3')
-            s3.copy_object(Bucket=s3_bucket,
-                        CopySource={'Bucket': s3_bucket, 'Key': file},
-                        Key=new_file_name)
-            s3.delete_object(Bucket=s3_bucket, Key=file)
+            new_file_name = file.replace(current_folder_name, new_folder_name)
+            if new_file_name == file:
+                raise ValueError(
+                    f"{file} is not in folder {current_folder_name}.")
+            moves.append((file, new_file_name))
+
+        def copy(move):
+            s3.copy(CopySource={'Bucket': s3_bucket, 'Key': move[0]},
+                    Bucket=s3_bucket,
+                    Key=move[1],
+                    Config=multipart_copy_config)
+
+        if moves:
+            workers = min(max_copy_workers, len(moves), s3.meta.config.max_pool_connections)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(copy, moves))
+
+        for start in range(0, len(moves), max_delete_batch_size):
+            response = s3.delete_objects(
+                Bucket=s3_bucket,
+                Delete={'Objects': [{'Key': file} for file, _ in moves[start:start + max_delete_batch_size]],
+                        'Quiet': True})
+
+            if response.get('Errors'):
+                raise Exception(
+                    f"Could not delete {len(response['Errors'])} objects: {response['Errors'][0]}")
 
         logger.info(f"Folder {current_folder_name} has been renamed to {new_folder_name}.")
-    
+
     except Exception as err:
         logger.error(err)
-        raise Exception
\ No newline at end of file
+        raise Exception
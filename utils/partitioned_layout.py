@@ -0,0 +1,70 @@
+import json
+import logging
+from datetime import datetime, timezone, timedelta
+from utils.aws_clients import get_client
+from utils.get_bucket_objects import get_bucket_objects, get_bucket_prefixes
+from utils.get_folder_batches import get_extraction_time, get_run_name
+
+# In the partitioned ('hive') layout of the ingestion bucket every table of a run is written to
+#   table=<table>/date=<YYYY-MM-DD>/hour=<HH>/<run>.parquet
+# and the run is only visible to the transformation once its manifest, listing those files, is
+# written to manifests/<run>.json. The manifest is renamed to 'transformed' once the run has
+# been transformed, the Parquet files themselves are never moved.
+manifest_prefix = 'manifests/'
+
+
+def get_extraction_key(folder_prefix, table_name, layout='flat'):
+    """Get the key a run writes the extraction of a table to."""
+
+    if layout != 'hive':
+        return f"{folder_prefix}/{table_name}.parquet"
+
+    extracted_at = datetime.fromtimestamp(get_extraction_time(folder_prefix), timezone.utc)
+    return (f"table={table_name}/date={extracted_at:%Y-%m-%d}/hour={extracted_at:%H}/"
+            f"{folder_prefix}.parquet")
+
+
+def get_manifest_key(run_name):
+    return f"{manifest_prefix}{run_name}.json"
+
+
+def write_manifest(bucket_name, run_name, files):
+    """Write the manifest of a run, making its files visible to the transformation."""
+
+    get_client('s3').put_object(
+        Bucket=bucket_name,
+        Key=get_manifest_key(run_name),
+        Body=json.dumps({'run': run_name, 'files': sorted(files)}))
+
+
+def get_pending_runs(bucket_name, run_prefix='totesys_extraction_data_'):
+    """Read the manifests of the runs that have not been transformed yet."""
+
+    logger = logging.getLogger('Utils')
+    s3 = get_client('s3')
+
+    runs = {}
+    for key in get_bucket_objects(bucket_name, prefix=f"{manifest_prefix}{run_prefix}") or []:
+        try:
+            manifest = json.loads(s3.get_object(Bucket=bucket_name, Key=key)['Body'].read())
+        except Exception as err:
+            logger.error(f"Could not read the manifest {key}: {err}")
+            raise Exception
+        runs[manifest['run']] = manifest['files']
+
+    return runs
+
+
+def get_partition_runs(bucket_name, start_date, end_date):
+    """Find the files of every run extracted between two dates, listing only their partitions."""
+
+    dates = [start_date + timedelta(days=day) for day in range((end_date - start_date).days + 1)]
+
+    runs = {}
+    for table_prefix in get_bucket_prefixes(bucket_name, prefix='table='):
+        for date in dates:
+            for key in get_bucket_objects(
+                    bucket_name, prefix=f"{table_prefix}/date={date:%Y-%m-%d}/") or []:
+                runs.setdefault(get_run_name(key), []).append(key)
+
+    return runs
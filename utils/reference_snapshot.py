@@ -0,0 +1,146 @@
+import logging
+import threading
+from io import BytesIO
+import pandas as pd
+from botocore.exceptions import ClientError
+from utils.aws_clients import get_client
+from utils.get_bucket_objects import get_bucket_objects
+from utils.get_folder_batches import get_extraction_time, get_run_name
+from utils.run_ledger import RunLedger
+from utils.write_parquet_to_s3 import write_parquet_to_s3
+
+# the snapshots used by this process, kept across warm Lambda invocations
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+# the column recording the extraction time of the folder each row of a snapshot came from
+VERSION_COLUMN = 'snapshot_version'
+
+
+class ReferenceSnapshot:
+    """The latest version of every row of a reference table, e.g. address, across extractions."""
+
+    def __init__(self, bucket_name, table_name, id_column, columns):
+        self.bucket_name = bucket_name
+        self.table_name = table_name
+        self.key = f"reference/{table_name}.parquet"
+        self.id_column = id_column
+        self.columns = list(columns)
+        self._frame = None
+        self._etag = None
+        self._lock = threading.Lock()
+
+    def exists(self):
+        with self._lock:
+            return self._load()
+
+    def lookup(self, ids):
+        """Get the rows of the given ids, the ones not in the snapshot are left out."""
+
+        with self._lock:
+            self._load()
+            rows = self._frame[self._frame.index.isin(pd.unique(pd.Series(ids).dropna()))]
+            rows = rows.reset_index()
+
+        return rows[self.columns]
+
+    def update(self, df, version):
+        """Upsert rows into the snapshot and write it back to the processed bucket."""
+
+        with self._lock:
+            self._load()
+            self._upsert(df, version)
+            self._save()
+
+    def seed(self, extraction_bucket):
+        """Build the snapshot from every transformed extraction of the table, oldest first."""
+
+        logger = logging.getLogger('Utils')
+
+        keys = [key for key in get_bucket_objects(
+            extraction_bucket, prefix='totesys_transformed_data_') or []
+            if key.endswith(f"/{self.table_name}.parquet")]
+        keys += get_bucket_objects(extraction_bucket, prefix=f"table={self.table_name}/") or []
+
+        ledger = RunLedger(extraction_bucket)
+        pending_runs = set(ledger.get_pending('transformation'))
+        transformed_runs = {run for run in ledger.get_runs() if run not in pending_runs}
+        if transformed_runs:
+            keys += [key for key in get_bucket_objects(
+                extraction_bucket, prefix='totesys_extraction_data_') or []
+                if key.endswith(f"/{self.table_name}.parquet") and get_run_name(key) in transformed_runs]
+
+        self.update_from_extractions(extraction_bucket, keys)
+
+        logger.info(f"Seeded the {self.table_name} snapshot from {len(keys)} extractions.")
+
+    def update_from_extractions(self, extraction_bucket, keys):
+        """Upsert the rows of several extractions of the table and write the snapshot back once."""
+
+        s3 = get_client('s3')
+        keys = sorted(keys, key=lambda key: get_extraction_time(get_run_name(key)))
+
+        with self._lock:
+            self._load()
+            for key in keys:
+                body = s3.get_object(Bucket=extraction_bucket, Key=key)['Body'].read()
+                self._upsert(pd.read_parquet(BytesIO(body), columns=self.columns),
+                             get_extraction_time(get_run_name(key)))
+            self._save()
+
+    def _load(self):
+        # reloads only if another process has written the snapshot since it was last read
+        s3 = get_client('s3')
+
+        try:
+            etag = s3.head_object(Bucket=self.bucket_name, Key=self.key)['ETag']
+        except ClientError as err:
+            if err.response['Error']['Code'] not in ('404', 'NoSuchKey'):
+                raise
+            if self._frame is None:
+                self._frame = pd.DataFrame(
+                    columns=self.columns + [VERSION_COLUMN]).set_index(self.id_column)
+            return False
+
+        if etag != self._etag:
+            body = s3.get_object(Bucket=self.bucket_name, Key=self.key)['Body'].read()
+            self._frame = pd.read_parquet(BytesIO(body)).set_index(self.id_column)
+            self._etag = etag
+
+        return True
+
+    def _upsert(self, df, version):
+        rows = df[self.columns].copy()
+        rows[VERSION_COLUMN] = version
+
+        frames = [frame for frame in [self._frame.reset_index(), rows] if len(frame)]
+        if not frames:
+            return
+
+        combined = pd.concat(frames, ignore_index=True)
+        # a stable sort keeps the incoming row last when versions are equal
+        combined = combined.sort_values(VERSION_COLUMN, kind='stable')
+        self._frame = combined.drop_duplicates(
+            subset=self.id_column, keep='last').set_index(self.id_column).sort_index()
+
+    def _save(self):
+        write_parquet_to_s3(self._frame.reset_index(), self.bucket_name, self.key)
+        self._etag = get_client('s3').head_object(
+            Bucket=self.bucket_name, Key=self.key)['ETag']
+
+
+def get_reference_snapshot(bucket_name, table_name, id_column, columns):
+    """Get the process-wide ReferenceSnapshot of a table, creating it on first use."""
+
+    with _snapshots_lock:
+        key = (bucket_name, table_name)
+        if key not in _snapshots or _snapshots[key].columns != list(columns):
+            _snapshots[key] = ReferenceSnapshot(bucket_name, table_name, id_column, columns)
+        return _snapshots[key]
+
+
+def clear_reference_snapshots():
+    """Forget the snapshots held in memory, they are read from the bucket again on next use."""
+
+    with _snapshots_lock:
+        _snapshots.clear()
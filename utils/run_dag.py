@@ -0,0 +1,55 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+def run_dag(tasks, max_workers=4):
+    """Run a graph of dependent tasks on a thread pool, each as soon as its dependencies complete."""
+
+    logger = logging.getLogger('Utils')
+
+    for name, (_, dependencies) in tasks.items():
+        unknown = [dependency for dependency in dependencies if dependency not in tasks]
+        if unknown:
+            raise ValueError(f"Task {name} depends on unknown tasks {unknown}.")
+
+    remaining = {name: set(dependencies) for name, (_, dependencies) in tasks.items()}
+    results = {}
+    error = None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+
+        def start_ready_tasks():
+            for name in [name for name, waiting_for in remaining.items() if not waiting_for]:
+                del remaining[name]
+                running[executor.submit(tasks[name][0])] = name
+
+        start_ready_tasks()
+        if remaining and not running:
+            raise ValueError(f"Tasks {sorted(remaining)} depend on each other in a cycle.")
+
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as err:
+                    logger.error(f"Task {name} failed: {err}")
+                    if error is None:
+                        error = err
+                    continue
+
+                for waiting_for in remaining.values():
+                    waiting_for.discard(name)
+
+            if error is None:
+                start_ready_tasks()
+                if remaining and not running:
+                    raise ValueError(f"Tasks {sorted(remaining)} depend on each other in a cycle.")
+
+    if error is not None:
+        raise error
+
+    return results
@@ -0,0 +1,94 @@
+import json
+import logging
+from datetime import datetime, timezone
+from botocore.exceptions import ClientError
+from utils.aws_clients import get_client
+from utils.get_bucket_objects import get_bucket_objects
+from utils.get_folder_batches import get_extraction_time
+from utils.partitioned_layout import write_manifest
+
+
+class RunLedger:
+    """Records the progress of every run through the pipeline, in place of renaming its folders."""
+
+    # every run has a manifest at 'ledger/runs/<run>.json' and, while waiting for a stage, an
+    # empty marker at 'ledger/pending/<stage>/<run>'
+    def __init__(self, bucket_name, prefix='ledger/'):
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+
+    def get_pending(self, stage):
+        """List the runs waiting for a stage, oldest first."""
+
+        marker_prefix = f"{self.prefix}pending/{stage}/"
+        runs = [key[len(marker_prefix):] for key in get_bucket_objects(
+            self.bucket_name, prefix=marker_prefix) or []]
+
+        return sorted(runs, key=lambda run: (get_extraction_time(run), run))
+
+    def get_runs(self):
+        """List every run with a manifest, i.e. every run that has completed its extraction."""
+
+        run_prefix = f"{self.prefix}runs/"
+        return [key[len(run_prefix):-len('.json')] for key in get_bucket_objects(
+            self.bucket_name, prefix=run_prefix) or []]
+
+    def get_run(self, run_name):
+        """Read the manifest of a run."""
+
+        try:
+            body = get_client('s3').get_object(
+                Bucket=self.bucket_name, Key=self._get_run_key(run_name))['Body'].read()
+            return json.loads(body)
+
+        except ClientError as err:
+            if err.response['Error']['Code'] != 'NoSuchKey':
+                raise
+            return {'run': run_name, 'stages': {}}
+
+    def get_stage_files(self, run_name, stage):
+        """
+        Get the files a stage of a run handed over to the next stage.
+        """
+
+        return self.get_run(run_name)['stages'][stage]['files']
+
+    def complete_stage(self, run_name, stage, files=None, next_stage=None):
+        """Record that a stage of a run has completed and hand its files over to the next stage."""
+
+        logger = logging.getLogger('Utils')
+        s3 = get_client('s3')
+
+        manifest = self.get_run(run_name)
+        manifest['stages'][stage] = {
+            'completed_at': datetime.now(timezone.utc).isoformat(),
+            'files': sorted(files or [])}
+
+        s3.put_object(Bucket=self.bucket_name,
+                      Key=self._get_run_key(run_name),
+                      Body=json.dumps(manifest))
+
+        if next_stage:
+            s3.put_object(Bucket=self.bucket_name,
+                          Key=self._get_marker_key(run_name, next_stage),
+                          Body=b'')
+
+        s3.delete_object(Bucket=self.bucket_name, Key=self._get_marker_key(run_name, stage))
+
+        logger.info(f"Run {run_name} has completed the {stage} stage.")
+
+    def _get_run_key(self, run_name):
+        return f"{self.prefix}runs/{run_name}.json"
+
+    def _get_marker_key(self, run_name, stage):
+        return f"{self.prefix}pending/{stage}/{run_name}"
+
+
+def publish_extraction(bucket_name, run_name, files, layout='flat', handoff='rename'):
+    """Make the files of an extraction run visible to the transformation."""
+
+    if handoff == 'manifest':
+        RunLedger(bucket_name).complete_stage(
+            run_name, 'extraction', files, next_stage='transformation')
+    elif layout == 'hive':
+        write_manifest(bucket_name, run_name, files)
@@ -0,0 +1,97 @@
+import io
+import logging
+from utils.aws_clients import get_client
+
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class S3StreamWriter(io.RawIOBase):
+    """A writable file-like object that streams whatever is written to it into a single S3 object."""
+
+    def __init__(self, bucket_name, key, part_size=MIN_PART_SIZE, s3_client=None):
+        super().__init__()
+        self.bucket_name = bucket_name
+        self.key = key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.s3 = s3_client if s3_client else get_client('s3')
+        self._buffer = bytearray()
+        self._position = 0
+        self._upload_id = None
+        self._parts = []
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("write to closed file")
+
+        self._buffer += data
+        self._position += len(data)
+
+        if len(self._buffer) >= self.part_size:
+            self._upload_part()
+
+        return len(data)
+
+    def _upload_part(self):
+        if self._upload_id is None:
+            self._upload_id = self.s3.create_multipart_upload(
+                Bucket=self.bucket_name, Key=self.key)['UploadId']
+
+        part_number = len(self._parts) + 1
+        response = self.s3.upload_part(Bucket=self.bucket_name,
+                                       Key=self.key,
+                                       UploadId=self._upload_id,
+                                       PartNumber=part_number,
+                                       Body=bytes(self._buffer))
+        self._parts.append(
+            {'ETag': response['ETag'], 'PartNumber': part_number})
+        self._buffer = bytearray()
+
+    def close(self):
+        if self.closed:
+            return
+
+        logger = logging.getLogger('Utils')
+
+        try:
+            if self._upload_id is None:
+                self.s3.put_object(Bucket=self.bucket_name,
+                                   Key=self.key,
+                                   Body=bytes(self._buffer))
+            else:
+                if len(self._buffer) > 0:
+                    self._upload_part()
+                self.s3.complete_multipart_upload(
+                    Bucket=self.bucket_name,
+                    Key=self.key,
+                    UploadId=self._upload_id,
+                    MultipartUpload={'Parts': self._parts})
+
+        except Exception as err:
+            logger.error(err)
+            self.abort()
+            raise
+
+        super().close()
+
+    def abort(self):
+        if self.closed:
+            return
+
+        if self._upload_id is not None:
+            self.s3.abort_multipart_upload(Bucket=self.bucket_name,
+                                           Key=self.key,
+                                           UploadId=self._upload_id)
+        self._buffer = bytearray()
+        super().close()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
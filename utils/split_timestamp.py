@@ -0,0 +1,38 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+def to_arrow_date(series):
+    """Convert a column of timestamps, or of strings holding them, to Arrow date32 values."""
+
+    return _cast_timestamps(series, pa.date32())
+
+
+def to_arrow_time(series):
+    """Convert a column of timestamps, or of strings holding them, to Arrow time64('us') values."""
+
+    return _cast_timestamps(series, pa.time64('us'))
+
+
+def split_timestamp(df, column, date_column, time_column):
+    """Split a timestamp column into an Arrow date32 and an Arrow time64 column."""
+
+    timestamps = pd.to_datetime(df[column])
+    df[date_column] = to_arrow_date(timestamps)
+    df[time_column] = to_arrow_time(timestamps)
+    return df
+
+
+def _cast_timestamps(series, arrow_type):
+    timestamps = pd.to_datetime(series)
+    if timestamps.dt.tz is not None:
+        # like .dt.date and .dt.time, keep the wall time of the timestamps' own time zone
+        timestamps = timestamps.dt.tz_localize(None)
+
+    values = pc.cast(pa.array(timestamps, from_pandas=True), arrow_type)
+    if not hasattr(pd.arrays, 'ArrowExtensionArray'):
+        # pandas < 1.5, e.g. the python3.7 Lambda layer, has no Arrow backed columns, so the
+        # values become datetime.date and datetime.time objects like .dt.date and .dt.time
+        return pd.Series(values.to_pylist(), index=series.index, name=series.name, dtype=object)
+    return pd.Series(pd.arrays.ArrowExtensionArray(values), index=series.index, name=series.name)
@@ -0,0 +1,26 @@
+import logging
+from utils.aws_clients import get_client
+
+# the CloudWatch namespace of the metrics published by the extraction
+extraction_namespace = 'Totesys/Extraction'
+
+
+def put_table_metrics(metrics, namespace=extraction_namespace):
+    """Publish metrics of every table to CloudWatch, with the table name as their 'Table' dimension."""
+
+    logger = logging.getLogger('Utils')
+
+    metric_data = [{'MetricName': metric_name,
+                    'Dimensions': [{'Name': 'Table', 'Value': table_name}],
+                    'Value': value,
+                    'Unit': 'Count'}
+                   for table_name, table_metrics in metrics.items()
+                   for metric_name, value in table_metrics.items()]
+
+    try:
+        # PutMetricData takes at most 1000 metrics per call
+        for start in range(0, len(metric_data), 1000):
+            get_client('cloudwatch', region_name='eu-west-2').put_metric_data(
+                Namespace=namespace, MetricData=metric_data[start:start + 1000])
+    except Exception as err:
+        logger.warning(f"Could not publish the table metrics: {err}")
@@ -0,0 +1,106 @@
+import boto3
+import pandas as pd
+import pyarrow as pa
+import threading
+from utils.get_df import get_df
+from utils.arrow_tables import get_table
+
+
+class TransformationContext:
+    """Memoizes the ingestion tables read while transforming one folder."""
+
+    def __init__(self):
+        self._frames = {}
+        # the columns read of every file in _frames, None when all of them were
+        self._columns = {}
+        self._locks = {}
+        self._tables = {}
+        # the keys every coalesced file was combined from, oldest first
+        self._coalesced = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def get_df(self, bucket_name, key, columns=None):
+        """Read a Parquet file from an S3 bucket, downloading it only on first use."""
+
+        self.prefetch(bucket_name, key, columns)
+        frame = self._frames[(bucket_name, key)]
+        return frame[list(columns)].copy() if columns is not None else frame.copy()
+
+    def prefetch(self, bucket_name, key, columns=None):
+        """Download a Parquet file into the context, unless the columns needed have already been read."""
+
+        with self._get_key_lock(('frame', bucket_name, key)):
+            held = self._columns.get((bucket_name, key), [])
+            if held is None or (columns is not None and set(columns) <= set(held)):
+                return
+
+            if columns is not None:
+                columns = held + [column for column in columns if column not in held]
+            self._frames[(bucket_name, key)] = get_df(
+                bucket_name, key, boto3_session=self._get_session(), columns=columns)
+            self._columns[(bucket_name, key)] = columns
+
+    def get_table(self, bucket_name, key):
+        """Read a Parquet file from an S3 bucket as a pyarrow Table, downloading it only on first use."""
+
+        self.prefetch_table(bucket_name, key)
+        return self._tables[(bucket_name, key)]
+
+    def prefetch_table(self, bucket_name, key):
+        """Download a Parquet file into the context as a pyarrow Table, unless it has already been read."""
+
+        with self._get_key_lock(('table', bucket_name, key)):
+            if (bucket_name, key) not in self._tables:
+                if (bucket_name, key) in self._coalesced:
+                    # the file only holds part of the coalesced table
+                    table = pa.Table.from_pandas(
+                        self._frames[(bucket_name, key)], preserve_index=False)
+                else:
+                    table = get_table(bucket_name, key)
+                self._tables[(bucket_name, key)] = table
+
+    def coalesce(self, bucket_name, keys, id_column=None):
+        """Combine several incremental extractions of one table into a single DataFrame."""
+
+        frames = [self.get_df(bucket_name, key) for key in keys]
+        combined = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+        # the first row of every id is kept, the version loading the files one by one keeps
+        if id_column in combined.columns:
+            combined = combined.drop_duplicates(
+                subset=id_column, keep='first').reset_index(drop=True)
+
+        with self._lock:
+            for key in keys[:-1]:
+                self._frames.pop((bucket_name, key), None)
+                self._columns.pop((bucket_name, key), None)
+            self._frames[(bucket_name, keys[-1])] = combined
+            self._columns[(bucket_name, keys[-1])] = None
+            self._coalesced[(bucket_name, keys[-1])] = list(keys)
+
+        return keys[-1]
+
+    def get_sources(self, bucket_name, key):
+        """Get the keys a file of the context was coalesced from."""
+
+        with self._lock:
+            return list(self._coalesced.get((bucket_name, key), [key]))
+
+    def _get_key_lock(self, lock_key):
+        with self._lock:
+            return self._locks.setdefault(lock_key, threading.Lock())
+
+    def _get_session(self):
+        # boto3 Sessions are not thread-safe, so every reading thread gets its own
+        if not hasattr(self._local, 'session'):
+            self._local.session = boto3.Session()
+        return self._local.session
+
+    def clear(self):
+        with self._lock:
+            self._frames = {}
+            self._columns = {}
+            self._tables = {}
+            self._coalesced = {}
+            self._locks = {}
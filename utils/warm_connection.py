@@ -0,0 +1,91 @@
+import logging
+import threading
+from contextlib import contextmanager
+from psycopg2.extensions import TRANSACTION_STATUS_INERROR
+
+# every WarmConnection created by this process, see close_warm_connections
+_warm_connections = []
+
+
+def is_connection_healthy(conn):
+    """Check that a psycopg2 connection is open and can still run a query."""
+
+    try:
+        if conn.closed:
+            return False
+
+        if conn.get_transaction_status() == TRANSACTION_STATUS_INERROR:
+            conn.rollback()
+
+        cursor = conn.cursor()
+        cursor.execute('SELECT 1;')
+        cursor.fetchone()
+        cursor.close()
+
+        if not conn.autocommit:
+            conn.rollback()
+
+        return True
+
+    except Exception:
+        return False
+
+
+class WarmConnection:
+    """A database connection that is kept open across warm Lambda invocations."""
+
+    def __init__(self, connect):
+        self.connect = connect
+        self.conn = None
+        self._lock = threading.Lock()
+        _warm_connections.append(self)
+
+    def get_connection(self):
+        logger = logging.getLogger('Utils')
+
+        with self._lock:
+            if self.conn is not None and not is_connection_healthy(self.conn):
+                logger.info('Database connection is no longer usable, reconnecting.')
+                self._discard()
+
+            if self.conn is None:
+                self.conn = self.connect()
+
+            return self.conn
+
+    @contextmanager
+    def transaction(self):
+        """Use the connection for the duration of a with block."""
+
+        conn = self.get_connection()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                with self._lock:
+                    self._discard()
+            raise
+
+    def close(self):
+        with self._lock:
+            self._discard()
+
+    def _discard(self):
+        logger = logging.getLogger('Utils')
+
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception as err:
+                logger.error(err)
+            self.conn = None
+
+
+def close_warm_connections():
+    """Close every WarmConnection created by this process."""
+
+    for warm_connection in _warm_connections:
+        warm_connection.close()
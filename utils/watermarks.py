@@ -0,0 +1,94 @@
+import pyarrow.compute as pc
+from botocore.exceptions import ClientError
+from datetime import datetime
+import json
+import logging
+from utils.aws_clients import get_client
+
+watermarks_key = 'extraction_state/watermarks.json'
+
+
+def get_watermarks(bucket_name, key=watermarks_key):
+    """Read the last committed extraction watermark of every table from an S3 bucket."""
+
+    logger = logging.getLogger('Utils')
+    s3 = get_client('s3')
+
+    try:
+        state = json.loads(
+            s3.get_object(Bucket=bucket_name, Key=key)['Body'].read())
+
+        return {table: {'last_updated': datetime.fromisoformat(watermark['last_updated']),
+                        'id': watermark['id']}
+                for table, watermark in state.items()}
+
+    except ClientError as err:
+        if err.response['Error']['Code'] == 'NoSuchKey':
+            logger.info("No extraction watermarks have been saved yet.")
+            return {}
+        else:
+            logger.error(err)
+            raise Exception
+
+
+def save_watermarks(bucket_name, watermarks, key=watermarks_key):
+    """Save the extraction watermark of every table as a JSON object in an S3 bucket."""
+
+    logger = logging.getLogger('Utils')
+    s3 = get_client('s3')
+
+    try:
+        state = {table: {'last_updated': watermark['last_updated'].isoformat(),
+                         'id': watermark['id']}
+                 for table, watermark in watermarks.items()}
+
+        s3.put_object(Bucket=bucket_name, Key=key, Body=json.dumps(state))
+
+    except Exception as err:
+        logger.error(err)
+        raise Exception
+
+
+def get_rows_watermark(column_names, rows, table_name, watermark=None):
+    """Find the newest row of a batch by its last_updated time, using the primary key as a tie-breaker."""
+
+    id_column = f'{table_name}_id'
+    if 'last_updated' not in column_names or id_column not in column_names:
+        return watermark
+
+    last_updated_index = column_names.index('last_updated')
+    id_index = column_names.index(id_column)
+
+    newest = max(((row[last_updated_index], row[id_index]) for row in rows
+                  if row[last_updated_index] is not None), default=None)
+
+    if newest is None:
+        return watermark
+
+    if watermark and (watermark['last_updated'], watermark['id']) >= newest:
+        return watermark
+
+    return {'last_updated': newest[0], 'id': newest[1]}
+
+
+def get_batch_watermark(batch, table_name, watermark=None):
+    """Find the newest row of a pyarrow Table or RecordBatch, like get_rows_watermark."""
+
+    id_column = f'{table_name}_id'
+    if 'last_updated' not in batch.schema.names or id_column not in batch.schema.names:
+        return watermark
+
+    last_updated = batch.column(batch.schema.get_field_index('last_updated'))
+    ids = batch.column(batch.schema.get_field_index(id_column))
+
+    newest_time = pc.max(last_updated)
+    if not newest_time.is_valid:
+        return watermark
+
+    newest = (newest_time.as_py(),
+              pc.max(pc.filter(ids, pc.equal(last_updated, newest_time))).as_py())
+
+    if watermark and (watermark['last_updated'], watermark['id']) >= newest:
+        return watermark
+
+    return {'last_updated': newest[0], 'id': newest[1]}
@@ -0,0 +1,93 @@
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from utils.s3_stream_writer import S3StreamWriter
+
+# the number of rows of every row group written from a DataFrame or Table, unless configured
+DEFAULT_ROW_GROUP_SIZE = 64 * 1024
+
+
+def write_parquet_to_s3(data, bucket_name, key, s3_client=None, row_group_size=None, compression=None):
+    """Stream a DataFrame, an Arrow table or Arrow batches into a single Parquet file in an S3 bucket."""
+
+    if row_group_size is None and 'PARQUET_ROW_GROUP_SIZE' in os.environ:
+        row_group_size = int(os.environ['PARQUET_ROW_GROUP_SIZE'])
+    if compression is None:
+        compression = os.environ.get('PARQUET_COMPRESSION', 'snappy')
+
+    if isinstance(data, (pd.DataFrame, pa.Table)):
+        return _write_frame(data, bucket_name, key, s3_client,
+                            row_group_size or DEFAULT_ROW_GROUP_SIZE, compression)
+
+    sink = None
+    writer = None
+    row_count = 0
+
+    try:
+        for batch in data:
+            if batch.num_rows == 0:
+                continue
+
+            if writer is None:
+                sink = S3StreamWriter(bucket_name, key, s3_client=s3_client)
+                writer = pq.ParquetWriter(sink, batch.schema, compression=compression)
+
+            if hasattr(batch, 'to_batches'):
+                writer.write_table(batch, row_group_size)
+            else:
+                writer.write_batch(batch, row_group_size)
+            row_count += batch.num_rows
+
+        if writer:
+            writer.close()
+            sink.close()
+
+    except Exception:
+        if sink:
+            _abort(writer, sink)
+        raise
+
+    return row_count
+
+
+def _write_frame(frame, bucket_name, key, s3_client, row_group_size, compression):
+    is_dataframe = isinstance(frame, pd.DataFrame)
+    if is_dataframe:
+        # inferred from the whole frame, so a slice of only nulls cannot change a column's type
+        schema = pa.Schema.from_pandas(frame, preserve_index=False)
+    else:
+        schema = frame.schema
+
+    sink = S3StreamWriter(bucket_name, key, s3_client=s3_client)
+    writer = None
+
+    try:
+        writer = pq.ParquetWriter(sink, schema, compression=compression)
+
+        for start in range(0, len(frame), row_group_size):
+            if is_dataframe:
+                row_group = pa.Table.from_pandas(
+                    frame.iloc[start:start + row_group_size], schema=schema, preserve_index=False)
+            else:
+                row_group = frame.slice(start, row_group_size)
+            writer.write_table(row_group)
+
+        writer.close()
+        sink.close()
+
+    except Exception:
+        _abort(writer, sink)
+        raise
+
+    return len(frame)
+
+
+def _abort(writer, sink):
+    # the writer is closed first, otherwise it writes its footer to the aborted sink when collected
+    if writer:
+        try:
+            writer.close()
+        except Exception:
+            pass
+    sink.abort()